@@ -143,6 +143,28 @@ contract CDTRegistry {
         );
     }
     
+    // 将多个cdt批量授权给另一cdt，跳过调用者不拥有的cdt，每个授权各发出一个事件
+    function grantPermissions(
+        bytes32[] calldata _cdts,
+        bytes32 _grantee
+    )
+        external
+        returns (uint granted)
+    {
+        for (uint i = 0; i < _cdts.length; i++) {
+            if (cdtList.cdts[_cdts[i]].owner != msg.sender) {
+                continue;
+            }
+            CDTPermissions[_cdts[i]][_grantee] = true;
+            emit CDTPermissionGranted(
+                _cdts[i],
+                msg.sender,
+                _grantee
+            );
+            granted++;
+        }
+    }
+    
     // 判断某地址是否得到该cdt的授权
     function getPermission(
         bytes32 _cdt,
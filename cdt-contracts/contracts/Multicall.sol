@@ -0,0 +1,35 @@
+pragma solidity 0.5.6;
+pragma experimental ABIEncoderV2;
+
+/**
+ * @title 只读调用聚合
+ * @notice 在一次eth_call中执行多个合约的view函数调用
+ */
+contract Multicall {
+
+    // 依次调用_targets[i]并传入_data[i]，单个调用失败不会回滚整体，
+    // 对应的success[i]为false
+    function aggregate(
+        address[] memory _targets,
+        bytes[] memory _data
+    )
+        public
+        view
+        returns (
+            uint256 blockNumber,
+            bool[] memory success,
+            bytes[] memory returnData
+        )
+    {
+        require(
+            _targets.length == _data.length
+        );
+
+        blockNumber = block.number;
+        success = new bool[](_data.length);
+        returnData = new bytes[](_data.length);
+        for (uint i = 0; i < _data.length; i++) {
+            (success[i], returnData[i]) = _targets[i].staticcall(_data[i]);
+        }
+    }
+}
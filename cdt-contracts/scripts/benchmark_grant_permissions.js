@@ -0,0 +1,54 @@
+// 比较逐个授权(grantPermission)与批量授权(grantPermissions)的gas消耗
+// 用法: truffle exec scripts/benchmark_grant_permissions.js --network development
+// 账户0为合约管理员，账户1作为机构注册cdt并进行授权
+
+const Registry = artifacts.require("CDTRegistry");
+
+const BATCH_SIZES = [1, 5, 10, 25, 50];
+
+module.exports = async function(callback) {
+  try {
+    const accounts = await web3.eth.getAccounts();
+    const admin = accounts[0];
+    const owner = accounts[1];
+    const registry = await Registry.deployed();
+
+    if (!(await registry.isAuthority(owner))) {
+      await registry.addAuthority(owner, "benchmark", { from: admin });
+    }
+
+    const registerCDTs = async function(count) {
+      const cdts = [];
+      for (let i = 0; i < count; i++) {
+        const cdt = web3.utils.randomHex(32);
+        await registry.registerAttribute(cdt, web3.utils.randomHex(32), "benchmark", { from: owner });
+        cdts.push(cdt);
+      }
+      return cdts;
+    };
+
+    console.log("cdts\tsingle gas\tbatch gas\tbatch/single");
+    for (const size of BATCH_SIZES) {
+      const grantee = web3.utils.randomHex(32);
+
+      let singleGas = 0;
+      for (const cdt of await registerCDTs(size)) {
+        const tx = await registry.grantPermission(cdt, grantee, { from: owner });
+        singleGas += tx.receipt.gasUsed;
+      }
+
+      const cdts = await registerCDTs(size);
+      const tx = await registry.grantPermissions(cdts, grantee, { from: owner });
+      const batchGas = tx.receipt.gasUsed;
+      const events = tx.logs.filter(log => log.event === "CDTPermissionGranted");
+      if (events.length !== size) {
+        throw new Error(`expected ${size} CDTPermissionGranted events, got ${events.length}`);
+      }
+
+      console.log(`${size}\t${singleGas}\t\t${batchGas}\t\t${(batchGas / singleGas).toFixed(3)}`);
+    }
+    callback();
+  } catch (error) {
+    callback(error);
+  }
+};
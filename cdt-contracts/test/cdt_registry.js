@@ -0,0 +1,58 @@
+// 用法: truffle test --network development
+// 账户0为合约管理员，账户1和账户2为两个机构
+
+const Registry = artifacts.require("CDTRegistry");
+
+contract("CDTRegistry", accounts => {
+  const admin = accounts[0];
+  const owner = accounts[1];
+  const other = accounts[2];
+  let registry;
+
+  const register = async function(from) {
+    const cdt = web3.utils.randomHex(32);
+    await registry.registerAttribute(cdt, web3.utils.randomHex(32), "test", { from });
+    return cdt;
+  };
+
+  before(async () => {
+    registry = await Registry.deployed();
+    for (const [member, name] of [[owner, "owner"], [other, "other"]]) {
+      if (!(await registry.isAuthority(member))) {
+        await registry.addAuthority(member, name, { from: admin });
+      }
+    }
+  });
+
+  it("grantPermissions grants every cdt of the caller", async () => {
+    const cdts = [await register(owner), await register(owner)];
+    const grantee = web3.utils.randomHex(32);
+
+    const tx = await registry.grantPermissions(cdts, grantee, { from: owner });
+    const events = tx.logs.filter(log => log.event === "CDTPermissionGranted");
+    assert.deepEqual(events.map(log => log.args._cdt), cdts);
+    for (const cdt of cdts) {
+      assert.isTrue(await registry.getPermission(cdt, grantee));
+    }
+  });
+
+  it("grantPermissions skips the cdts the caller does not own", async () => {
+    const owned = await register(owner);
+    const notOwned = await register(other);
+    const unregistered = web3.utils.randomHex(32);
+    const grantee = web3.utils.randomHex(32);
+
+    const granted = await registry.grantPermissions.call(
+      [notOwned, owned, unregistered], grantee, { from: owner });
+    assert.equal(granted.toNumber(), 1);
+
+    const tx = await registry.grantPermissions(
+      [notOwned, owned, unregistered], grantee, { from: owner });
+    const events = tx.logs.filter(log => log.event === "CDTPermissionGranted");
+    assert.deepEqual(events.map(log => log.args._cdt), [owned]);
+    assert.equal(events[0].args._owner, owner);
+    assert.isTrue(await registry.getPermission(owned, grantee));
+    assert.isFalse(await registry.getPermission(notOwned, grantee));
+    assert.isFalse(await registry.getPermission(unregistered, grantee));
+  });
+});
@@ -6,6 +6,8 @@
 import logging
 import os
 
+from cdt_utils.key_session import KeySession
+
 logger = logging.getLogger('account')
 
 
@@ -53,3 +55,21 @@ class Account:
 
         return self._encrypted_key
 
+    def unlock(self, ttl=300):
+        """
+        Decrypt the key once and keep it in memory for `ttl` seconds, every signing
+        with this account reuses it until then.
+
+        :param ttl: float seconds, None keeps the key until `lock` is called
+        :return: self
+        """
+        KeySession.unlock(self.address, self.key, self.password, ttl)
+        return self
+
+    def lock(self):
+        """Drop the decrypted key kept by `unlock`."""
+        KeySession.lock(self.address)
+
+    @property
+    def is_unlocked(self):
+        return KeySession.is_unlocked(self.address)
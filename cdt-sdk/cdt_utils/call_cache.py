@@ -0,0 +1,117 @@
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class CallCache:
+    """
+    Size bounded LRU cache of contract view call results.
+
+    Entries are keyed by (contract name, function name, normalized args) and are only
+    valid for the block they were read at: the whole cache is dropped as soon as a
+    newer block is observed. Single entries can also be invalidated ahead of that,
+    e.g. when a matching contract event is seen.
+    """
+    MISSING = object()
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self._block_number = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def block_number(self):
+        return self._block_number
+
+    def get(self, key):
+        """
+        Look up a cached value.
+
+        :param key: tuple (contract name, function name, args)
+        :return: the cached value or `CallCache.MISSING`
+        """
+        with self._lock:
+            value = self._entries.get(key, self.MISSING)
+            if value is self.MISSING:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value, block_number=None):
+        """
+        Store a value read at `block_number`. Values read at an older block than the
+        one the cache is currently at are dropped.
+
+        :param key: tuple (contract name, function name, args)
+        :param value: call result
+        :param block_number: block the value was read at, int
+        """
+        with self._lock:
+            if block_number is not None and block_number != self._block_number:
+                return
+
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def observe_block(self, block_number):
+        """Drop every entry if `block_number` is newer than the block the cache is at."""
+        with self._lock:
+            if self._block_number is not None and block_number <= self._block_number:
+                return
+
+            if self._entries:
+                logger.debug(f'call cache: new block {block_number}, '
+                             f'dropping {len(self._entries)} entries')
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+            self._block_number = block_number
+
+    def invalidate(self, contract_name, fn_name=None, args=None):
+        """
+        Drop the entries of a contract, optionally only for one function and args.
+
+        :param contract_name: str
+        :param fn_name: str, None matches every function
+        :param args: tuple of normalized args, None matches any args
+        """
+        with self._lock:
+            keys = [key for key in self._entries
+                    if key[0] == contract_name and
+                    (fn_name is None or key[1] == fn_name) and
+                    (args is None or key[2] == args)]
+            for key in keys:
+                del self._entries[key]
+            self.invalidations += len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._block_number = None
+
+    def stats(self):
+        """Return the cache counters, dict."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'block_number': self._block_number,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
@@ -0,0 +1,239 @@
+import logging
+import threading
+from collections import deque, namedtuple
+
+from web3 import Web3
+from web3.utils.events import get_event_data
+from web3.utils.filters import construct_data_filter_regex, construct_event_filter_params
+
+from cdt_utils.log_scanner import LogScanner
+from cdt_utils.web3_provider import Web3Provider
+
+logger = logging.getLogger(__name__)
+
+# `retracted` is False when `event` reached the confirmation depth and True when an
+# already emitted event was orphaned by a reorg and must be undone.
+StreamEvent = namedtuple('StreamEvent', ('retracted', 'event'))
+
+
+class ConfirmedEventStream:
+    """
+    Stream of contract events emitted only once they have `confirmations` blocks.
+
+    The hashes of the last `history_size` processed blocks are kept in a ring buffer.
+    Every new block is checked against it through its parent hash; on a mismatch the
+    stream walks back to the common ancestor, drops the unconfirmed events of the
+    orphaned blocks and emits a retraction for every already confirmed one (a reorg
+    deeper than `confirmations`). Logs older than the buffer are considered final.
+
+    Example:
+        stream = ConfirmedEventStream(registry.events.CDTAttributeRegistered, 6)
+        for item in stream:
+            if item.retracted:
+                undo(item.event)
+            else:
+                apply(item.event)
+    """
+    DEFAULT_CONFIRMATIONS = 6
+    HISTORY_SIZE = 128
+    POLL_INTERVAL = 1.0
+
+    def __init__(self, contract_event, confirmations=None, argument_filters=None,
+                 from_block='latest', history_size=None):
+        """
+        :param contract_event: web3 ContractEvent, e.g. `contract.events.TaskAdded`
+        :param confirmations: int number of blocks including the event's one
+        :param argument_filters: dict event arg name -> value
+        :param from_block: int first block to stream or 'latest'
+        :param history_size: int number of block hashes kept to detect reorgs
+        """
+        self.confirmations = max(1, confirmations if confirmations is not None
+                                 else self.DEFAULT_CONFIRMATIONS)
+        self.history_size = max(history_size if history_size else self.HISTORY_SIZE,
+                                self.confirmations)
+        self._contract_event = contract_event
+        self._event_abi = contract_event._get_event_abi()
+        data_filter_set, self._filter_params = construct_event_filter_params(
+            self._event_abi,
+            contract_address=contract_event.address,
+            argument_filters=dict(argument_filters or {}))
+        self._argument_filters = argument_filters
+        self._data_filter_regex = construct_data_filter_regex(data_filter_set) \
+            if any(data_filter_set) else None
+
+        if from_block in (None, 'latest'):
+            from_block = Web3Provider.get_block_number(max_age=0)
+        self._last_block = from_block - 1
+        self._block_hashes = deque(maxlen=self.history_size)
+        self._pending = dict()
+        self._emitted = deque()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+
+    @property
+    def last_block(self):
+        """Last block processed, its events are pending or emitted, int."""
+        return self._last_block
+
+    @property
+    def confirmed_block(self):
+        """Last block whose events were all returned by `poll`, int."""
+        return self._last_block - self.confirmations + 1
+
+    def poll(self):
+        """
+        Process the blocks mined since the last call.
+
+        :return: list of StreamEvent, retractions first
+        """
+        with self._lock:
+            head = Web3Provider.get_block_number(max_age=0)
+            output = []
+            final_block = head - self.history_size
+            if self._last_block < final_block:
+                output.extend(self._scan_final(final_block))
+
+            if self._last_block < head:
+                output.extend(self._process(head))
+
+            output.extend(self._confirm(head))
+            return output
+
+    def __iter__(self):
+        """Yield StreamEvents forever, waiting for new blocks in between."""
+        while not self._stopped.is_set():
+            for item in self.poll():
+                yield item
+            Web3Provider.wait_for_block(self._last_block, self.POLL_INTERVAL)
+
+    def start(self, callback):
+        """
+        Deliver the stream to `callback(stream_event)` from a background thread until
+        `stop` is called.
+        """
+        def _run():
+            while not self._stopped.is_set():
+                try:
+                    for item in self.poll():
+                        callback(item)
+                except Exception as e:
+                    logger.warning(f'confirmed event stream poll failed: {e}')
+                Web3Provider.wait_for_block(self._last_block, self.POLL_INTERVAL)
+
+        self._stopped.clear()
+        self._thread = threading.Thread(target=_run, daemon=True,
+                                        name='confirmed-event-stream')
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _scan_final(self, final_block):
+        # Deeper than the reorg window, emitted as confirmed without tracking hashes.
+        events = LogScanner().scan(self._contract_event, self._last_block + 1, final_block,
+                                   argument_filters=self._argument_filters)
+        output = [StreamEvent(False, event) for event in events]
+        self._last_block = final_block
+        self._block_hashes.clear()
+        self._pending.clear()
+        self._emitted.clear()
+        return output
+
+    def _get_blocks(self, block_numbers):
+        web3 = Web3Provider.get_web3()
+        provider = web3.providers[0] if web3.providers else None
+        if hasattr(provider, 'batch') and len(block_numbers) > 1:
+            with provider.batch() as batch:
+                futures = [batch.add('eth_getBlockByNumber', [hex(number), False])
+                           for number in block_numbers]
+            blocks = [future.result() for future in futures]
+            return [(int(block['number'], 16), block['hash'], block['parentHash'])
+                    if block else None for block in blocks]
+
+        blocks = [web3.eth.getBlock(number) for number in block_numbers]
+        return [(block['number'], Web3.toHex(block['hash']), Web3.toHex(block['parentHash']))
+                if block else None for block in blocks]
+
+    def _process(self, head):
+        output = []
+        numbers = list(range(self._last_block + 1, head + 1))
+        blocks = self._get_blocks(numbers)
+        if blocks and blocks[0] and self._block_hashes and \
+                blocks[0][2] != self._block_hashes[-1][1]:
+            output.extend(self._rollback())
+            output.extend(self._process(head))
+            return output
+
+        # Keep the prefix of blocks that chain together, the rest is read next time.
+        chain = []
+        parent_hash = blocks[0][2] if blocks and blocks[0] else None
+        for block in blocks:
+            if block is None or block[2] != parent_hash:
+                break
+            chain.append(block)
+            parent_hash = block[1]
+        if not chain:
+            return output
+
+        hashes = {number: block_hash for number, block_hash, _ in chain}
+        logs = Web3Provider.get_web3().eth.getLogs(
+            dict(self._filter_params, fromBlock=chain[0][0], toBlock=chain[-1][0]))
+        new_pending = dict()
+        for log in logs:
+            block_number = log['blockNumber']
+            if Web3.toHex(log['blockHash']) != hashes.get(block_number):
+                # The chain moved between the two calls, stop before that block.
+                chain = [block for block in chain if block[0] < block_number]
+                break
+            if self._data_filter_regex and not self._data_filter_regex.match(log['data']):
+                continue
+            new_pending.setdefault(block_number, []).append(
+                get_event_data(self._event_abi, log))
+
+        for number, block_hash, _ in chain:
+            self._block_hashes.append((number, block_hash))
+            if number in new_pending:
+                self._pending[number] = new_pending[number]
+        if chain:
+            self._last_block = chain[-1][0]
+        return output
+
+    def _rollback(self):
+        """Walk back to the last buffered block still on the chain."""
+        buffered = list(self._block_hashes)
+        chain_blocks = self._get_blocks([number for number, _ in buffered])
+        ancestor = None
+        for (number, block_hash), chain_block in zip(reversed(buffered), reversed(chain_blocks)):
+            if chain_block and chain_block[1] == block_hash:
+                ancestor = number
+                break
+
+        if ancestor is None:
+            ancestor = buffered[0][0] - 1
+            logger.warning(f'reorg deeper than the {self.history_size} buffered blocks')
+        logger.info(f'chain reorganization: rolling back blocks {ancestor + 1}-{self._last_block}')
+
+        while self._block_hashes and self._block_hashes[-1][0] > ancestor:
+            self._block_hashes.pop()
+        for number in [number for number in self._pending if number > ancestor]:
+            del self._pending[number]
+
+        output = []
+        while self._emitted and self._emitted[-1][0] > ancestor:
+            output.append(StreamEvent(True, self._emitted.pop()[1]))
+        self._last_block = ancestor
+        return output
+
+    def _confirm(self, head):
+        confirmed_block = head - self.confirmations + 1
+        output = []
+        for number in sorted(number for number in self._pending if number <= confirmed_block):
+            for event in self._pending.pop(number):
+                output.append(StreamEvent(False, event))
+                self._emitted.append((number, event))
+
+        oldest = self._block_hashes[0][0] if self._block_hashes else self._last_block + 1
+        while self._emitted and self._emitted[0][0] < oldest:
+            self._emitted.popleft()
+        return output
@@ -7,10 +7,14 @@
 #  SPDX-License-Identifier: Apache-2.0
 
 import logging
+import threading
+from concurrent.futures import Future, TimeoutError
 
+from eth_utils import add_0x_prefix
 from web3 import Web3
-from web3.utils.threads import Timeout
 
+from cdt_utils.call_cache import CallCache
+from cdt_utils.gas_oracle import GasOracle
 from cdt_utils.web3.contract import CustomContractFunction
 from cdt_utils.web3_provider import Web3Provider
 
@@ -20,6 +24,14 @@ logger = logging.getLogger('keeper')
 class ContractBase(object):
     """Base class for all contract objects."""
     CONTRACT_NAME = None
+    # View functions whose results go through the shared `call_cache`.
+    CACHED_CALLS = ()
+    # event name -> ((function name, (event arg names giving the call args)), ...)
+    CACHE_INVALIDATING_EVENTS = {}
+    call_cache = CallCache()
+    # (contract name, address) -> subscriptions of `watch_cache_invalidation`
+    _invalidation_watches = dict()
+    _invalidation_lock = threading.Lock()
 
     def __init__(self, contract_name, dependencies=None):
 
@@ -81,23 +93,100 @@ class ContractBase(object):
         return Web3.toChecksumAddress(address)
 
     @staticmethod
-    def get_tx_receipt(tx_hash):
+    def get_tx_receipt(tx_hash, timeout=20):
         """
         Get the receipt of a tx.
 
         :param tx_hash: hash of the transaction
+        :param timeout: float seconds to wait for the tx to be mined
         :return: Tx receipt
         """
         try:
-            Web3Provider.get_web3().eth.waitForTransactionReceipt(tx_hash, timeout=20)
-        except Timeout:
+            receipt = Web3Provider.get_receipt_tracker().wait(tx_hash, timeout=timeout)
+        except TimeoutError:
             logger.info('Waiting for transaction receipt timed out.')
             return
         except ValueError as e:
             logger.error(f'Waiting for transaction receipt failed: {e}')
             return
 
-        return Web3Provider.get_web3().eth.getTransactionReceipt(tx_hash)
+        if receipt:
+            # Make sure later cached reads do not predate our own transaction.
+            Web3Provider.observe_block(receipt.blockNumber)
+        return receipt
+
+    def get_receipt_event(self, receipt, event_name):
+        """
+        Return the first `event_name` event emitted by this contract in a receipt.
+
+        :param receipt: Tx receipt
+        :param event_name: name of the event, str
+        :return: decoded event or None
+        """
+        events = self.get_receipt_events(receipt, event_name)
+        return events[0] if events else None
+
+    def get_receipt_events(self, receipt, event_name):
+        """
+        Return all the `event_name` events emitted by this contract in a receipt.
+
+        :param receipt: Tx receipt
+        :param event_name: name of the event, str
+        :return: list of decoded events in log order
+        """
+        if not receipt:
+            return []
+
+        events = getattr(self.events, event_name)().processReceipt(receipt)
+        return [event for event in events if event['address'].lower() == self.address.lower()]
+
+    def track_event(self, tx_hash, event_name, arg_name=None, timeout=20):
+        """
+        Return a future resolved with the `event_name` event of a transaction, decoded
+        from its receipt once mined. Unlike subscribing to the event this needs no log
+        polling and cannot pick up the event of another transaction.
+
+        :param tx_hash: hash of the transaction
+        :param event_name: name of the event, str
+        :param arg_name: resolve with this event argument instead of the whole event
+        :param timeout: float seconds to wait for the tx to be mined
+        :return: Future resolved with the event (or argument), None if the transaction
+            failed or did not emit the event; fails with `TimeoutError` if not mined in time
+        """
+        future = Future()
+
+        def _on_receipt(receipt_future):
+            try:
+                receipt = receipt_future.result()
+                Web3Provider.observe_block(receipt.blockNumber)
+                event = self.get_receipt_event(receipt, event_name) \
+                    if receipt.status == 1 else None
+                if event is not None and arg_name:
+                    event = event['args'][arg_name]
+                future.set_result(event)
+            except Exception as e:
+                future.set_exception(e)
+
+        Web3Provider.get_receipt_tracker().track(tx_hash, timeout).add_done_callback(_on_receipt)
+        return future
+
+    @staticmethod
+    def wait_event(future, default=None):
+        """
+        Block on a `track_event` future.
+
+        :return: the future result, `default` if the transaction failed, was not
+            mined in time or did not emit the event
+        """
+        try:
+            result = future.result()
+        except TimeoutError:
+            logger.info('Waiting for transaction receipt timed out.')
+            return default
+        except ValueError as e:
+            logger.error(f'Waiting for transaction receipt failed: {e}')
+            return default
+        return default if result is None else result
 
     def is_tx_successful(self, tx_hash):
         receipt = self.get_tx_receipt(tx_hash)
@@ -107,7 +196,8 @@ class ContractBase(object):
                            timeout_callback=None, args=None, wait=False,
                            from_block='latest', to_block='latest'):
         """
-        Create a listener for the event choose.
+        Create a listener for the event choose. Listeners share the process wide
+        `EventDispatcher`, no thread is started per subscription.
 
         :param event_name: name of the event to subscribe, str
         :param timeout:
@@ -135,6 +225,48 @@ class ContractBase(object):
             blocking=wait
         )
 
+    def watch_event(self, event_name, callback, event_filter=None, args=None,
+                    from_block='latest'):
+        """
+        Deliver every matching event to `callback` until the returned subscription is
+        cancelled.
+
+        :param event_name: name of the event to watch, str
+        :param callback: called as `callback(event, *args)`
+        :param event_filter: dict event arg name -> value
+        :param args: list of extra arguments for the callback
+        :param from_block: int or 'latest'
+        :return: Subscription
+        """
+        return Web3Provider.get_event_dispatcher().subscribe(
+            getattr(self.events, event_name),
+            argument_filters=event_filter,
+            callback=callback,
+            once=False,
+            args=args,
+            from_block=from_block
+        )
+
+    def get_confirmed_event_stream(self, event_name, confirmations=None, event_filter=None,
+                                   from_block='latest'):
+        """
+        Return a reorg aware stream of the events that reached `confirmations` blocks,
+        see `ConfirmedEventStream`.
+
+        :param event_name: name of the event, str
+        :param confirmations: int, defaults to `ConfirmedEventStream.DEFAULT_CONFIRMATIONS`
+        :param event_filter: dict event arg name -> value
+        :param from_block: int or 'latest'
+        :return: ConfirmedEventStream
+        """
+        from cdt_utils.confirmed_event_stream import ConfirmedEventStream
+        return ConfirmedEventStream(
+            getattr(self.events, event_name),
+            confirmations=confirmations,
+            argument_filters=event_filter,
+            from_block=from_block
+        )
+
     def send_transaction(self, fn_name, fn_args, transact=None):
         """Calls a smart contract function using either `personal_sendTransaction` (if
         passphrase is available) or `ether_sendTransaction`.
@@ -148,7 +280,179 @@ class ContractBase(object):
         contract_function = CustomContractFunction(
             contract_fn
         )
-        return contract_function.transact(transact)
+        try:
+            tx_hash = contract_function.transact(transact)
+        except ValueError:
+            GasOracle.invalidate_estimate(contract_fn)
+            raise
+
+        GasOracle.watch_transaction(tx_hash, contract_fn)
+        return tx_hash
+
+    def call(self, fn_name, *args):
+        """
+        Call a view function of the contract. Functions listed in `CACHED_CALLS` are
+        read through `call_cache` and hit the node at most once per block for the
+        same args; a missed call is a single `eth_call` at 'latest', cached for the
+        block observed by the lookup, which the result is at least as fresh as.
+
+        :param fn_name: str the smart contract function name
+        :param args: arguments to pass to the function
+        :return: the function result
+        """
+        if fn_name not in self.CACHED_CALLS:
+            return getattr(self.contract_concise, fn_name)(*args)
+
+        value = self.get_cached_call(fn_name, args)
+        if value is CallCache.MISSING:
+            block_number = self.call_cache.block_number
+            value = getattr(self.contract_concise, fn_name)(*args)
+            self.cache_call(fn_name, args, value, block_number)
+        return value
+
+    def get_cached_call(self, fn_name, args):
+        """
+        Look up the cached result of a view call for the current block.
+
+        :param fn_name: str the smart contract function name
+        :param args: tuple arguments of the call
+        :return: the cached result or `CallCache.MISSING`
+        """
+        if fn_name not in self.CACHED_CALLS:
+            return CallCache.MISSING
+
+        self.watch_cache_invalidation()
+        self.call_cache.observe_block(Web3Provider.get_block_number())
+        return self.call_cache.get((self.name, fn_name, self._cache_args(args)))
+
+    def cache_call(self, fn_name, args, value, block_number):
+        """
+        Store the result of a view call read at `block_number`, only done for the
+        functions listed in `CACHED_CALLS`.
+        """
+        if fn_name in self.CACHED_CALLS and value is not None:
+            self.call_cache.put((self.name, fn_name, self._cache_args(args)), value, block_number)
+
+    @staticmethod
+    def multicall(calls, block_identifier='latest'):
+        """
+        Read many contract view functions in a single request.
+
+        The calls go in one `eth_call` through the Multicall contract when its address is
+        set in the `ContractHandler`, otherwise in one JSON-RPC batch when the provider
+        supports it. Cached results are used for `block_identifier='latest'` and the
+        results read are cached in turn.
+
+        :param calls: list of (ContractBase, function name, args tuple)
+        :param block_identifier: 'latest' or block number, int
+        :return: list of results in the order of `calls`, None for a failed call
+        """
+        use_cache = block_identifier == 'latest'
+        results = [None] * len(calls)
+        pending = []
+        for i, (contract, fn_name, args) in enumerate(calls):
+            value = contract.get_cached_call(fn_name, args) if use_cache else CallCache.MISSING
+            if value is CallCache.MISSING:
+                pending.append(i)
+            else:
+                results[i] = value
+
+        if not pending:
+            return results
+
+        contract_functions = [getattr(calls[i][0].contract.functions, calls[i][1])(*calls[i][2])
+                              for i in pending]
+        from cdt_utils.contract_handler import ContractHandler
+        multicall = ContractHandler.get_multicall()
+        if multicall:
+            block_number, values = multicall.aggregate(contract_functions, block_identifier)
+            if use_cache:
+                Web3Provider.observe_block(block_number)
+                ContractBase.call_cache.observe_block(block_number)
+        else:
+            # 'latest' reads are at least as fresh as the block observed by the lookups
+            block_number = ContractBase.call_cache.block_number if use_cache else None
+            values = ContractBase._batch_call(contract_functions, block_identifier)
+
+        for i, value in zip(pending, values):
+            results[i] = value
+            if use_cache:
+                contract, fn_name, args = calls[i]
+                contract.cache_call(fn_name, args, value, block_number)
+        return results
+
+    @staticmethod
+    def _batch_call(contract_functions, block_identifier):
+        provider = Web3Provider.get_web3().providers[0]
+        if hasattr(provider, 'batch'):
+            with provider.batch() as batch:
+                futures = [batch.add_call(contract_function, block_identifier)
+                           for contract_function in contract_functions]
+            calls = [future.result for future in futures]
+        else:
+            calls = [lambda f=contract_function: f.call(block_identifier=block_identifier)
+                     for contract_function in contract_functions]
+
+        values = []
+        for contract_function, call in zip(contract_functions, calls):
+            try:
+                values.append(call())
+            except Exception as e:
+                logger.debug(f'view call {contract_function.fn_name} failed: {e}')
+                values.append(None)
+        return values
+
+    def watch_cache_invalidation(self):
+        """
+        Subscribe, once per contract address, to the `CACHE_INVALIDATING_EVENTS` through
+        the event dispatcher so the cached calls they affect are dropped as soon as the
+        events are seen. Called on the first cached call of the contract.
+
+        :return: list of Subscription
+        """
+        key = (self.name, self.address)
+        with ContractBase._invalidation_lock:
+            subscriptions = ContractBase._invalidation_watches.get(key)
+            if subscriptions is not None:
+                return subscriptions
+            subscriptions = []
+            try:
+                for event_name in self.CACHE_INVALIDATING_EVENTS:
+                    subscriptions.append(
+                        self.watch_event(event_name, self._on_invalidating_event))
+            except Exception as e:
+                # cached calls still expire with every new block
+                logger.warning(f'cache invalidation events of {self.name} not watched: {e}')
+            ContractBase._invalidation_watches[key] = subscriptions
+            return subscriptions
+
+    def _on_invalidating_event(self, event):
+        Web3Provider.observe_block(event['blockNumber'])
+        self.invalidate_from_event(event)
+
+    def invalidate_from_event(self, event):
+        """
+        Drop the cached calls affected by a contract event, see
+        `CACHE_INVALIDATING_EVENTS`.
+
+        :param event: decoded event log, AttributeDict
+        """
+        for fn_name, arg_names in self.CACHE_INVALIDATING_EVENTS.get(event['event'], ()):
+            args = tuple(event['args'][name] for name in arg_names)
+            self.call_cache.invalidate(self.name, fn_name, self._cache_args(args))
+
+    @staticmethod
+    def _cache_args(args):
+        # The same bytes32/address can be passed as bytes or as hex str with or
+        # without prefix and in any case, they must map to the same cache key.
+        normalized = []
+        for arg in args:
+            if isinstance(arg, (bytes, bytearray)):
+                arg = Web3.toHex(arg)
+            if isinstance(arg, str):
+                arg = add_0x_prefix(arg.lower())
+            normalized.append(arg)
+        return tuple(normalized)
 
     def get_event_argument_names(self, event_name):
         event = getattr(self._contract.events, event_name, None)
@@ -8,6 +8,7 @@ import os
 from web3 import Web3
 from web3.contract import ConciseContract
 
+from contracts.multicall import Multicall
 from cdt_utils.keeper import Keeper
 from cdt_utils.web3_provider import Web3Provider
 
@@ -29,11 +30,26 @@ class ContractHandler(object):
     artifacts_path = None
     cdt_registry_address = None
     task_market_address = None
+    multicall_address = None
+    _multicall = None
 
     @staticmethod
-    def set_contract_address(cdt_registry_address, task_market_address):
+    def set_contract_address(cdt_registry_address, task_market_address, multicall_address=None):
         ContractHandler.cdt_registry_address = cdt_registry_address
         ContractHandler.task_market_address = task_market_address
+        ContractHandler.multicall_address = multicall_address
+        ContractHandler._multicall = None
+
+    @staticmethod
+    def get_multicall():
+        """
+        Return the Multicall aggregator of the network.
+
+        :return: Multicall instance, None if no Multicall address is set
+        """
+        if ContractHandler._multicall is None and ContractHandler.multicall_address:
+            ContractHandler._multicall = Multicall(ContractHandler.multicall_address)
+        return ContractHandler._multicall
 
     @staticmethod
     def set_artifacts_path(artifacts_path):
@@ -0,0 +1,225 @@
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import Future
+
+from eth_utils import add_0x_prefix, event_abi_to_log_topic
+from web3 import Web3
+from web3.utils.events import get_event_data
+
+from cdt_utils.timer_wheel import TimerWheel
+from cdt_utils.web3_provider import Web3Provider
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(value):
+    # Filters are given as bytes, checksum or lowercase hex while decoded logs carry
+    # bytes and checksum addresses, compare everything as lowercase 0x hex.
+    if isinstance(value, (bytes, bytearray)):
+        value = Web3.toHex(value)
+    if isinstance(value, str):
+        value = add_0x_prefix(value.lower())
+    return value
+
+
+class Subscription:
+    """Interest in the logs of one contract event, see `EventDispatcher.subscribe`."""
+    _ids = itertools.count()
+
+    def __init__(self, dispatcher, contract_event, argument_filters, callback, once,
+                 timeout_callback, args, from_block):
+        self.id = next(self._ids)
+        self.event_name = contract_event.event_name
+        self.address = contract_event.address.lower()
+        self.event_abi = contract_event._get_event_abi()
+        self.topic = Web3.toHex(event_abi_to_log_topic(self.event_abi))
+        self.argument_filters = dict()
+        for name, value in (argument_filters or {}).items():
+            if isinstance(value, (list, tuple, set)):
+                self.argument_filters[name] = {_normalize(v) for v in value}
+            else:
+                self.argument_filters[name] = {_normalize(value)}
+        self.callback = callback
+        self.once = once
+        self.timeout_callback = timeout_callback
+        self.args = args or []
+        # next block whose logs are delivered to this subscription
+        self.from_block = from_block
+        self.future = Future()
+        self._dispatcher = dispatcher
+
+    def matches(self, event):
+        return all(_normalize(event['args'].get(name)) in values
+                   for name, values in self.argument_filters.items())
+
+    def cancel(self):
+        """Stop the subscription, its future resolves with None if still pending."""
+        self._dispatcher.unsubscribe(self)
+
+    @property
+    def active(self):
+        return not self.future.done()
+
+
+class EventDispatcher:
+    """
+    Deliver contract event logs to many subscribers from a single thread.
+
+    Every subscription (contract event + argument filters) is registered here. On each
+    new block one `eth_getLogs` covering the addresses and event topics of all the
+    subscriptions is sent, the logs are decoded once and routed to the matching
+    subscriptions' callbacks and futures. Timeouts are tracked in a `TimerWheel`.
+    Over websocket or IPC the thread wakes up on the `newHeads` pushed by the node.
+
+    The thread only runs while there are subscriptions.
+    """
+    POLL_INTERVAL = 0.5
+
+    def __init__(self, web3, poll_interval=None):
+        self._web3 = web3
+        self._poll_interval = poll_interval if poll_interval else self.POLL_INTERVAL
+        self._subscriptions = dict()
+        self._timers = TimerWheel(tick=self._poll_interval)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._last_block = None
+
+    @property
+    def web3(self):
+        return self._web3
+
+    @property
+    def subscription_count(self):
+        return len(self._subscriptions)
+
+    def subscribe(self, contract_event, argument_filters=None, callback=None, once=True,
+                  timeout=None, timeout_callback=None, args=None, from_block='latest'):
+        """
+        Register a subscription to a contract event.
+
+        :param contract_event: web3 ContractEvent, e.g. `contract.events.TaskAdded`
+        :param argument_filters: dict event arg name -> value or list of accepted values
+        :param callback: called as `callback(event, *args)` for each matching event, and
+            as `callback(None, *args)` on timeout if there is no `timeout_callback`
+        :param once: bool, the subscription ends after the first matching event
+        :param timeout: float seconds after which the subscription ends, None never
+        :param timeout_callback: called as `timeout_callback(*args)` on timeout
+        :param args: list of extra arguments for the callbacks
+        :param from_block: first block to look at, int or 'latest'
+        :return: Subscription, its `future` resolves with the first matching event for
+            one-shot subscriptions, with None on timeout or cancel
+        """
+        if from_block in (None, 'latest'):
+            from_block = Web3Provider.get_block_number(max_age=0)
+
+        subscription = Subscription(self, contract_event, argument_filters, callback, once,
+                                    timeout_callback, args, from_block)
+        with self._lock:
+            self._subscriptions[subscription.id] = subscription
+            if timeout is not None:
+                self._timers.schedule(subscription.id, time.time() + timeout)
+
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True,
+                                                name='event-dispatcher')
+                self._thread.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self._remove(subscription)
+        if not subscription.future.done():
+            subscription.future.set_result(None)
+
+    def _remove(self, subscription):
+        with self._lock:
+            self._timers.cancel(subscription.id)
+            return self._subscriptions.pop(subscription.id, None) is not None
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._subscriptions:
+                    self._thread = None
+                    return
+
+            try:
+                self._poll()
+            except Exception as e:
+                logger.debug(f'Error while fetching event logs: {e}')
+
+            for subscription_id in self._timers.advance():
+                self._expire(subscription_id)
+            Web3Provider.wait_for_block(self._last_block, self._poll_interval)
+
+    def _poll(self):
+        block_number = Web3Provider.get_block_number(max_age=self._poll_interval)
+        self._last_block = block_number
+        with self._lock:
+            subscriptions = [subscription for subscription in self._subscriptions.values()
+                             if subscription.from_block <= block_number]
+        if not subscriptions:
+            return
+
+        logs = self._web3.eth.getLogs({
+            'fromBlock': min(subscription.from_block for subscription in subscriptions),
+            'toBlock': block_number,
+            'address': sorted({Web3.toChecksumAddress(subscription.address)
+                               for subscription in subscriptions}),
+            'topics': [sorted({subscription.topic for subscription in subscriptions})]
+        })
+
+        for log in logs:
+            self._dispatch(log, subscriptions)
+
+        for subscription in subscriptions:
+            subscription.from_block = max(subscription.from_block, block_number + 1)
+
+    def _dispatch(self, log, subscriptions):
+        address = log['address'].lower()
+        topic = Web3.toHex(log['topics'][0]) if log['topics'] else None
+        decoded = dict()
+        for subscription in subscriptions:
+            if (subscription.address != address or subscription.topic != topic or
+                    log['blockNumber'] < subscription.from_block or not subscription.active):
+                continue
+
+            if topic not in decoded:
+                try:
+                    decoded[topic] = get_event_data(subscription.event_abi, log)
+                except Exception as e:
+                    logger.debug(f'Could not decode {subscription.event_name} log: {e}')
+                    decoded[topic] = None
+            event = decoded[topic]
+            if event is None or not subscription.matches(event):
+                continue
+
+            if subscription.once:
+                if not self._remove(subscription):
+                    continue
+                subscription.future.set_result(event)
+            self._call(subscription.callback, event, *subscription.args)
+
+    def _expire(self, subscription_id):
+        with self._lock:
+            subscription = self._subscriptions.pop(subscription_id, None)
+        if subscription is None:
+            return
+
+        logger.debug(f'subscription to {subscription.event_name} timed out')
+        if not subscription.future.done():
+            subscription.future.set_result(None)
+        if subscription.timeout_callback is not None:
+            self._call(subscription.timeout_callback, *subscription.args)
+        elif subscription.callback is not None:
+            self._call(subscription.callback, None, *subscription.args)
+
+    @staticmethod
+    def _call(callback, *args):
+        if callback is None:
+            return
+        try:
+            callback(*args)
+        except Exception as e:
+            logger.error(f'Error in event callback: {e}', exc_info=True)
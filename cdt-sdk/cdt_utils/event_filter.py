@@ -1,6 +1,11 @@
 import logging
+import threading
 import time
 
+from web3.middleware.pythonic import log_entry_formatter
+from web3.utils.events import get_event_data
+from web3.utils.filters import construct_data_filter_regex, construct_event_filter_params
+
 from cdt_utils.web3_provider import Web3Provider
 
 logger = logging.getLogger(__name__)
@@ -73,3 +78,121 @@ class EventFilter:
 
         return []
 
+
+class SubscriptionEventFilter:
+    """
+    `EventFilter` fed by an `eth_subscribe('logs')` subscription instead of a polled
+    node filter, for websocket and IPC providers.
+
+    Matching logs are pushed by the node as soon as they are mined and queued until
+    `get_new_entries` is called. `get_all_entries` also returns the logs of the block
+    range mined before the subscription, read once with `eth_getLogs`.
+    """
+
+    def __init__(self, event_name, event, argument_filters, from_block, to_block,
+                 poll_interval=None, client=None):
+        self.event_name = event_name
+        self.event = event
+        self.argument_filters = argument_filters
+        self.block_range = (from_block, to_block)
+        self._client = client if client else Web3Provider.get_subscription_client()
+        self._event_abi = event._get_event_abi()
+        self._condition = threading.Condition()
+        self._new_entries = []
+        self._entries = []
+        self._entry_keys = set()
+        self._subscription = None
+        self._create_filter()
+
+    @property
+    def filter_id(self):
+        return self._subscription.server_id if self._subscription else None
+
+    def uninstall(self):
+        if self._subscription:
+            self._subscription.cancel()
+            self._subscription = None
+
+    def set_poll_interval(self, interval):
+        # Entries are pushed, there is nothing to poll.
+        pass
+
+    def recreate_filter(self):
+        self.uninstall()
+        self._create_filter()
+
+    def _create_filter(self):
+        data_filter_set, filter_params = construct_event_filter_params(
+            self._event_abi,
+            contract_address=self.event.address,
+            argument_filters=dict(self.argument_filters or {}),
+            fromBlock=self.block_range[0],
+            toBlock=self.block_range[1]
+        )
+        self._data_filter_regex = construct_data_filter_regex(data_filter_set) \
+            if any(data_filter_set) else None
+        self._filter_params = filter_params
+        subscription_params = {key: filter_params[key] for key in ('address', 'topics')
+                               if filter_params.get(key)}
+        self._subscription = self._client.subscribe('logs', subscription_params,
+                                                    callback=self._on_log)
+
+        from_block = self.block_range[0]
+        if from_block not in (None, 'latest', 'pending'):
+            logs = Web3Provider.get_web3().eth.getLogs(filter_params)
+            with self._condition:
+                for log in logs:
+                    self._add(dict(log))
+
+    def _on_log(self, log):
+        to_block = self.block_range[1]
+        if isinstance(to_block, int) and int(log['blockNumber'], 16) > to_block:
+            return
+        with self._condition:
+            self._add(log_entry_formatter(log))
+            self._condition.notify_all()
+
+    def _add(self, log):
+        if log.get('removed'):
+            return
+        if self._data_filter_regex and not self._data_filter_regex.match(log['data']):
+            return
+        key = (log['blockNumber'], log['logIndex'])
+        if key in self._entry_keys:
+            return
+        entry = get_event_data(self._event_abi, log)
+        self._entry_keys.add(key)
+        self._entries.append(entry)
+        self._new_entries.append(entry)
+
+    def wait(self, timeout=None):
+        """Block until there are new entries or `timeout` seconds passed, return them."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._new_entries, timeout)
+        return self.get_new_entries()
+
+    def get_new_entries(self, max_tries=1):
+        with self._condition:
+            entries, self._new_entries = self._new_entries, []
+        if entries:
+            logger.debug(f'found event logs: event-name={self.event_name}, '
+                         f'range={self.block_range}, logs={entries}')
+        return entries
+
+    def get_all_entries(self, max_tries=1):
+        with self._condition:
+            self._new_entries = []
+            return list(self._entries)
+
+
+def make_event_filter(event_name, event, argument_filters, from_block, to_block,
+                      poll_interval=None):
+    """
+    Return a push based `SubscriptionEventFilter` when the keeper is reached over
+    websocket or IPC, a polled `EventFilter` otherwise.
+    """
+    if Web3Provider.get_subscription_client() is not None:
+        return SubscriptionEventFilter(event_name, event, argument_filters, from_block,
+                                       to_block, poll_interval)
+    return EventFilter(event_name, event, argument_filters, from_block, to_block,
+                       poll_interval)
@@ -3,11 +3,10 @@
 
 import logging
 import time
-from datetime import datetime
-from threading import Thread
 
 from cdt_utils.contract_handler import ContractHandler
-from cdt_utils.event_filter import EventFilter
+from cdt_utils.event_filter import make_event_filter
+from cdt_utils.web3_provider import Web3Provider
 
 logger = logging.getLogger(__name__)
 
@@ -23,14 +22,20 @@ class EventListener(object):
         self.filters = filters if filters else {}
         self.from_block = from_block if from_block is not None else 'latest'
         self.to_block = to_block if to_block is not None else 'latest'
-        self.event_filter = self.make_event_filter()
-        self.event_filter.poll_interval = 0.5
+        self._event_filter = None
         self.timeout = 600  # seconds
         self.args = args
 
+    @property
+    def event_filter(self):
+        """Node side filter of the event, only created when asked for."""
+        if self._event_filter is None:
+            self._event_filter = self.make_event_filter()
+        return self._event_filter
+
     def make_event_filter(self):
         """Create a new event filter."""
-        event_filter = EventFilter(
+        event_filter = make_event_filter(
             self.event_name,
             self.event,
             self.filters,
@@ -43,6 +48,7 @@ class EventListener(object):
     def listen_once(self, callback, timeout=None, timeout_callback=None, start_time=None,
                     blocking=False):
         """
+        Wait for the first matching event through the process wide `EventDispatcher`.
 
         :param callback: a callback function that takes one argument the event dict
         :param timeout: float timeout in seconds
@@ -55,74 +61,40 @@ class EventListener(object):
         if blocking:
             assert timeout is not None, '`timeout` argument is required when `blocking` is True.'
 
-        events = []
-        original_callback = callback
-
-        def _callback(event, *args):
-            events.append(event)
-            if original_callback:
-                original_callback(event, *args)
-
+        subscription = self.subscribe(callback, timeout=timeout, timeout_callback=timeout_callback,
+                                      start_time=start_time, once=True)
         if blocking:
-            callback = _callback
-
-        # TODO Review where to close this threads.
-        Thread(
-            target=self.watch_one_event,
-            args=(self.event_filter,
-                  callback,
-                  timeout_callback,
-                  timeout if timeout is not None else self.timeout,
-                  self.args,
-                  start_time),
-            daemon=True,
-        ).start()
-        if blocking:
-            while not events:
-                time.sleep(0.2)
-
-            return events[0]
+            return subscription.future.result()
 
         return None
 
-    @staticmethod
-    def watch_one_event(event_filter, callback, timeout_callback, timeout, args,
-                        start_time=None):
+    def subscribe(self, callback, timeout=None, timeout_callback=None, start_time=None,
+                  once=False):
         """
-        Start to watch one event.
+        Deliver the matching events to `callback` until the subscription is cancelled
+        or times out.
 
-        :param event_filter:
-        :param callback:
-        :param timeout_callback:
-        :param timeout:
-        :param args:
-        :param start_time:
-        :return:
+        :param callback: called as `callback(event, *args)`
+        :param timeout: float timeout in seconds, defaults to `self.timeout`, 0 never
+            times out
+        :param timeout_callback: a callback function when timeout expires
+        :param start_time: float start time in seconds used for calculating timeout
+        :param once: bool, stop after the first event
+        :return: Subscription
         """
-        if timeout and not start_time:
-            start_time = int(datetime.now().timestamp())
-
-        if not args:
-            args = []
-
-        while True:
-            try:
-                events = event_filter.get_all_entries()
-                if events:
-                    callback(events[0], *args)
-                    return
-
-            except (ValueError, Exception) as err:
-                # ignore error, but log it
-                logger.debug(f'Got error grabbing keeper events: {str(err)}')
-
-            time.sleep(0.5)
-            if timeout:
-                elapsed = int(datetime.now().timestamp()) - start_time
-                if elapsed > timeout:
-                    if timeout_callback is not None:
-                        timeout_callback(*args)
-                    elif callback is not None:
-                        callback(None, *args)
-                    break
+        timeout = timeout if timeout is not None else self.timeout
+        if not timeout:
+            timeout = None
+        elif start_time:
+            timeout = max(start_time + timeout - time.time(), 0)
 
+        return Web3Provider.get_event_dispatcher().subscribe(
+            self.event,
+            argument_filters=self.filters,
+            callback=callback,
+            once=once,
+            timeout=timeout,
+            timeout_callback=timeout_callback,
+            args=self.args,
+            from_block=self.from_block
+        )
@@ -0,0 +1,124 @@
+import logging
+import threading
+import time
+
+from cdt_utils.web3_provider import Web3Provider
+
+logger = logging.getLogger(__name__)
+
+
+class GasOracle:
+    """
+    Cached gas price and gas estimates.
+
+    The network gas price is cached for the pushed head block, or `GAS_PRICE_MAX_AGE`
+    seconds without a subscription client, see `get_gas_price`. Gas estimates are cached per
+    (contract, function) for the functions in `FIXED_COST_FUNCTIONS`, whose cost does
+    not depend much on the arguments or the state; the cached value keeps the highest
+    estimate seen plus `ESTIMATE_MARGIN` and is dropped when a transaction using it
+    fails, so the next one is estimated again.
+
+    `estimateGas` is also the check that a transaction would not revert (e.g. a
+    `grantPermission` by an account that does not own the cdt), so a cached estimate is
+    only used after a single `eth_call` of the transaction succeeded.
+    """
+    # functions with variable length arguments (e.g. `addAuthority` and its name) must
+    # not be listed, a cached estimate could run out of gas
+    FIXED_COST_FUNCTIONS = ('grantPermission', 'addJob')
+    ESTIMATE_MARGIN = 1.2
+    GAS_PRICE_MAX_AGE = 15.0
+
+    _lock = threading.Lock()
+    _gas_price = None
+    _gas_price_block = None
+    _gas_price_time = 0.0
+    _estimates = dict()
+
+    @staticmethod
+    def get_gas_price(web3):
+        """
+        Return the network gas price without asking the node for the current block.
+
+        With a subscription client the price is cached until a new head is pushed.
+        Otherwise it is cached for `GAS_PRICE_MAX_AGE` seconds, so a price read just
+        before a sudden rise can be used for that long; a transaction priced too low
+        is only mined later, while polling the block number would cost a request per
+        transaction.
+
+        :param web3: Web3 instance
+        :return: gas price in wei, int
+        """
+        head_block = Web3Provider.get_pushed_block_number()
+        now = time.time()
+        with GasOracle._lock:
+            if GasOracle._gas_price is not None:
+                if head_block is not None:
+                    if GasOracle._gas_price_block == head_block:
+                        return GasOracle._gas_price
+                elif now - GasOracle._gas_price_time < GasOracle.GAS_PRICE_MAX_AGE:
+                    return GasOracle._gas_price
+
+        gas_price = web3.eth.gasPrice
+        with GasOracle._lock:
+            GasOracle._gas_price = gas_price
+            GasOracle._gas_price_block = head_block
+            GasOracle._gas_price_time = now
+        return gas_price
+
+    @staticmethod
+    def _estimate_key(contract_function):
+        return contract_function.address.lower(), contract_function.fn_name
+
+    @staticmethod
+    def estimate_gas(contract_function, transaction=None):
+        """
+        Return the gas limit to use for a contract function transaction.
+
+        Raises like `estimateGas` when the transaction would revert.
+
+        :param contract_function: web3 ContractFunction with its arguments set
+        :param transaction: dict transaction without `passphrase`/`account_key`
+        :return: gas, int
+        """
+        key = GasOracle._estimate_key(contract_function)
+        is_fixed_cost = contract_function.fn_name in GasOracle.FIXED_COST_FUNCTIONS
+        if is_fixed_cost:
+            with GasOracle._lock:
+                gas = GasOracle._estimates.get(key)
+            if gas:
+                # pre-flight: one execution instead of the estimateGas search
+                contract_function.call(transaction)
+                return gas
+
+        gas = contract_function.estimateGas(transaction)
+        if is_fixed_cost:
+            gas = int(gas * GasOracle.ESTIMATE_MARGIN)
+            with GasOracle._lock:
+                GasOracle._estimates[key] = max(gas, GasOracle._estimates.get(key, 0))
+                gas = GasOracle._estimates[key]
+        return gas
+
+    @staticmethod
+    def invalidate_estimate(contract_function):
+        """Drop the cached gas estimate of a contract function."""
+        with GasOracle._lock:
+            if GasOracle._estimates.pop(GasOracle._estimate_key(contract_function), None):
+                logger.debug(f'dropped gas estimate of {contract_function.fn_name}')
+
+    @staticmethod
+    def watch_transaction(tx_hash, contract_function):
+        """
+        Drop the cached estimate of a fixed cost function if its transaction fails once
+        mined, e.g. because it ran out of gas.
+
+        :param tx_hash: hash of the transaction
+        :param contract_function: web3 ContractFunction the transaction was sent for
+        """
+        if contract_function.fn_name not in GasOracle.FIXED_COST_FUNCTIONS:
+            return
+
+        def _check_receipt(future):
+            if future.exception() is None and future.result().status == 0:
+                GasOracle.invalidate_estimate(contract_function)
+
+        Web3Provider.get_receipt_tracker().track(tx_hash).add_done_callback(_check_receipt)
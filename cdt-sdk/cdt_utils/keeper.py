@@ -10,6 +10,7 @@ from eth_utils import big_endian_to_int
 from contracts.cdtregistry import CDTRegistry
 from contracts.taskmarket import TaskMarket
 
+from cdt_utils.contract_base import ContractBase
 from cdt_utils.generic_contract import GenericContract
 from cdt_utils.utils import (add_ethereum_prefix_and_hash_msg, generate_multi_value_hash,
                                 split_signature)
@@ -164,6 +165,32 @@ class Keeper(object):
 
         return None
 
+    @staticmethod
+    def get_call_cache_stats():
+        """
+        Return the hit/miss counters of the contract view call cache.
+
+        :return: dict
+        """
+        return ContractBase.call_cache.stats()
+
+    @staticmethod
+    def multicall(calls, block_identifier='latest'):
+        """
+        Read many `CDTRegistry`/`TaskMarket` view functions in a single request.
+
+        Example:
+            owner, granted = keeper.multicall([
+                (keeper.cdt_registry, 'getCDTOwner', (cdt,)),
+                (keeper.cdt_registry, 'getPermission', (cdt, algorithm_cdt)),
+            ])
+
+        :param calls: list of (contract, function name, args tuple)
+        :param block_identifier: 'latest' or block number, int
+        :return: list of decoded results in the order of `calls`, None for a failed call
+        """
+        return ContractBase.multicall(calls, block_identifier)
+
     @staticmethod
     def generate_multi_value_hash(types, values):
         return generate_multi_value_hash(types, values)
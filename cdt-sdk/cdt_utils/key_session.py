@@ -0,0 +1,82 @@
+import logging
+import threading
+import time
+
+from eth_account import Account as LocalAccountFactory
+
+logger = logging.getLogger(__name__)
+
+
+class KeySession:
+    """
+    Opt-in in-memory store of the decrypted keys of unlocked accounts.
+
+    Decrypting a keystore (scrypt/pbkdf2) takes hundreds of milliseconds. Once an
+    account is unlocked its `LocalAccount` is kept here until the session expires or is
+    locked again, and every `Wallet` signing for that address reuses it instead of
+    decrypting the key again. Nothing is kept unless `unlock` is called.
+    """
+    _sessions = dict()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def unlock(address, key, password=None, ttl=300):
+        """
+        Decrypt the key of an account once and keep it for `ttl` seconds.
+
+        :param address: account address, hex str
+        :param key: encrypted keystore json or private key
+        :param password: keystore password, None if `key` is a private key
+        :param ttl: float seconds the key is kept, None keeps it until `lock`
+        :return: LocalAccount
+        """
+        private_key = LocalAccountFactory.decrypt(key, password) if password else key
+        local_account = LocalAccountFactory.privateKeyToAccount(private_key)
+        assert local_account.address.lower() == address.lower(), \
+            'the unlocked key does not belong to the account address.'
+
+        expires_at = time.time() + ttl if ttl is not None else None
+        with KeySession._lock:
+            KeySession._sessions[address.lower()] = (local_account, expires_at)
+        logger.debug(f'key session opened for {address}, ttl {ttl}')
+        return local_account
+
+    @staticmethod
+    def get(address):
+        """
+        Return the unlocked `LocalAccount` of an address.
+
+        :param address: account address, hex str
+        :return: LocalAccount or None if the account is not unlocked or the session expired
+        """
+        if not address:
+            return None
+
+        with KeySession._lock:
+            session = KeySession._sessions.get(address.lower())
+            if not session:
+                return None
+
+            local_account, expires_at = session
+            if expires_at is not None and expires_at < time.time():
+                del KeySession._sessions[address.lower()]
+                logger.debug(f'key session expired for {address}')
+                return None
+
+            return local_account
+
+    @staticmethod
+    def lock(address):
+        """Drop the decrypted key of an address."""
+        with KeySession._lock:
+            KeySession._sessions.pop(address.lower(), None)
+
+    @staticmethod
+    def lock_all():
+        """Drop every decrypted key."""
+        with KeySession._lock:
+            KeySession._sessions.clear()
+
+    @staticmethod
+    def is_unlocked(address):
+        return KeySession.get(address) is not None
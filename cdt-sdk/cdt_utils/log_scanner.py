@@ -0,0 +1,138 @@
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from web3.utils.events import get_event_data
+from web3.utils.filters import construct_data_filter_regex, construct_event_filter_params
+
+from cdt_utils.web3_provider import Web3Provider
+
+logger = logging.getLogger(__name__)
+
+# Messages of the errors nodes return when a range holds too many logs or takes too long.
+RANGE_ERRORS = ('more than', 'limit exceeded', 'block range', 'too many', 'too large',
+                'response size', 'timeout', 'timed out', 'exceed')
+
+
+def is_range_error(error):
+    """Return True if an `eth_getLogs` error means the block range should be smaller."""
+    if 'timeout' in type(error).__name__.lower():
+        return True
+    message = str(error).lower()
+    return any(text in message for text in RANGE_ERRORS)
+
+
+class LogScanner:
+    """
+    Historical `eth_getLogs` scanner over arbitrarily long block ranges.
+
+    The range is split into chunks fetched by a bounded pool of threads. A chunk that
+    fails because it holds too many logs or times out is split in two and retried,
+    and the chunk size used for the following chunks shrinks; it grows again while
+    chunks come back sparse. Chunks are yielded in block order and at most
+    `max_workers` of them are in memory, so a full history scan streams in constant
+    memory.
+
+    Example:
+        scanner = LogScanner()
+        for event in scanner.scan(registry.events.CDTAttributeRegistered,
+                                  argument_filters={'_owner': owner}):
+            ...
+    """
+    INITIAL_CHUNK_SIZE = 2000
+    MIN_CHUNK_SIZE = 1
+    MAX_CHUNK_SIZE = 100000
+    # a chunk with more logs than this shrinks the next ones, with less than a
+    # quarter of it the next ones grow
+    TARGET_LOGS_PER_CHUNK = 2000
+    MAX_WORKERS = 4
+
+    def __init__(self, web3=None, chunk_size=None, max_workers=None):
+        self._web3 = web3
+        self.chunk_size = chunk_size if chunk_size else self.INITIAL_CHUNK_SIZE
+        self.max_workers = max_workers if max_workers else self.MAX_WORKERS
+
+    @property
+    def web3(self):
+        return self._web3 if self._web3 else Web3Provider.get_web3()
+
+    def scan(self, contract_event, from_block=0, to_block='latest', argument_filters=None):
+        """
+        Yield the decoded events of a contract event over a block range.
+
+        :param contract_event: web3 ContractEvent, e.g. `contract.events.TaskAdded`
+        :param from_block: int
+        :param to_block: int or 'latest'
+        :param argument_filters: dict event arg name -> value
+        :return: generator of decoded events in block order
+        """
+        event_abi = contract_event._get_event_abi()
+        data_filter_set, filter_params = construct_event_filter_params(
+            event_abi,
+            contract_address=contract_event.address,
+            argument_filters=dict(argument_filters or {}))
+        data_filter_regex = construct_data_filter_regex(data_filter_set) \
+            if any(data_filter_set) else None
+
+        for _, _, logs in self.scan_chunks(filter_params, from_block, to_block):
+            for log in logs:
+                if data_filter_regex and not data_filter_regex.match(log['data']):
+                    continue
+                yield get_event_data(event_abi, log)
+
+    def scan_chunks(self, filter_params, from_block=0, to_block='latest'):
+        """
+        Yield the raw logs of a filter chunk by chunk.
+
+        :param filter_params: dict `address`/`topics` of the `eth_getLogs` filter
+        :param from_block: int
+        :param to_block: int or 'latest'
+        :return: generator of (chunk first block, chunk last block, list of logs) in
+            block order, the chunks cover the whole range
+        """
+        if to_block in (None, 'latest'):
+            to_block = Web3Provider.get_block_number(max_age=0)
+        params = {key: value for key, value in filter_params.items()
+                  if key not in ('fromBlock', 'toBlock')}
+
+        next_block = from_block
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            def _submit(start, end, index=None):
+                future = executor.submit(self._get_logs, params, start, end)
+                if index is None:
+                    pending.append((start, end, future))
+                else:
+                    pending.insert(index, (start, end, future))
+
+            while pending or next_block <= to_block:
+                while len(pending) < self.max_workers and next_block <= to_block:
+                    end = min(next_block + self.chunk_size - 1, to_block)
+                    _submit(next_block, end)
+                    next_block = end + 1
+
+                start, end, future = pending.popleft()
+                try:
+                    logs = future.result()
+                except Exception as e:
+                    if not is_range_error(e) or start == end:
+                        raise
+                    middle = (start + end) // 2
+                    self.chunk_size = max(self.MIN_CHUNK_SIZE, (end - start + 1) // 2)
+                    logger.debug(f'getLogs {start}-{end} failed ({e}), '
+                                 f'chunk size now {self.chunk_size}')
+                    _submit(middle + 1, end, 0)
+                    _submit(start, middle, 0)
+                    continue
+
+                self._adapt(len(logs), end - start + 1)
+                yield start, end, logs
+
+    def _get_logs(self, params, start, end):
+        return self.web3.eth.getLogs(dict(params, fromBlock=start, toBlock=end))
+
+    def _adapt(self, log_count, block_count):
+        if log_count > self.TARGET_LOGS_PER_CHUNK:
+            self.chunk_size = max(self.MIN_CHUNK_SIZE, block_count // 2)
+        elif log_count < self.TARGET_LOGS_PER_CHUNK // 4 and block_count >= self.chunk_size:
+            self.chunk_size = min(self.MAX_CHUNK_SIZE, self.chunk_size * 2)
@@ -0,0 +1,161 @@
+import heapq
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+NONCE_ERRORS = ('nonce too low', 'replacement transaction underpriced', 'incorrect nonce',
+                'the tx doesn\'t have the correct nonce')
+# the node already has this exact transaction, sending it again must not re-sign it
+KNOWN_TX_ERRORS = ('known transaction', 'already known')
+
+
+def is_nonce_error(error):
+    """Return True if a `sendRawTransaction` error means our nonce view is stale."""
+    message = str(error).lower()
+    return any(text in message for text in NONCE_ERRORS)
+
+
+def is_known_tx_error(error):
+    """Return True if a `sendRawTransaction` error means the node already accepted the tx."""
+    message = str(error).lower()
+    return any(text in message for text in KNOWN_TX_ERRORS)
+
+
+class _AccountNonces:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.next_nonce = None
+        self.released = []
+        # reserved nonces whose transaction was neither sent nor released yet
+        self.outstanding = set()
+
+
+class NonceManager:
+    """
+    Per address nonce allocator shared by every sender of the process.
+
+    Nonces are reserved under a per address lock, so concurrent senders (threads or
+    coroutines of an event loop, the critical sections never wait on anything but the
+    first `getTransactionCount`) get consecutive nonces and can send back-to-back
+    without waiting for confirmations. A nonce whose transaction could not be sent is
+    released and handed out again before any new one, so a failed send does not leave
+    a gap that blocks the following transactions. On nonce errors the allocator is
+    re-synced with the node's pending transaction count.
+
+    Senders call `mark_sent` or `release` for every reserved nonce, a re-sync never
+    hands out again a nonce still held by another sender.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._accounts = dict()
+
+    def _account(self, address):
+        with self._lock:
+            return self._accounts.setdefault(address.lower(), _AccountNonces())
+
+    def reserve(self, web3, address):
+        """
+        Reserve the next nonce of an address.
+
+        :param web3: Web3 instance
+        :param address: sender address, hex str
+        :return: nonce, int
+        """
+        account = self._account(address)
+        with account.lock:
+            if account.next_nonce is None:
+                account.next_nonce = web3.eth.getTransactionCount(address, 'pending')
+
+            if account.released:
+                nonce = heapq.heappop(account.released)
+            else:
+                nonce = account.next_nonce
+                account.next_nonce += 1
+            account.outstanding.add(nonce)
+            return nonce
+
+    def mark_sent(self, address, nonce):
+        """
+        Record that the transaction of a reserved nonce reached the node.
+
+        :param address: sender address, hex str
+        :param nonce: int
+        """
+        account = self._account(address)
+        with account.lock:
+            account.outstanding.discard(nonce)
+
+    def release(self, address, nonce):
+        """
+        Give back a reserved nonce whose transaction was not sent, it is reused by the
+        next `reserve`.
+
+        :param address: sender address, hex str
+        :param nonce: int
+        """
+        account = self._account(address)
+        with account.lock:
+            account.outstanding.discard(nonce)
+            if account.next_nonce is None or nonce >= account.next_nonce:
+                return
+            if nonce not in account.released:
+                heapq.heappush(account.released, nonce)
+
+    def resync(self, web3, address):
+        """
+        Re-sync the allocator of an address with the node's pending transaction count.
+
+        The counter only moves forward, so the nonces reserved by other senders are never
+        handed out twice. The released nonces the node already consumed are dropped, and
+        when the node waits on a nonce below the counter that nobody holds (its
+        transaction was dropped) that nonce is queued to be reused first.
+
+        :param web3: Web3 instance
+        :param address: sender address, hex str
+        :return: the next nonce `reserve` hands out, int
+        """
+        account = self._account(address)
+        with account.lock:
+            pending_count = web3.eth.getTransactionCount(address, 'pending')
+            logger.debug(f'nonce resync for {address}: local {account.next_nonce}, '
+                         f'node pending {pending_count}')
+            if account.next_nonce is None or pending_count > account.next_nonce:
+                account.next_nonce = pending_count
+            account.released = [nonce for nonce in account.released if nonce >= pending_count]
+            account.outstanding = {nonce for nonce in account.outstanding
+                                   if nonce >= pending_count}
+            if pending_count < account.next_nonce and \
+                    pending_count not in account.outstanding and \
+                    pending_count not in account.released:
+                account.released.append(pending_count)
+            heapq.heapify(account.released)
+            return account.released[0] if account.released else account.next_nonce
+
+    def get_gaps(self, address):
+        """Return the released nonces that are still waiting to be reused, list of int."""
+        account = self._account(address)
+        with account.lock:
+            return sorted(account.released)
+
+    def get_stuck_nonces(self, web3, address):
+        """
+        Return the nonces sent but not mined yet, i.e. between the mined and the pending
+        transaction counts of the node.
+
+        :param web3: Web3 instance
+        :param address: sender address, hex str
+        :return: list of int
+        """
+        mined_count = web3.eth.getTransactionCount(address, 'latest')
+        pending_count = web3.eth.getTransactionCount(address, 'pending')
+        return list(range(mined_count, pending_count))
+
+    def reset(self, address=None):
+        """Forget the state of an address, or of every address."""
+        with self._lock:
+            if address is None:
+                self._accounts.clear()
+            else:
+                self._accounts.pop(address.lower(), None)
@@ -0,0 +1,151 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+from web3 import Web3
+from web3.datastructures import AttributeDict
+from web3.middleware.pythonic import receipt_formatter
+
+from cdt_utils.web3_provider import Web3Provider
+
+logger = logging.getLogger(__name__)
+
+
+class ReceiptTracker:
+    """
+    Wait for transaction receipts with a single polling thread.
+
+    Instead of every sender polling `eth_getTransactionReceipt` on its own, pending
+    transaction hashes are registered here. One background thread watches the block
+    number and, on each new block, fetches the receipts of all pending transactions
+    together (in one JSON-RPC batch when the provider supports it). Each transaction
+    gets a future that resolves with its receipt.
+
+    The thread only runs while there are pending transactions.
+    """
+    POLL_INTERVAL = 0.5
+    DEFAULT_TIMEOUT = 600
+
+    def __init__(self, web3, poll_interval=None):
+        self._web3 = web3
+        self._poll_interval = poll_interval if poll_interval else self.POLL_INTERVAL
+        self._pending = dict()
+        self._unchecked = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._last_block = None
+
+    @staticmethod
+    def _key(tx_hash):
+        return Web3.toHex(tx_hash) if isinstance(tx_hash, (bytes, bytearray)) \
+            else tx_hash.lower()
+
+    def track(self, tx_hash, timeout=None):
+        """
+        Start tracking a transaction.
+
+        :param tx_hash: hash of the transaction, bytes or hex str
+        :param timeout: float seconds after which the future fails with `TimeoutError`
+        :return: Future resolved with the transaction receipt
+        """
+        key = self._key(tx_hash)
+        deadline = time.time() + (timeout if timeout is not None else self.DEFAULT_TIMEOUT)
+        with self._lock:
+            if key in self._pending:
+                future, current_deadline = self._pending[key]
+                self._pending[key] = (future, max(deadline, current_deadline))
+            else:
+                future = Future()
+                self._pending[key] = (future, deadline)
+                self._unchecked.add(key)
+
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True,
+                                                name='receipt-tracker')
+                self._thread.start()
+        return future
+
+    def wait(self, tx_hash, timeout=20):
+        """
+        Block until the receipt of a transaction is available.
+
+        :param tx_hash: hash of the transaction, bytes or hex str
+        :param timeout: float seconds
+        :return: Tx receipt
+        :raise TimeoutError: if the transaction is not mined within `timeout`
+        """
+        return self.track(tx_hash, timeout).result(timeout)
+
+    @property
+    def web3(self):
+        return self._web3
+
+    @property
+    def pending_count(self):
+        return len(self._pending)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._thread = None
+                    return
+                pending = list(self._pending)
+                unchecked, self._unchecked = self._unchecked, set()
+
+            try:
+                block_number = Web3Provider.get_block_number(max_age=self._poll_interval)
+                if block_number != self._last_block:
+                    self._last_block = block_number
+                    self._fetch_receipts(pending)
+                elif unchecked:
+                    self._fetch_receipts(list(unchecked))
+            except Exception as e:
+                logger.debug(f'Error while fetching transaction receipts: {e}')
+
+            self._expire()
+            Web3Provider.wait_for_block(self._last_block, self._poll_interval)
+
+    def _fetch_receipts(self, keys):
+        provider = self._web3.providers[0] if self._web3.providers else None
+        if hasattr(provider, 'batch'):
+            with provider.batch() as batch:
+                futures = [batch.add('eth_getTransactionReceipt', [key],
+                                     decoder=self._format_receipt) for key in keys]
+            receipts = [self._future_result(future) for future in futures]
+        else:
+            receipts = [self._web3.eth.getTransactionReceipt(key) for key in keys]
+
+        for key, receipt in zip(keys, receipts):
+            if receipt:
+                self._resolve(key, receipt)
+
+    @staticmethod
+    def _format_receipt(result):
+        if not result:
+            return None
+        return AttributeDict.recursive(receipt_formatter(result))
+
+    @staticmethod
+    def _future_result(future):
+        try:
+            return future.result()
+        except ValueError as e:
+            logger.debug(f'Could not fetch a transaction receipt: {e}')
+            return None
+
+    def _resolve(self, key, receipt):
+        with self._lock:
+            entry = self._pending.pop(key, None)
+        if entry and not entry[0].done():
+            entry[0].set_result(receipt)
+
+    def _expire(self):
+        now = time.time()
+        with self._lock:
+            expired = [key for key, (_, deadline) in self._pending.items() if deadline < now]
+            entries = [self._pending.pop(key) for key in expired]
+        for key, (future, _) in zip(expired, entries):
+            if not future.done():
+                future.set_exception(TimeoutError(f'No receipt for transaction {key}'))
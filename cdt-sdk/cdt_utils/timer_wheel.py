@@ -0,0 +1,68 @@
+import math
+import threading
+import time
+
+
+class TimerWheel:
+    """
+    Hashed timing wheel for many timeouts checked from one thread.
+
+    Deadlines are rounded up to a `tick` and kept in the slot of that tick, so
+    scheduling and cancelling are O(1) and `advance` only looks at the slots of the
+    ticks that elapsed since the last call instead of at every pending timeout.
+    """
+
+    def __init__(self, tick=0.5, size=512):
+        self._tick = tick
+        self._size = size
+        self._slots = [dict() for _ in range(size)]
+        self._ticks = dict()
+        self._current_tick = int(time.time() / tick)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._ticks)
+
+    def schedule(self, key, deadline):
+        """
+        Schedule (or move) the timeout of `key`.
+
+        :param key: hashable
+        :param deadline: float timestamp, as returned by `time.time()`
+        """
+        with self._lock:
+            self._remove(key)
+            tick = max(int(math.ceil(deadline / self._tick)), self._current_tick + 1)
+            self._slots[tick % self._size][key] = tick
+            self._ticks[key] = tick
+
+    def cancel(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key):
+        tick = self._ticks.pop(key, None)
+        if tick is not None:
+            self._slots[tick % self._size].pop(key, None)
+
+    def advance(self, now=None):
+        """
+        Move the wheel to `now`.
+
+        :param now: float timestamp, defaults to the current time
+        :return: list of the keys whose deadline passed
+        """
+        target_tick = int((now if now is not None else time.time()) / self._tick)
+        expired = []
+        with self._lock:
+            # After a long pause every slot is visited once instead of once per tick.
+            steps = min(target_tick - self._current_tick, self._size)
+            for tick in range(self._current_tick + 1, self._current_tick + steps + 1):
+                slot = self._slots[tick % self._size]
+                for key, key_tick in list(slot.items()):
+                    if key_tick <= target_tick:
+                        del slot[key]
+                        del self._ticks[key]
+                        expired.append(key)
+            self._current_tick = max(self._current_tick, target_tick)
+        return expired
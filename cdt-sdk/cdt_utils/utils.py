@@ -6,13 +6,13 @@ import logging
 import os
 import time
 from collections import namedtuple
+from concurrent.futures import TimeoutError
 
 from eth_keys import KeyAPI
 from eth_utils import big_endian_to_int
 from web3 import Web3
 from web3.contract import ContractEvent
 from web3.utils.encoding import to_bytes
-from web3.utils.threads import Timeout
 
 from cdt_utils.account import Account
 from cdt_utils.web3_provider import Web3Provider
@@ -176,15 +176,12 @@ def process_tx_receipt(tx_hash, event_instance, event_name, agreement_id=None):
     if not isinstance(event_instance, ContractEvent):
         raise TypeError(f'second argument should be a ContractEvent, '
                         f'got {event_instance} of type {type(event_instance)}')
-    web3 = Web3Provider.get_web3()
     try:
-        web3.eth.waitForTransactionReceipt(tx_hash, timeout=20)
-    except Timeout:
+        receipt = Web3Provider.get_receipt_tracker().wait(tx_hash, timeout=20)
+    except TimeoutError:
         logger.info(f'Waiting for {event_name} transaction receipt timed out. '
                     f'Cannot verify receipt and event.')
         return False
-
-    receipt = web3.eth.getTransactionReceipt(tx_hash)
     event_logs = event_instance.processReceipt(receipt) if receipt else None
     if event_logs:
         logger.info(f'Success: got {event_name} event after fulfilling condition.')
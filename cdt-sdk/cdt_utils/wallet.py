@@ -1,5 +1,13 @@
 import logging
 
+from eth_utils import keccak
+from hexbytes import HexBytes
+from web3 import Web3
+
+from cdt_utils.gas_oracle import GasOracle
+from cdt_utils.key_session import KeySession
+from cdt_utils.nonce_manager import NonceManager, is_known_tx_error, is_nonce_error
+
 logger = logging.getLogger(__name__)
 
 
@@ -9,7 +17,8 @@ class Wallet:
     private key.
 
     The private key is always red from the encrypted keyfile and is never saved in memory beyond
-    the life span of the signing function.
+    the life span of the signing function, unless the account was explicitly unlocked with
+    `Account.unlock` in which case the `KeySession` of the address is used.
 
     The use of this wallet allows Ocean tools to send rawTransactions which keeps the user
     key and password safe and they are never sent outside. Another advantage of this is that
@@ -24,8 +33,9 @@ class Wallet:
     for communicating with the secret store nodes.
 
     """
-    _last_tx_count = dict()
+    nonce_manager = NonceManager()
     MIN_GAS_PRICE = 1000000000
+    REPLACEMENT_GAS_PRICE_BUMP = 1.125
 
     def __init__(self, web3, key=None, password=None, address=None):
         self._web3 = web3
@@ -35,14 +45,29 @@ class Wallet:
         self._key = key
 
     def __get_key(self):
+        local_account = KeySession.get(self._address)
+        if local_account:
+            return local_account.privateKey
+
         if not self._password:
             return self._key
 
         return self._web3.eth.account.decrypt(self._key, self._password)
 
+    def __get_account(self):
+        local_account = KeySession.get(self._address)
+        if local_account:
+            return local_account
+
+        return self._web3.eth.account.privateKeyToAccount(self.__get_key())
+
+    def _get_address(self):
+        if not self._address:
+            self._address = self.__get_account().address
+        return self._address
+
     def validate(self):
-        key = self.__get_key()
-        account = self._web3.eth.account.privateKeyToAccount(key)
+        account = self.__get_account()
         return account.address == self._address
 
     @staticmethod
@@ -51,29 +76,133 @@ class Wallet:
         # transactions in a row without wait in between the network may not get the chance to
         # update the transaction count for the account address in time.
         # So we have to manage this internally per account address.
-        if address not in Wallet._last_tx_count:
-            Wallet._last_tx_count[address] = web3.eth.getTransactionCount(address)
-        else:
-            Wallet._last_tx_count[address] += 1
-
-        return Wallet._last_tx_count[address]
+        return Wallet.nonce_manager.reserve(web3, address)
 
     def sign_tx(self, tx):
-        private_key = self.__get_key()
-        account = self._web3.eth.account.privateKeyToAccount(private_key)
-        nonce = Wallet._get_nonce(self._web3, account.address)
-        logger.debug(f'`Wallet` signing tx: sender address: {account.address} nonce: {nonce}, '
-                     f'gasprice: {self._web3.eth.gasPrice}')
-        gas_price = int(self._web3.eth.gasPrice / 100)
-        gas_price = max(gas_price, self.MIN_GAS_PRICE)
-        tx['nonce'] = nonce
-        tx['gasPrice'] = gas_price
-        signed_tx = self._web3.eth.account.signTransaction(tx, private_key)
+        """
+        Sign a transaction, reserving the next nonce of the account unless `tx` already
+        has one (e.g. when replacing a stuck transaction).
+
+        The nonce is reserved last and given back if signing fails, so an error before
+        the send never leaves a gap.
+
+        :param tx: dict transaction, `nonce` and `gasPrice` are filled in
+        :return: raw signed transaction, bytes
+        """
+        account = self.__get_account()
+        if 'gasPrice' not in tx:
+            network_gas_price = GasOracle.get_gas_price(self._web3)
+            tx['gasPrice'] = max(int(network_gas_price / 100), self.MIN_GAS_PRICE)
+        reserved = tx.get('nonce') is None
+        if reserved:
+            tx['nonce'] = Wallet._get_nonce(self._web3, account.address)
+        logger.debug(f'`Wallet` signing tx: sender address: {account.address} '
+                     f'nonce: {tx["nonce"]}, gasprice: {tx["gasPrice"]}')
+        try:
+            signed_tx = self._web3.eth.account.signTransaction(tx, account.privateKey)
+        except Exception:
+            if reserved:
+                Wallet.nonce_manager.release(account.address, tx['nonce'])
+                tx['nonce'] = None
+            raise
         logger.debug(f'`Wallet` signed tx is {signed_tx}')
         return signed_tx.rawTransaction
 
+    def send_tx(self, tx):
+        """
+        Sign and send a transaction. If the node rejects it the nonce is given back, or
+        re-synced and the transaction sent once more when the nonce itself was wrong.
+        A transaction the node already knows is not sent again, its hash is returned.
+        When the send fails in transport, the transaction may or may not have reached
+        the node, so the nonces are re-synced with the node's pending count.
+
+        :param tx: dict transaction
+        :return: hash of the transaction
+        """
+        for attempt in range(2):
+            raw_tx = self.sign_tx(tx)
+            address = self._get_address()
+            try:
+                tx_hash = self._web3.eth.sendRawTransaction(raw_tx)
+            except ValueError as e:
+                if is_known_tx_error(e):
+                    # Signing the call again with a new nonce would execute it twice.
+                    Wallet.nonce_manager.mark_sent(address, tx['nonce'])
+                    return HexBytes(keccak(raw_tx))
+
+                if attempt == 0 and is_nonce_error(e):
+                    logger.info(f'`Wallet` nonce {tx["nonce"]} rejected for {address}: {e}, '
+                                f'resyncing')
+                    # the nonce is used on the node, it must not be handed out again
+                    Wallet.nonce_manager.mark_sent(address, tx['nonce'])
+                    Wallet.nonce_manager.resync(self._web3, address)
+                    tx['nonce'] = None
+                    continue
+
+                Wallet.nonce_manager.release(address, tx['nonce'])
+                raise
+            except Exception as e:
+                logger.warning(f'`Wallet` sending nonce {tx["nonce"]} for {address} failed: '
+                               f'{e}, resyncing')
+                Wallet.nonce_manager.mark_sent(address, tx['nonce'])
+                try:
+                    Wallet.nonce_manager.resync(self._web3, address)
+                except Exception as resync_error:
+                    logger.warning(f'`Wallet` nonce resync for {address} failed: '
+                                   f'{resync_error}')
+                raise
+            Wallet.nonce_manager.mark_sent(address, tx['nonce'])
+            return tx_hash
+
+    def fill_nonce_gaps(self):
+        """
+        Send a no-op transaction for each released nonce below the next one, so the
+        transactions queued behind such a gap can be mined.
+
+        :return: list of tx hashes
+        """
+        address = Web3.toChecksumAddress(self._get_address())
+        tx_hashes = []
+        for _ in Wallet.nonce_manager.get_gaps(address):
+            # `reserve` hands out the released nonces first.
+            tx_hashes.append(self.send_tx({'to': address, 'value': 0, 'gas': 21000}))
+        return tx_hashes
+
+    def cancel_tx(self, nonce, gas_price=None):
+        """
+        Replace a stuck transaction by a 0 value transfer to self with the same nonce and
+        a higher gas price.
+
+        :param nonce: int nonce of the transaction to replace
+        :param gas_price: int, defaults to the network price bumped by
+            `REPLACEMENT_GAS_PRICE_BUMP`
+        :return: hash of the replacement transaction
+        """
+        address = Web3.toChecksumAddress(self._get_address())
+        if gas_price is None:
+            gas_price = int(max(GasOracle.get_gas_price(self._web3), self.MIN_GAS_PRICE) *
+                            self.REPLACEMENT_GAS_PRICE_BUMP)
+        tx = {'to': address, 'value': 0, 'gas': 21000, 'gasPrice': gas_price, 'nonce': nonce}
+        raw_tx = self.sign_tx(tx)
+        try:
+            return self._web3.eth.sendRawTransaction(raw_tx)
+        except ValueError as e:
+            if is_known_tx_error(e):
+                return HexBytes(keccak(raw_tx))
+            raise
+
+    def replace_stuck_txs(self, gas_price=None):
+        """
+        Replace every transaction of the account that is in the pool but not mined yet.
+
+        :param gas_price: int gas price of the replacements
+        :return: list of tx hashes
+        """
+        address = self._get_address()
+        return [self.cancel_tx(nonce, gas_price)
+                for nonce in Wallet.nonce_manager.get_stuck_nonces(self._web3, address)]
+
     def sign(self, msg_hash):
-        private_key = self.__get_key()
-        account = self._web3.eth.account.privateKeyToAccount(private_key)
+        account = self.__get_account()
         return account.signHash(msg_hash)
 
@@ -0,0 +1,143 @@
+import logging
+from concurrent.futures import Future
+
+from cdt_utils.web3.call import decode_call_output, encode_call_transaction
+
+logger = logging.getLogger(__name__)
+
+# decoder of the requests web3 makes inside a batch, they get the raw response dict
+_RAW_RESPONSE = object()
+
+
+def resolve_rpc_future(future, response, decoder=None):
+    """
+    Hand a JSON-RPC response dict to the future waiting for it. Errors are raised
+    as `ValueError` like the web3 request manager does.
+
+    :param future: concurrent.futures.Future
+    :param response: JSON-RPC response dict, or None if the node did not answer
+    :param decoder: optional callable applied to the `result` value
+    """
+    if future.done():
+        return
+
+    if response is None:
+        future.set_exception(ValueError('No response for request in JSON-RPC batch'))
+    elif 'error' in response:
+        future.set_exception(ValueError(response['error']))
+    else:
+        try:
+            result = response.get('result')
+            future.set_result(decoder(result) if decoder else result)
+        except Exception as e:
+            future.set_exception(e)
+
+
+class RPCBatch:
+    """
+    Collect JSON-RPC requests and send them in a single POST.
+
+    Example:
+        with provider.batch() as batch:
+            owner = batch.add_call(registry.contract.functions.getCDTOwner(cdt))
+            job = batch.add_call(market.contract.functions.getJob(job_id))
+        owner.result(), job.result()
+
+    The requests are sent when the `with` block exits; every `add*` method returns a
+    future that is resolved with the matching response.
+
+    While the block is active, the requests web3 makes on the same thread, e.g.
+    `keeper.cdt_registry.get_cdt_owner(cdt)`, go through the batch too: they need an
+    answer right away, so each one is sent in the same POST as the requests queued
+    before it.
+    """
+
+    def __init__(self, provider):
+        self._provider = provider
+        self._requests = []
+        self._outer = None
+
+    def __enter__(self):
+        self._outer = self._provider.activate_batch(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._provider.activate_batch(self._outer)
+        if exc_type is None:
+            self.execute()
+        else:
+            self.cancel()
+        return False
+
+    def __len__(self):
+        return len(self._requests)
+
+    def add(self, method, params=None, decoder=None):
+        """
+        Queue a raw JSON-RPC request.
+
+        :param method: rpc method name, str
+        :param params: list of already formatted rpc params
+        :param decoder: optional callable applied to the result
+        :return: Future resolved with the (decoded) result
+        """
+        future = Future()
+        self._requests.append((method, params or [], decoder, future))
+        return future
+
+    def add_call(self, contract_function, block_identifier='latest'):
+        """
+        Queue an `eth_call` for a bound contract function, e.g.
+        `contract.functions.getPermission(cdt, grantee)`.
+
+        :param contract_function: web3 ContractFunction with its arguments set
+        :param block_identifier: 'latest' or block number, int
+        :return: Future resolved with the decoded return value
+        """
+        if isinstance(block_identifier, int):
+            block_identifier = hex(block_identifier)
+
+        return self.add(
+            'eth_call',
+            [encode_call_transaction(contract_function), block_identifier],
+            decoder=lambda data: decode_call_output(contract_function, data)
+        )
+
+    def request(self, method, params):
+        """
+        Send a request made by web3 inside the block with the queued ones.
+
+        :return: JSON-RPC response dict, as `make_request` returns it
+        """
+        future = Future()
+        self._requests.append((method, params or [], _RAW_RESPONSE, future))
+        self.execute()
+        return future.result()
+
+    def execute(self):
+        """Send all queued requests and resolve their futures."""
+        requests, self._requests = self._requests, []
+        if not requests:
+            return
+
+        try:
+            responses = self._provider.make_batch_request(
+                [(method, params) for method, params, _, _ in requests])
+        except Exception as e:
+            logger.debug(f'JSON-RPC batch of {len(requests)} requests failed: {e}')
+            for _, _, _, future in requests:
+                future.set_exception(e)
+            return
+
+        for (method, _, decoder, future), response in zip(requests, responses):
+            if decoder is not _RAW_RESPONSE:
+                resolve_rpc_future(future, response, decoder)
+            elif response is None:
+                future.set_exception(ValueError(f'No response for {method} in JSON-RPC batch'))
+            else:
+                future.set_result(response)
+
+    def cancel(self):
+        requests, self._requests = self._requests, []
+        for _, _, _, future in requests:
+            future.cancel()
@@ -0,0 +1,37 @@
+from eth_abi import decode_abi
+from hexbytes import HexBytes
+from web3.utils.abi import get_abi_output_types, map_abi_data
+from web3.utils.normalizers import BASE_RETURN_NORMALIZERS
+
+
+def encode_call_transaction(contract_function):
+    """
+    Build the `eth_call` transaction dict for a bound contract function, e.g.
+    `contract.functions.getCDTOwner(cdt)`, without sending it.
+
+    :param contract_function: web3 ContractFunction with its arguments set
+    :return: dict with `to` and `data`
+    """
+    return {
+        'to': contract_function.address,
+        'data': contract_function._encode_transaction_data()
+    }
+
+
+def decode_call_output(contract_function, return_data):
+    """
+    Decode the raw `eth_call` result of a contract function the same way
+    `ConciseContract` does: a single output is returned as is, several outputs
+    are returned as a list.
+
+    :param contract_function: web3 ContractFunction the data was returned for
+    :param return_data: hex str or bytes returned by the node
+    :return: decoded value or list of values
+    """
+    output_types = get_abi_output_types(contract_function.abi)
+    output_data = decode_abi(output_types, HexBytes(return_data))
+    normalized_data = map_abi_data(BASE_RETURN_NORMALIZERS, output_types, output_data)
+    if len(normalized_data) == 1:
+        return normalized_data[0]
+
+    return normalized_data
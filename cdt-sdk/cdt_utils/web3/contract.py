@@ -3,6 +3,7 @@ import logging
 from web3.utils import empty
 from web3.utils.contracts import prepare_transaction
 
+from cdt_utils.gas_oracle import GasOracle
 from cdt_utils.wallet import Wallet
 
 
@@ -55,7 +56,7 @@ class CustomContractFunction:
                 tx.pop('passphrase')
             if 'account_key' in tx:
                 tx.pop('account_key')
-            gas = cf.estimateGas(tx)
+            gas = GasOracle.estimate_gas(cf, tx)
             transact_transaction['gas'] = gas
 
         return transact_with_contract_function(
@@ -111,13 +112,13 @@ def transact_with_contract_function(
     #     )
 
     if account_key:
-        raw_tx = Wallet(web3, account_key, passphrase).sign_tx(transact_transaction)
-        logging.debug(f'sending raw tx: function: {function_name}, tx hash: {raw_tx.hex()}')
-        txn_hash = web3.eth.sendRawTransaction(raw_tx)
+        wallet = Wallet(web3, account_key, passphrase, transact_transaction.get('from'))
+        txn_hash = wallet.send_tx(transact_transaction)
+        logging.debug(f'sent raw tx: function: {function_name}, tx hash: {txn_hash.hex()}, '
+                      f'nonce: {transact_transaction["nonce"]}')
     elif passphrase:
         txn_hash = web3.personal.sendTransaction(transact_transaction, passphrase)
     else:
         txn_hash = web3.eth.sendTransaction(transact_transaction)
 
     return txn_hash
-
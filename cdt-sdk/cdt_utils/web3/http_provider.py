@@ -1,14 +1,65 @@
+import threading
+import time
+from concurrent.futures import Future
+
 from web3 import HTTPProvider
+from web3.utils.encoding import FriendlyJsonSerde, to_bytes
 
+from cdt_utils.web3.batch import RPCBatch
 from cdt_utils.web3.request import make_post_request
 
 
 class CustomHTTPProvider(HTTPProvider):
     """
     Override requests to control the connection pool to make it blocking.
+
+    Requests can also be grouped into JSON-RPC batches, either explicitly with
+    `provider.batch()` or automatically by setting `batch_window`. In automatic mode a
+    request is sent at once when no other one is in flight; the requests issued
+    meanwhile are coalesced and sent as a single POST when it returns, after waiting
+    up to `batch_window` for more when several are queued.
     """
+    MAX_BATCH_SIZE = 100
+
+    def __init__(self, endpoint_uri=None, request_kwargs=None, batch_window=None):
+        """
+        :param endpoint_uri: str
+        :param request_kwargs: dict of kwargs passed to `requests`
+        :param batch_window: float seconds to wait for other requests to join a batch,
+            None disables automatic batching
+        """
+        super().__init__(endpoint_uri, request_kwargs)
+        self.batch_window = batch_window
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._flushing = False
+        # RPCBatch active on each thread
+        self._local = threading.local()
+
+    def batch(self):
+        """
+        Return an `RPCBatch` context, the requests added in it are sent as one POST
+        when the context exits.
+        """
+        return RPCBatch(self)
+
+    def activate_batch(self, batch):
+        """
+        Route the requests of the current thread through `batch`, None to stop.
+
+        :return: the batch that was active before
+        """
+        previous = getattr(self._local, 'batch', None)
+        self._local.batch = batch
+        return previous
 
     def make_request(self, method, params):
+        batch = getattr(self._local, 'batch', None)
+        if batch is not None:
+            return batch.request(method, params)
+        if self.batch_window:
+            return self._make_coalesced_request(method, params)
+
         self.logger.debug("Making request HTTP. URI: %s, Method: %s",
                           self.endpoint_uri, method)
         request_data = self.encode_rpc_request(method, params)
@@ -23,3 +74,86 @@ class CustomHTTPProvider(HTTPProvider):
                           self.endpoint_uri, method, response)
         return response
 
+    def make_batch_request(self, requests):
+        """
+        Send several requests as one JSON-RPC array POST.
+
+        :param requests: list of (method, params) tuples
+        :return: list of response dicts in the same order as `requests`, None for a
+            request the node did not answer
+        """
+        rpc_requests = []
+        for method, params in requests:
+            rpc_requests.append({
+                "jsonrpc": "2.0",
+                "method": method,
+                "params": params or [],
+                "id": next(self.request_counter),
+            })
+
+        self.logger.debug("Making batch request HTTP. URI: %s, Size: %s, Methods: %s",
+                          self.endpoint_uri, len(rpc_requests),
+                          [method for method, _ in requests])
+        request_data = to_bytes(text=FriendlyJsonSerde().json_encode(rpc_requests))
+        raw_response = make_post_request(
+            self.endpoint_uri,
+            request_data,
+            **self.get_request_kwargs()
+        )
+        responses = self.decode_rpc_response(raw_response)
+        if isinstance(responses, dict):
+            # Nodes answer a batch they cannot process with a single error object.
+            raise ValueError(responses.get('error', responses))
+
+        by_id = {response.get('id'): response for response in responses}
+        return [by_id.get(request['id']) for request in rpc_requests]
+
+    def _make_coalesced_request(self, method, params):
+        future = Future()
+        with self._pending_lock:
+            self._pending.append((method, params, future))
+            is_leader = not self._flushing
+            self._flushing = True
+
+        # The caller finding no request in flight sends the queue until it is empty,
+        # the other callers block on their own future.
+        if is_leader:
+            while self._flush_pending():
+                pass
+
+        return future.result()
+
+    def _flush_pending(self):
+        """
+        Send the queued requests, a lone request at once.
+
+        :return: False when the queue was empty and nothing is in flight anymore
+        """
+        with self._pending_lock:
+            if not self._pending:
+                self._flushing = False
+                return False
+            wait = len(self._pending) > 1
+
+        if wait:
+            time.sleep(self.batch_window)
+        with self._pending_lock:
+            pending, self._pending = self._pending, []
+
+        for i in range(0, len(pending), self.MAX_BATCH_SIZE):
+            chunk = pending[i:i + self.MAX_BATCH_SIZE]
+            try:
+                responses = self.make_batch_request(
+                    [(method, params) for method, params, _ in chunk])
+            except Exception as e:
+                for _, _, future in chunk:
+                    future.set_exception(e)
+                continue
+
+            for (method, _, future), response in zip(chunk, responses):
+                if response is None:
+                    future.set_exception(
+                        ValueError(f'No response for {method} in JSON-RPC batch'))
+                else:
+                    future.set_result(response)
+        return True
@@ -0,0 +1,419 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+def is_websocket_uri(endpoint_uri):
+    return isinstance(endpoint_uri, str) and endpoint_uri.startswith(('ws://', 'wss://'))
+
+
+def is_ipc_path(endpoint_uri):
+    # a file system path, not a 'host:port' without scheme
+    if not isinstance(endpoint_uri, str) or '://' in endpoint_uri:
+        return False
+    return endpoint_uri.endswith('.ipc') or endpoint_uri.startswith(('/', '~', '.')) or \
+        os.path.sep in endpoint_uri
+
+
+class _IPCTransport:
+    """Blocking JSON stream over a unix socket."""
+
+    def __init__(self, ipc_path):
+        self._ipc_path = ipc_path
+        self._sock = None
+        self._buffer = ''
+        self._decoder = json.JSONDecoder()
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(self._ipc_path)
+        self._sock = sock
+        self._buffer = ''
+
+    def send(self, message):
+        self._sock.sendall(message.encode('utf-8'))
+
+    def recv(self):
+        while True:
+            text = self._buffer.lstrip()
+            if text:
+                try:
+                    message, end = self._decoder.raw_decode(text)
+                    self._buffer = text[end:]
+                    return message
+                except ValueError:
+                    pass
+
+            chunk = self._sock.recv(65536)
+            if not chunk:
+                raise ConnectionError(f'IPC connection to {self._ipc_path} closed')
+            self._buffer += chunk.decode('utf-8')
+
+    def close(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+
+
+class _WebsocketTransport:
+    """Websocket connection driven from an event loop in a background thread."""
+
+    def __init__(self, endpoint_uri):
+        self._endpoint_uri = endpoint_uri
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, daemon=True,
+                         name='ws-subscription-loop').start()
+        self._ws = None
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def connect(self):
+        import websockets
+        self._ws = self._run(websockets.connect(self._endpoint_uri, loop=self._loop))
+
+    def send(self, message):
+        self._run(self._ws.send(message))
+
+    def recv(self):
+        return json.loads(self._run(self._ws.recv()))
+
+    def close(self):
+        if self._ws is not None:
+            try:
+                self._run(self._ws.close())
+            except Exception:
+                pass
+            self._ws = None
+
+
+class ClientSubscription:
+    """One `eth_subscribe` subscription of a `SubscriptionClient`."""
+
+    def __init__(self, client, subscription_type, params, callback):
+        self.client = client
+        self.subscription_type = subscription_type
+        self.params = params
+        self.callback = callback
+        self.server_id = None
+        # (block number, log index) of the last delivered log, used to backfill
+        self.last_position = None
+        # block to backfill from while no log was delivered: the head when the
+        # subscription became live, then the last head seen before a disconnect
+        self.resume_block = None
+        self._backfilling = False
+        self._buffer = []
+
+    def cancel(self):
+        self.client.unsubscribe(self)
+
+
+class SubscriptionClient:
+    """
+    Push based `eth_subscribe` client for websocket and IPC endpoints.
+
+    A reader thread keeps one connection open, routes `eth_subscription` notifications
+    to the callbacks of `subscribe` and answers the requests sent with `request`. When
+    the connection drops it reconnects with a growing delay, subscribes again and, for
+    `logs` subscriptions, fetches with `eth_getLogs` the logs emitted while it was
+    disconnected so no event is lost or delivered twice.
+
+    Callbacks run in order on one callback thread, not on the reader thread, so they
+    may call `request`.
+
+    `wait_for_block` lets pollers sleep until the next `newHeads` notification.
+    """
+    RECONNECT_DELAY = 0.5
+    MAX_RECONNECT_DELAY = 30
+    REQUEST_TIMEOUT = 10
+
+    def __init__(self, endpoint_uri):
+        self.endpoint_uri = endpoint_uri
+        if is_websocket_uri(endpoint_uri):
+            self._transport = _WebsocketTransport(endpoint_uri)
+        else:
+            self._transport = _IPCTransport(endpoint_uri)
+
+        self._ids = itertools.count(1)
+        self._lock = threading.RLock()
+        self._send_lock = threading.Lock()
+        self._subscriptions = []
+        self._by_server_id = dict()
+        self._requests = dict()
+        self._connected = threading.Event()
+        self._closed = False
+        self._head_subscription = None
+        self._head_condition = threading.Condition()
+        self._latest_block = None
+        self._callbacks = queue.Queue()
+        self._callback_thread = threading.Thread(target=self._run_callbacks, daemon=True,
+                                                 name='subscription-callbacks')
+        self._callback_thread.start()
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name='subscription-client')
+        self._thread.start()
+
+    @property
+    def latest_block(self):
+        return self._latest_block
+
+    @property
+    def head_block(self):
+        """Latest pushed block number, None unless `newHeads` is followed and connected."""
+        subscription = self._head_subscription
+        if subscription is None or subscription.server_id is None or \
+                not self._connected.is_set():
+            return None
+        return self._latest_block
+
+    def request(self, method, params=None, timeout=None):
+        """
+        Send a JSON-RPC request over the subscription connection.
+
+        :return: the result
+        :raise ValueError: on a JSON-RPC error
+        """
+        if threading.current_thread() is self._thread:
+            raise RuntimeError('request() would deadlock on the subscription reader thread')
+        return self._request_async(method, params).result(timeout or self.REQUEST_TIMEOUT)
+
+    def subscribe(self, subscription_type, params=None, callback=None):
+        """
+        Start an `eth_subscribe` subscription, it is renewed after every reconnect.
+
+        :param subscription_type: 'logs' or 'newHeads'
+        :param params: dict `address`/`topics` filter of a 'logs' subscription
+        :param callback: called with every notification result from the callback thread
+        :return: ClientSubscription
+        """
+        subscription = ClientSubscription(self, subscription_type, params, callback)
+        with self._lock:
+            self._subscriptions.append(subscription)
+            connected = self._connected.is_set()
+        if connected:
+            self._send_subscribe(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+            server_id = subscription.server_id
+            self._by_server_id.pop(server_id, None)
+        if server_id and self._connected.is_set():
+            self._request_async('eth_unsubscribe', [server_id])
+
+    def wait_for_block(self, after_block=None, timeout=None):
+        """
+        Block until a head newer than `after_block` is pushed.
+
+        :param after_block: int, None waits for the next head
+        :param timeout: float seconds
+        :return: the latest block number seen, int or None
+        """
+        with self._lock:
+            if self._head_subscription is None:
+                self._head_subscription = self.subscribe('newHeads', callback=self._on_head)
+        if after_block is None:
+            after_block = self._latest_block
+
+        with self._head_condition:
+            self._head_condition.wait_for(
+                lambda: self._latest_block is not None and
+                (after_block is None or self._latest_block > after_block) or self._closed,
+                timeout)
+            return self._latest_block
+
+    def close(self):
+        self._closed = True
+        self._connected.clear()
+        self._transport.close()
+        self._callbacks.put(None)
+        with self._head_condition:
+            self._head_condition.notify_all()
+
+    def _on_head(self, head):
+        block_number = int(head['number'], 16)
+        from cdt_utils.web3_provider import Web3Provider
+        Web3Provider.observe_block(block_number)
+        with self._head_condition:
+            if self._latest_block is None or block_number > self._latest_block:
+                self._latest_block = block_number
+            self._head_condition.notify_all()
+
+    def _request_async(self, method, params=None):
+        request_id = next(self._ids)
+        future = Future()
+        with self._lock:
+            self._requests[request_id] = future
+        message = json.dumps({'jsonrpc': '2.0', 'id': request_id, 'method': method,
+                              'params': params or []})
+        try:
+            with self._send_lock:
+                self._transport.send(message)
+        except Exception as e:
+            with self._lock:
+                self._requests.pop(request_id, None)
+            future.set_exception(ConnectionError(f'{method} not sent: {e}'))
+        return future
+
+    def _send_subscribe(self, subscription):
+        params = [subscription.subscription_type]
+        if subscription.params:
+            params.append(subscription.params)
+
+        def _on_subscribed(future):
+            if future.exception() is not None:
+                logger.warning(f'eth_subscribe {subscription.subscription_type} failed: '
+                               f'{future.exception()}')
+                return
+            with self._lock:
+                if subscription not in self._subscriptions:
+                    self._request_async('eth_unsubscribe', [future.result()])
+                    return
+                subscription.server_id = future.result()
+                self._by_server_id[subscription.server_id] = subscription
+                record_head = subscription.subscription_type == 'logs' and \
+                    subscription.last_position is None and subscription.resume_block is None
+            if record_head:
+                self._request_async('eth_blockNumber').add_done_callback(
+                    lambda block: self._on_live_block(subscription, block))
+
+        self._request_async('eth_subscribe', params).add_done_callback(_on_subscribed)
+
+    def _on_live_block(self, subscription, future):
+        if future.exception() is not None:
+            return
+        block_number = int(future.result(), 16)
+        with self._lock:
+            if subscription.resume_block is None:
+                subscription.resume_block = block_number
+
+    def _run(self):
+        delay = self.RECONNECT_DELAY
+        while not self._closed:
+            try:
+                self._transport.connect()
+            except Exception as e:
+                logger.debug(f'could not connect to {self.endpoint_uri}: {e}')
+                time.sleep(delay)
+                delay = min(delay * 2, self.MAX_RECONNECT_DELAY)
+                continue
+
+            delay = self.RECONNECT_DELAY
+            self._on_connect()
+            try:
+                while not self._closed:
+                    self._handle(self._transport.recv())
+            except Exception as e:
+                if not self._closed:
+                    logger.warning(f'subscription connection to {self.endpoint_uri} lost: {e}')
+            self._on_disconnect()
+
+    def _on_connect(self):
+        with self._lock:
+            self._by_server_id.clear()
+            subscriptions = list(self._subscriptions)
+            self._connected.set()
+        for subscription in subscriptions:
+            backfill = subscription.subscription_type == 'logs' and \
+                (subscription.last_position is not None or
+                 subscription.resume_block is not None)
+            if backfill:
+                # Live notifications are held back until the missed logs are delivered.
+                subscription._backfilling = True
+            self._send_subscribe(subscription)
+            if backfill:
+                self._backfill(subscription)
+
+    def _on_disconnect(self):
+        self._connected.clear()
+        self._transport.close()
+        with self._lock:
+            requests, self._requests = self._requests, dict()
+            # logs of the blocks after the last head seen may have been missed
+            if self._latest_block is not None:
+                for subscription in self._subscriptions:
+                    if subscription.last_position is None and \
+                            subscription.resume_block is not None:
+                        subscription.resume_block = max(subscription.resume_block,
+                                                        self._latest_block)
+        for future in requests.values():
+            if not future.done():
+                future.set_exception(ConnectionError('subscription connection lost'))
+
+    def _handle(self, message):
+        if message.get('method') == 'eth_subscription':
+            params = message.get('params', {})
+            with self._lock:
+                subscription = self._by_server_id.get(params.get('subscription'))
+            if subscription:
+                self._deliver(subscription, params.get('result'))
+            return
+
+        with self._lock:
+            future = self._requests.pop(message.get('id'), None)
+        if future is None:
+            return
+        if 'error' in message:
+            future.set_exception(ValueError(message['error']))
+        else:
+            future.set_result(message.get('result'))
+
+    def _backfill(self, subscription):
+        params = dict(subscription.params or {})
+        if subscription.last_position is not None:
+            params['fromBlock'] = hex(subscription.last_position[0])
+        else:
+            params['fromBlock'] = hex(subscription.resume_block)
+        params['toBlock'] = 'latest'
+
+        def _on_logs(future):
+            logs = future.result() if future.exception() is None else []
+            if future.exception() is not None:
+                logger.warning(f'backfill of missed logs failed: {future.exception()}')
+            with self._lock:
+                subscription._backfilling = False
+                buffered, subscription._buffer = subscription._buffer, []
+            for log in logs + buffered:
+                self._deliver(subscription, log)
+
+        self._request_async('eth_getLogs', [params]).add_done_callback(_on_logs)
+
+    def _deliver(self, subscription, result):
+        if subscription.subscription_type == 'logs' and result:
+            with self._lock:
+                if subscription._backfilling:
+                    subscription._buffer.append(result)
+                    return
+            position = (int(result['blockNumber'], 16), int(result['logIndex'], 16))
+            if not result.get('removed'):
+                if subscription.last_position and position <= subscription.last_position:
+                    return
+                subscription.last_position = position
+
+        if subscription.callback:
+            self._callbacks.put((subscription, result))
+
+    def _run_callbacks(self):
+        while True:
+            item = self._callbacks.get()
+            if item is None:
+                return
+            subscription, result = item
+            try:
+                subscription.callback(result)
+            except Exception as e:
+                logger.error(f'Error in subscription callback: {e}', exc_info=True)
@@ -1,30 +1,58 @@
 #  Copyright 2018 Ocean Protocol Foundation
 #  SPDX-License-Identifier: Apache-2.0
 
-from web3 import Web3
+import threading
+import time
+
+from web3 import IPCProvider, Web3, WebsocketProvider
 
 from cdt_utils.web3.http_provider import CustomHTTPProvider
+from cdt_utils.web3.subscription_client import (SubscriptionClient, is_ipc_path,
+                                                is_websocket_uri)
 
 
 class Web3Provider(object):
     """Provides the Web3 instance."""
     _web3 = None
+    _block_number = None
+    _block_number_time = 0
+    _block_lock = threading.Lock()
+    _lock = threading.Lock()
+    _receipt_tracker = None
+    _event_dispatcher = None
+    _subscription_client = None
+    _endpoint_uri = None
+    BLOCK_NUMBER_MAX_AGE = 1.0
 
     @staticmethod
-    def init_web3(keeper_url=None, provider=None):
+    def init_web3(keeper_url=None, provider=None, batch_window=None):
         """
         One of `keeper_url` or `provider` is required. If `provider` is
         given, `keeper_url` will be ignored.
 
+        `keeper_url` can be a http(s) url, a ws(s) url or the path of an IPC socket.
+        Over websocket and IPC, events are pushed by the node through `eth_subscribe`
+        instead of being polled.
+
         :param keeper_url:
         :param provider:
+        :param batch_window: float seconds, coalesce the rpc requests issued while
+            another one is in flight into one JSON-RPC batch, waiting up to this
+            window for more (http only)
         :return:
         """
         if not provider:
             assert keeper_url, 'keeper_url or a provider instance is required.'
-            provider = CustomHTTPProvider(keeper_url)
+            if is_websocket_uri(keeper_url):
+                provider = WebsocketProvider(keeper_url)
+            elif is_ipc_path(keeper_url):
+                provider = IPCProvider(keeper_url)
+            else:
+                provider = CustomHTTPProvider(keeper_url, batch_window=batch_window)
 
+        Web3Provider._set_endpoint(Web3Provider._get_endpoint(provider))
         Web3Provider._web3 = Web3(provider)
+        Web3Provider._block_number = None
         # Reset attributes to avoid lint issue about no attribute
         Web3Provider._web3.eth = getattr(Web3Provider._web3, 'eth')
         Web3Provider._web3.net = getattr(Web3Provider._web3, 'net')
@@ -46,4 +74,126 @@ class Web3Provider(object):
     @staticmethod
     def set_web3(web3):
         Web3Provider._web3 = web3
+        Web3Provider._block_number = None
+        provider = web3.providers[0] if web3.providers else None
+        Web3Provider._set_endpoint(Web3Provider._get_endpoint(provider))
+
+    @staticmethod
+    def _get_endpoint(provider):
+        endpoint = getattr(provider, 'endpoint_uri', None) or getattr(provider, 'ipc_path', None)
+        return str(endpoint) if endpoint else None
+
+    @staticmethod
+    def _set_endpoint(endpoint_uri):
+        with Web3Provider._lock:
+            if endpoint_uri == Web3Provider._endpoint_uri:
+                return
+            if Web3Provider._subscription_client is not None:
+                Web3Provider._subscription_client.close()
+                Web3Provider._subscription_client = None
+            Web3Provider._endpoint_uri = endpoint_uri
+
+    @staticmethod
+    def get_subscription_client():
+        """
+        Return the `eth_subscribe` client of the keeper endpoint.
+
+        :return: SubscriptionClient, None if the keeper is not reached over websocket or IPC
+        """
+        endpoint_uri = Web3Provider._endpoint_uri
+        if not (is_websocket_uri(endpoint_uri) or is_ipc_path(endpoint_uri)):
+            return None
+
+        with Web3Provider._lock:
+            if Web3Provider._subscription_client is None:
+                Web3Provider._subscription_client = SubscriptionClient(endpoint_uri)
+            return Web3Provider._subscription_client
+
+    @staticmethod
+    def get_receipt_tracker():
+        """Return the `ReceiptTracker` shared by all senders of the current web3 instance."""
+        web3 = Web3Provider.get_web3()
+        with Web3Provider._lock:
+            tracker = Web3Provider._receipt_tracker
+            if tracker is None or tracker.web3 is not web3:
+                from cdt_utils.receipt_tracker import ReceiptTracker
+                tracker = ReceiptTracker(web3)
+                Web3Provider._receipt_tracker = tracker
+            return tracker
+
+    @staticmethod
+    def get_event_dispatcher():
+        """Return the `EventDispatcher` shared by all listeners of the current web3 instance."""
+        web3 = Web3Provider.get_web3()
+        with Web3Provider._lock:
+            dispatcher = Web3Provider._event_dispatcher
+            if dispatcher is None or dispatcher.web3 is not web3:
+                from cdt_utils.event_dispatcher import EventDispatcher
+                dispatcher = EventDispatcher(web3)
+                Web3Provider._event_dispatcher = dispatcher
+            return dispatcher
+
+    @staticmethod
+    def get_pushed_block_number():
+        """
+        Return the head block pushed by the subscription client, without any request.
 
+        :return: block number, int, None without a subscribed client
+        """
+        client = Web3Provider._subscription_client
+        return client.head_block if client is not None else None
+
+    @staticmethod
+    def get_block_number(max_age=None):
+        """
+        Return the latest block number, asking the node at most once every `max_age`
+        seconds.
+
+        :param max_age: float seconds, defaults to `BLOCK_NUMBER_MAX_AGE`
+        :return: block number, int
+        """
+        if max_age is None:
+            max_age = Web3Provider.BLOCK_NUMBER_MAX_AGE
+
+        head_block = Web3Provider.get_pushed_block_number()
+        if head_block is not None:
+            # New heads are pushed, the observed block number is current.
+            Web3Provider.observe_block(head_block)
+            return max(head_block, Web3Provider._block_number)
+
+        with Web3Provider._block_lock:
+            if (Web3Provider._block_number is not None and
+                    time.time() - Web3Provider._block_number_time < max_age):
+                return Web3Provider._block_number
+
+        block_number = Web3Provider.get_web3().eth.blockNumber
+        Web3Provider.observe_block(block_number)
+        return block_number
+
+    @staticmethod
+    def observe_block(block_number):
+        """
+        Record a block number seen elsewhere (receipts, logs, subscriptions) so the
+        cached value never lags behind what the process already knows.
+
+        :param block_number: int
+        """
+        with Web3Provider._block_lock:
+            if Web3Provider._block_number is None or block_number >= Web3Provider._block_number:
+                Web3Provider._block_number = block_number
+                Web3Provider._block_number_time = time.time()
+
+    @staticmethod
+    def wait_for_block(after_block=None, timeout=1.0):
+        """
+        Wait for a block newer than `after_block`. Over websocket or IPC this returns as
+        soon as the node pushes the new head, otherwise it sleeps `timeout` seconds.
+
+        :param after_block: int
+        :param timeout: float seconds
+        """
+        client = Web3Provider.get_subscription_client()
+        if client is not None:
+            client.wait_for_block(after_block, timeout)
+        else:
+            time.sleep(timeout)
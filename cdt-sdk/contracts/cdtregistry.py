@@ -5,7 +5,7 @@ from urllib.parse import urlparse
 from web3 import Web3
 
 from cdt_utils.contract_base import ContractBase
-from cdt_utils.event_filter import EventFilter
+from cdt_utils.log_scanner import LogScanner
 
 logger = logging.getLogger(__name__)
 
@@ -13,6 +13,41 @@ class CDTRegistry(ContractBase):
     """CDT注册类"""
     CDT_REGISTRY_EVENT_NAME = 'CDTAttributeRegistered'
     CONTRACT_NAME = 'CDTRegistry'
+    CACHED_CALLS = ('isAuthority', 'getPermission', 'getCDTOwner', 'getBlockNumberUpdated')
+    CACHE_INVALIDATING_EVENTS = {
+        'AuthorityAdded': (('isAuthority', ('_member',)),),
+        'CDTAttributeRegistered': (('getCDTOwner', ('_cdt',)),
+                                   ('getBlockNumberUpdated', ('_cdt',))),
+        'CDTPermissionGranted': (('getPermission', ('_cdt', '_grantee')),),
+    }
+    _index = None
+    _permission_index = None
+
+    def attach_index(self, index):
+        """
+        Answer the event based lookups (`get_owner_asset_ids`,
+        `get_registered_attribute`) from a local `RegistryIndex` instead of the node;
+        the node is only asked while the index is not current, see
+        `RegistryIndex.is_current`. The lookups never update the index, see
+        `RegistryIndex.sync` and `watch`.
+
+        :param index: RegistryIndex, None detaches the current index
+        """
+        self._index = index
+
+    def attach_permission_index(self, permission_index):
+        """
+        Answer `get_permission` and `get_permissions` from a local `PermissionIndex`;
+        the node is only asked while the index is not current, see
+        `PermissionIndex.lookup`.
+
+        :param permission_index: PermissionIndex, None detaches the current index
+        """
+        self._permission_index = permission_index
+
+    @property
+    def permission_index(self):
+        return self._permission_index
 
     def add_authority(self, address, name, account):
         tx_hash = self.send_transaction(
@@ -25,23 +60,28 @@ class CDTRegistry(ContractBase):
         return self.is_tx_successful(tx_hash)
 
     def is_authority(self, address):
-        return self.contract_concise.isAuthority(address)
+        return self.call('isAuthority', address)
 
     def register(self, cdt, checksum, url, account):
-        transaction = self._register_attribute(
-            cdt, checksum, url, account)
+        event = self.wait_event(self.register_async(cdt, checksum, url, account))
+        return event is not None
 
-        receipt = self.get_tx_receipt(transaction)
-        if receipt:
-            return receipt.status == 1
+    def register_async(self, cdt, checksum, url, account, timeout=20):
+        """
+        Send the `registerAttribute` transaction without waiting for it to be mined.
 
-        _filters = dict()
-        _filters['_cdt'] = Web3.toBytes(hexstr=cdt)
-        _filters['_owner'] = Web3.toBytes(hexstr=account.address)
-        event = self.subscribe_to_event(self.CDT_REGISTRY_EVENT_NAME, 15, _filters, wait=True)
-        return event is not None
+        :return: Future resolved with the `CDTAttributeRegistered` event of the receipt,
+            None if the transaction failed
+        """
+        tx_hash = self.register_attribute(cdt, checksum, url, account)
+        return self.track_event(tx_hash, self.CDT_REGISTRY_EVENT_NAME, timeout=timeout)
 
-    def _register_attribute(self, cdt, checksum, value, account):
+    def register_attribute(self, cdt, checksum, value, account):
+        """
+        Send the `registerAttribute` transaction without waiting for it to be mined.
+
+        :return: hash of the transaction
+        """
         return self.send_transaction(
             'registerAttribute',
             (cdt,
@@ -52,6 +92,15 @@ class CDTRegistry(ContractBase):
                       'account_key': account.key}
         )
 
+    def get_registered_event(self, receipt):
+        """
+        Return the `CDTAttributeRegistered` event emitted in a transaction receipt.
+
+        :param receipt: Tx receipt
+        :return: decoded event or None
+        """
+        return self.get_receipt_event(receipt, self.CDT_REGISTRY_EVENT_NAME)
+
     def grant_permission(self, cdt, cdt_to_grant, account):
         tx_hash = self.send_transaction(
             'grantPermission',
@@ -62,37 +111,103 @@ class CDTRegistry(ContractBase):
         )
         return self.is_tx_successful(tx_hash)
 
+    def grant_permissions(self, cdts, cdt_to_grant, account, timeout=20):
+        """
+        Grant many cdts to one grantee in a single `grantPermissions` transaction.
+
+        The contract skips the cdts the account does not own, the result of each cdt is
+        read from the `CDTPermissionGranted` events of the receipt.
+
+        :param cdts: list of bytes32 ids
+        :param cdt_to_grant: bytes32 id of the grantee cdt
+        :param account: Account owning the cdts
+        :param timeout: float seconds to wait for the transaction to be mined
+        :return: list of bool in the order of `cdts`, all False if the transaction
+            reverted, None if it was not mined in time and may still grant them
+        """
+        cdts = list(cdts)
+        tx_hash = self.send_transaction(
+            'grantPermissions',
+            (cdts, cdt_to_grant),
+            transact={'from': account.address,
+                      'passphrase': account.password,
+                      'account_key': account.key}
+        )
+        receipt = self.get_tx_receipt(tx_hash, timeout)
+        if receipt is None:
+            logger.warning(f'grantPermissions transaction {Web3.toHex(tx_hash)} '
+                           f'not mined after {timeout}s')
+            return None
+        if receipt.status != 1:
+            return [False] * len(cdts)
+
+        granted = set()
+        for event in self.get_receipt_events(receipt, 'CDTPermissionGranted'):
+            # the permission index picks the grants up once they are confirmed
+            self.invalidate_from_event(event)
+            granted.add(self._cache_args((event['args']['_cdt'],))[0])
+        return [self._cache_args((cdt,))[0] in granted for cdt in cdts]
+
     def get_permission(self, cdt, cdt_granted):
-        return self.contract_concise.getPermission(cdt, cdt_granted)
+        if self._permission_index:
+            permission = self._permission_index.lookup(cdt, cdt_granted)
+            if permission is not None:
+                return permission
+        return self.call('getPermission', cdt, cdt_granted)
+
+    def get_permissions(self, cdts, cdt_granted):
+        """
+        Check the permissions of many cdts for one grantee in a single request.
+
+        :return: list of bool in the order of `cdts`, None where the call failed
+        """
+        cdts = list(cdts)
+        results = [self._permission_index.lookup(cdt, cdt_granted)
+                   if self._permission_index else None for cdt in cdts]
+        pending = [i for i, result in enumerate(results) if result is None]
+        if pending:
+            values = self.multicall([(self, 'getPermission', (cdts[i], cdt_granted))
+                                     for i in pending])
+            for i, value in zip(pending, values):
+                results[i] = value
+        return results
 
     def get_cdt_owner(self, cdt):
-        return self.contract_concise.getCDTOwner(cdt)
+        return self.call('getCDTOwner', cdt)
+
+    def get_cdt_owners(self, cdts):
+        """
+        Get the owners of many cdts in a single request.
+
+        :return: list of addresses in the order of `cdts`, None where the call failed
+        """
+        return self.multicall([(self, 'getCDTOwner', (cdt,)) for cdt in cdts])
 
     def get_owner_asset_ids(self, address):
-        block_filter = self._get_event_filter(owner=address)
-        log_items = block_filter.get_all_entries(max_tries=5)
-        cdt_list = []
-        for log_i in log_items:
-            cdt_list.append(log_i.args['_cdt'])
+        if self._index and self._index.is_current():
+            return self._index.get_owner_cdts(address)
 
-        return cdt_list
+        return [event.args['_cdt'] for event in self._scan_events(owner=address)]
 
     def get_block_number_updated(self, cdt):
-        return self.contract_concise.getBlockNumberUpdated(cdt)
+        return self.call('getBlockNumberUpdated', cdt)
 
     def get_registered_attribute(self, cdt_bytes):
         result = None
         cdt = Web3.toHex(cdt_bytes)
-        
+        if self._index and self._index.is_current():
+            result = self._index.get_attribute(cdt_bytes)
+            if result:
+                return result
+
         block_number = self.get_block_number_updated(cdt_bytes)
         logger.debug(f'got blockNumber {block_number} for cdt {cdt}')
         if block_number == 0:
             logger.warning(f'cdt {cdt} is not found on-chain')
             return result
 
-        block_filter = self._get_event_filter(cdt=cdt, from_block=block_number - 1,
-                                                  to_block=block_number + 1)
-        log_items = block_filter.get_all_entries(max_tries=5)
+        log_items = list(self._scan_events(cdt=cdt, from_block=block_number - 1,
+                                           to_block=block_number + 1))
 
         if log_items:
             log_item = log_items[-1].args
@@ -110,19 +225,16 @@ class CDTRegistry(ContractBase):
                            f'cdt {cdt} at blockNumber {block_number}')
         return result
 
-    def _get_event_filter(self, cdt=None, owner=None, from_block=0, to_block='latest'):
+    def _scan_events(self, cdt=None, owner=None, from_block=0, to_block='latest'):
         _filters = {}
         if cdt is not None:
             _filters['_cdt'] = Web3.toBytes(hexstr=cdt)
         if owner is not None:
             _filters['_owner'] = Web3.toBytes(hexstr=owner)
 
-        block_filter = EventFilter(
-            CDTRegistry.CDT_REGISTRY_EVENT_NAME,
+        return LogScanner().scan(
             getattr(self.events, CDTRegistry.CDT_REGISTRY_EVENT_NAME),
             from_block=from_block,
             to_block=to_block,
             argument_filters=_filters
         )
-        return block_filter
-
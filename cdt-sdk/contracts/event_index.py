@@ -0,0 +1,225 @@
+import logging
+import os
+import sqlite3
+import threading
+
+from eth_utils import add_0x_prefix, event_abi_to_log_topic
+from web3 import Web3
+from web3.utils.events import get_event_data
+
+from cdt_utils.confirmed_event_stream import ConfirmedEventStream
+from cdt_utils.log_scanner import LogScanner
+from cdt_utils.web3_provider import Web3Provider
+
+logger = logging.getLogger(__name__)
+
+
+def _to_key(cdt):
+    # bytes32 id, hex id with or without 0x -> lowercase 0x hex
+    return Web3.toHex(cdt) if isinstance(cdt, (bytes, bytearray)) else add_0x_prefix(cdt.lower())
+
+
+class ConfirmedEventIndex:
+    """
+    合约事件的本地索引基类
+
+    Indexes the confirmed `EVENT_NAME` events of a contract, optionally in SQLite with
+    the last processed block. `sync` scans the logs since the checkpoint without
+    following reorgs; `watch` follows the chain from a background thread with a
+    `ConfirmedEventStream`, so an event orphaned by a reorg is removed again. On start
+    the events of the last `REORG_WINDOW` indexed blocks are read again from the chain.
+
+    Subclasses set `EVENT_NAME`, `TABLE` and `SCHEMA` and implement `_index_events`
+    and `remove_event`; the rows of `TABLE` need `registry` and `block_number` columns.
+    An in-memory state read back by `_load_rows` must exist before `__init__` runs.
+    """
+    EVENT_NAME = None
+    TABLE = None
+    SCHEMA = ()
+    REORG_WINDOW = ConfirmedEventStream.HISTORY_SIZE
+
+    def __init__(self, contract, db_path=None, start_block=0, confirmations=None):
+        """
+        :param contract: ContractBase instance emitting `EVENT_NAME`
+        :param db_path: str path of the sqlite database, ':memory:' keeps it in memory,
+            None does not use sqlite
+        :param start_block: int first block to index, e.g. the contract deployment block
+        :param confirmations: int blocks an event needs to be indexed, including its
+            own, defaults to `ConfirmedEventStream.DEFAULT_CONFIRMATIONS`
+        """
+        self.confirmations = max(1, confirmations if confirmations is not None
+                                 else ConfirmedEventStream.DEFAULT_CONFIRMATIONS)
+        self._contract = contract
+        self._registry_address = contract.address.lower()
+        self._event_abi = getattr(contract.events, self.EVENT_NAME)().abi
+        self._topic = Web3.toHex(event_abi_to_log_topic(self._event_abi))
+        self._checkpoint_name = f'{self._registry_address}:{self.EVENT_NAME}'
+        self._start_block = start_block
+        self._last_block = start_block - 1
+        self._scanner = LogScanner()
+        self._lock = threading.RLock()
+        self._stream = None
+        self._thread = None
+        self._stopped = threading.Event()
+
+        self._conn = None
+        if db_path:
+            if db_path != ':memory:':
+                db_path = os.path.expanduser(os.path.expandvars(db_path))
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._create_tables()
+            self._load()
+
+    def _create_tables(self):
+        with self._lock, self._conn:
+            for statement in self.SCHEMA:
+                self._conn.execute(statement)
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS checkpoints ('
+                'name TEXT PRIMARY KEY, block_number INTEGER NOT NULL)')
+
+    def _load(self):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT block_number FROM checkpoints WHERE name = ?',
+                (self._checkpoint_name,)).fetchone()
+            if row:
+                # the events of the reorg window are read again from the chain
+                self._last_block = max(self._start_block - 1, row[0] - self.REORG_WINDOW)
+                with self._conn:
+                    self._conn.execute(
+                        f'DELETE FROM {self.TABLE} WHERE registry = ? AND block_number > ?',
+                        (self._registry_address, self._last_block))
+            self._load_rows()
+        logger.debug(f'loaded {self.EVENT_NAME} index up to block {self._last_block}')
+
+    def _load_rows(self):
+        """Rebuild the in-memory state from `TABLE`, nothing by default."""
+
+    @property
+    def last_block(self):
+        """Last block whose events are in the index, int."""
+        return self._last_block
+
+    def is_current(self):
+        """True while watching and every confirmed block is indexed."""
+        if self._stream is None:
+            return False
+        head = Web3Provider.get_block_number()
+        return self.last_block >= head - self.confirmations + 1
+
+    def sync(self, to_block=None):
+        """
+        Index the events emitted since the last checkpoint, without following reorgs.
+
+        :param to_block: int last block to index, at most the last confirmed block
+        :return: number of events indexed, int
+        """
+        confirmed_block = Web3Provider.get_block_number(max_age=0) - self.confirmations + 1
+        to_block = confirmed_block if to_block is None else min(to_block, confirmed_block)
+
+        with self._lock:
+            from_block = self._last_block + 1
+            if from_block > to_block:
+                return 0
+
+            count = 0
+            chunks = self._scanner.scan_chunks({
+                'address': Web3.toChecksumAddress(self._registry_address),
+                'topics': [self._topic]
+            }, from_block, to_block)
+            for _, end, logs in chunks:
+                self._store_events([get_event_data(self._event_abi, log) for log in logs], end)
+                count += len(logs)
+
+            logger.debug(f'indexed {count} {self.EVENT_NAME} events '
+                         f'in blocks {from_block}-{to_block}')
+            return count
+
+    def watch(self):
+        """
+        Follow the confirmed events from the last checkpoint on, from a background
+        thread: the blocks older than the reorg window are scanned at once, the newer
+        ones are indexed once confirmed and rolled back if orphaned.
+
+        :return: self
+        """
+        self._stream = self._contract.get_confirmed_event_stream(
+            self.EVENT_NAME, confirmations=self.confirmations,
+            from_block=self._last_block + 1)
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._follow, daemon=True,
+                                        name=f'{self.EVENT_NAME}-index')
+        self._thread.start()
+        return self
+
+    def _follow(self):
+        stream = self._stream
+        while not self._stopped.is_set():
+            try:
+                self._apply(stream.poll(), stream.confirmed_block)
+            except Exception as e:
+                logger.warning(f'{self.EVENT_NAME} index update failed: {e}')
+            Web3Provider.wait_for_block(stream.last_block, stream.POLL_INTERVAL)
+
+    def _apply(self, items, confirmed_block):
+        # events and checkpoint move together, `is_current` never sees one without the other
+        with self._lock:
+            for item in items:
+                if item.retracted:
+                    self.remove_event(item.event)
+                else:
+                    self._store_events([item.event], None)
+            if confirmed_block > self._last_block:
+                self._store_events([], confirmed_block)
+
+    def add_event(self, event):
+        """
+        Index a single decoded event that reached the confirmation depth, without
+        moving the checkpoint.
+
+        :param event: decoded event log
+        """
+        with self._lock:
+            self._store_events([event], None)
+
+    def remove_event(self, event):
+        """
+        Undo an indexed event orphaned by a reorg.
+
+        :param event: decoded event log
+        """
+        raise NotImplementedError
+
+    def _store_events(self, events, checkpoint):
+        # the rows and the checkpoint are committed in one transaction
+        if self._conn is None:
+            self._index_events(events)
+        else:
+            with self._conn:
+                self._index_events(events)
+                if checkpoint is not None:
+                    self._conn.execute(
+                        'INSERT OR REPLACE INTO checkpoints (name, block_number) '
+                        'VALUES (?, ?)',
+                        (self._checkpoint_name, max(self._last_block, checkpoint)))
+        if checkpoint is not None:
+            self._last_block = max(self._last_block, checkpoint)
+
+    def _index_events(self, events):
+        """
+        Add decoded events to the index, inside the transaction of `_store_events`
+        when sqlite is used.
+
+        :param events: list of decoded event logs
+        """
+        raise NotImplementedError
+
+    def close(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(ConfirmedEventStream.POLL_INTERVAL * 2)
+            self._thread = None
+        self._stream = None
+        if self._conn is not None:
+            self._conn.close()
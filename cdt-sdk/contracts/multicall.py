@@ -0,0 +1,67 @@
+import logging
+
+from eth_abi import decode_abi, encode_abi
+from eth_utils import function_signature_to_4byte_selector
+from hexbytes import HexBytes
+from web3 import Web3
+
+from cdt_utils.web3.call import decode_call_output
+from cdt_utils.web3_provider import Web3Provider
+
+logger = logging.getLogger(__name__)
+
+
+class Multicall:
+    """只读调用聚合类"""
+    CONTRACT_NAME = 'Multicall'
+    AGGREGATE_SIGNATURE = 'aggregate(address[],bytes[])'
+    AGGREGATE_OUTPUT_TYPES = ['uint256', 'bool[]', 'bytes[]']
+    # 单次eth_call聚合的调用数上限，避免超出节点的eth_call gas上限
+    MAX_CALLS = 200
+
+    def __init__(self, address):
+        self.address = Web3.toChecksumAddress(address)
+        self._selector = function_signature_to_4byte_selector(self.AGGREGATE_SIGNATURE)
+
+    def aggregate(self, contract_functions, block_identifier='latest'):
+        """
+        Run many view calls in one `eth_call` to the Multicall contract.
+
+        :param contract_functions: list of web3 ContractFunction with their arguments set
+        :param block_identifier: 'latest' or block number, int
+        :return: (block number, list of decoded results with None for the failed calls)
+        """
+        block_number = None
+        results = []
+        for start in range(0, len(contract_functions), self.MAX_CALLS):
+            chunk = contract_functions[start:start + self.MAX_CALLS]
+            chunk_block_number, chunk_results = self._aggregate(chunk, block_identifier)
+            if block_number is None or chunk_block_number < block_number:
+                block_number = chunk_block_number
+            results.extend(chunk_results)
+        return block_number, results
+
+    def _aggregate(self, contract_functions, block_identifier):
+        targets = [contract_function.address for contract_function in contract_functions]
+        data = [HexBytes(contract_function._encode_transaction_data())
+                for contract_function in contract_functions]
+        call_data = self._selector + encode_abi(['address[]', 'bytes[]'], [targets, data])
+
+        web3 = Web3Provider.get_web3()
+        raw = web3.eth.call({'to': self.address, 'data': Web3.toHex(call_data)},
+                            block_identifier)
+        block_number, success, return_data = decode_abi(
+            self.AGGREGATE_OUTPUT_TYPES, HexBytes(raw))
+
+        results = []
+        for contract_function, ok, output in zip(contract_functions, success, return_data):
+            value = None
+            if ok:
+                try:
+                    value = decode_call_output(contract_function, output)
+                except Exception as e:
+                    logger.debug(f'could not decode {contract_function.fn_name} output: {e}')
+            else:
+                logger.debug(f'multicall: {contract_function.fn_name} reverted')
+            results.append(value)
+        return block_number, results
@@ -0,0 +1,162 @@
+import logging
+
+from web3 import Web3
+
+from contracts.event_index import ConfirmedEventIndex, _to_key
+
+logger = logging.getLogger(__name__)
+
+
+class PermissionIndex(ConfirmedEventIndex):
+    """
+    CDT授权关系的本地图
+
+    Materializes the `CDTPermissionGranted` events of a CDTRegistry into an in-memory
+    graph cdt -> grantees and grantee -> cdts, optionally persisted in SQLite with the
+    last processed block, so permission lookups, fan-in/fan-out queries and coverage
+    checks of a composite cdt are answered locally.
+
+    Only events with `confirmations` blocks are indexed, and a grant orphaned by a reorg
+    is removed again, see `ConfirmedEventIndex`.
+
+    While watching, `lookup` answers both ways without the node: a permission granted
+    in the last `confirmations - 1` blocks is reported as missing until it is confirmed.
+
+    Example:
+        index = PermissionIndex(keeper.cdt_registry, '~/.cdt/permissions.db').watch()
+        keeper.cdt_registry.attach_permission_index(index)
+    """
+    EVENT_NAME = 'CDTPermissionGranted'
+    TABLE = 'cdt_permissions'
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS cdt_permissions ('
+        'registry TEXT NOT NULL, cdt TEXT NOT NULL, grantee TEXT NOT NULL, '
+        'owner TEXT, block_number INTEGER, '
+        'PRIMARY KEY (registry, cdt, grantee))',
+    )
+
+    def __init__(self, cdt_registry, db_path=None, start_block=0, confirmations=None):
+        """
+        :param cdt_registry: CDTRegistry instance
+        :param db_path: str path of the sqlite database, None keeps the graph in memory
+        :param start_block: int first block to index, e.g. the registry deployment block
+        :param confirmations: int blocks an event needs to be indexed, including its
+            own, defaults to `ConfirmedEventStream.DEFAULT_CONFIRMATIONS`
+        """
+        # cdt -> {grantee: (owner, block number)} and grantee -> set of cdts
+        self._grantees = dict()
+        self._granted = dict()
+        super().__init__(cdt_registry, db_path, start_block, confirmations)
+
+    def _load_rows(self):
+        rows = self._conn.execute(
+            'SELECT cdt, grantee, owner, block_number FROM cdt_permissions '
+            'WHERE registry = ?', (self._registry_address,)).fetchall()
+        for cdt, grantee, owner, block_number in rows:
+            self._add(cdt, grantee, owner, block_number)
+        logger.debug(f'loaded {len(rows)} permissions')
+
+    def __len__(self):
+        return sum(len(grantees) for grantees in self._grantees.values())
+
+    def remove_event(self, event):
+        """
+        Undo an indexed event orphaned by a reorg.
+
+        :param event: decoded event log
+        """
+        args = event['args']
+        cdt, grantee = _to_key(args['_cdt']), _to_key(args['_grantee'])
+        with self._lock:
+            grantees = self._grantees.get(cdt, {})
+            # a grant also present in another block stays
+            if grantees.get(grantee, (None, None))[1] != event['blockNumber']:
+                return
+            del grantees[grantee]
+            if not grantees:
+                del self._grantees[cdt]
+            granted = self._granted.get(grantee, set())
+            granted.discard(cdt)
+            if not granted:
+                self._granted.pop(grantee, None)
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute(
+                        'DELETE FROM cdt_permissions WHERE registry = ? AND cdt = ? AND '
+                        'grantee = ? AND block_number = ?',
+                        (self._registry_address, cdt, grantee, event['blockNumber']))
+        logger.info(f'permission of {cdt} for {grantee} retracted by a reorg')
+
+    def _index_events(self, events):
+        rows = []
+        for event in events:
+            args = event['args']
+            row = (_to_key(args['_cdt']), _to_key(args['_grantee']), args['_owner'].lower(),
+                   event['blockNumber'])
+            self._add(*row)
+            rows.append(row)
+        if self._conn is not None:
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO cdt_permissions (registry, cdt, grantee, owner, '
+                'block_number) VALUES (?, ?, ?, ?, ?)',
+                [(self._registry_address,) + row for row in rows])
+
+    def _add(self, cdt, grantee, owner, block_number):
+        grantees = self._grantees.setdefault(cdt, dict())
+        if grantee not in grantees:
+            grantees[grantee] = (owner, block_number)
+            self._granted.setdefault(grantee, set()).add(cdt)
+
+    def has_permission(self, cdt, grantee):
+        """
+        Return True if `cdt` was granted to `grantee` in a confirmed block.
+
+        :param cdt: bytes32 id, bytes or hex str
+        :param grantee: bytes32 id of the granted cdt, bytes or hex str
+        :return: bool
+        """
+        return _to_key(grantee) in self._grantees.get(_to_key(cdt), ())
+
+    def lookup(self, cdt, grantee):
+        """
+        Answer a permission check from the index when it can.
+
+        :return: True if indexed, False if missing while `is_current`, None when the
+            node must be asked
+        """
+        if self.has_permission(cdt, grantee):
+            return True
+        return False if self.is_current() else None
+
+    def get_grantees(self, cdt):
+        """
+        Return the cdts `cdt` was granted to, e.g. the algorithms allowed on a dataset.
+
+        :return: list of bytes32 ids ordered by grant block
+        """
+        with self._lock:
+            grantees = sorted(self._grantees.get(_to_key(cdt), {}).items(),
+                              key=lambda item: item[1][1])
+        return [Web3.toBytes(hexstr=grantee) for grantee, _ in grantees]
+
+    def get_granted(self, grantee):
+        """
+        Return the cdts granted to `grantee`, e.g. the leaves an algorithm may use.
+
+        :return: list of bytes32 ids
+        """
+        with self._lock:
+            cdts = sorted(self._granted.get(_to_key(grantee), ()))
+        return [Web3.toBytes(hexstr=cdt) for cdt in cdts]
+
+    def get_missing_permissions(self, grantee, cdts):
+        """
+        Check that a composite cdt was granted all the cdts it is made of.
+
+        :param grantee: bytes32 id of the composite cdt, bytes or hex str
+        :param cdts: iterable of the ids of its children
+        :return: list of the children without a permission in the index, empty when
+            the composite cdt is fully covered
+        """
+        granted = self._granted.get(_to_key(grantee), ())
+        return [cdt for cdt in cdts if _to_key(cdt) not in granted]
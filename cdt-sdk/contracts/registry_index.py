@@ -0,0 +1,118 @@
+import logging
+
+from web3 import Web3
+
+from contracts.event_index import ConfirmedEventIndex, _to_key
+
+logger = logging.getLogger(__name__)
+
+
+class RegistryIndex(ConfirmedEventIndex):
+    """
+    CDT注册事件的本地索引
+
+    Stores the `CDTAttributeRegistered` events of a CDTRegistry in a local SQLite
+    database with the last processed block, so that owner -> CDTs and CDT -> attribute
+    lookups are answered locally whatever the chain length.
+
+    Lookups only read SQLite; the index is updated by `sync` or `watch`, see
+    `ConfirmedEventIndex`. Every event is kept in its own row, so an event orphaned by
+    a reorg is deleted without losing the earlier registrations of its CDT.
+
+    Example:
+        index = RegistryIndex(keeper.cdt_registry, '~/.cdt/registry.db').watch()
+        keeper.cdt_registry.attach_index(index)
+    """
+    EVENT_NAME = 'CDTAttributeRegistered'
+    TABLE = 'cdt_attributes'
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS cdt_attributes ('
+        'registry TEXT NOT NULL, cdt TEXT NOT NULL, owner TEXT NOT NULL, '
+        'checksum BLOB, value TEXT, last_updated_by TEXT, '
+        'block_number INTEGER NOT NULL, log_index INTEGER NOT NULL, '
+        'PRIMARY KEY (registry, cdt, block_number, log_index))',
+        'CREATE INDEX IF NOT EXISTS cdt_attributes_owner '
+        'ON cdt_attributes (registry, owner)',
+    )
+
+    def __init__(self, cdt_registry, db_path=':memory:', start_block=0, confirmations=None):
+        """
+        :param cdt_registry: CDTRegistry instance
+        :param db_path: str path of the sqlite database, ':memory:' keeps it in memory
+        :param start_block: int first block to index, e.g. the registry deployment block
+        :param confirmations: int blocks an event needs to be indexed, including its
+            own, defaults to `ConfirmedEventStream.DEFAULT_CONFIRMATIONS`
+        """
+        super().__init__(cdt_registry, db_path or ':memory:', start_block, confirmations)
+
+    def remove_event(self, event):
+        """
+        Undo an indexed event orphaned by a reorg.
+
+        :param event: decoded event log
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                'DELETE FROM cdt_attributes WHERE registry = ? AND cdt = ? AND '
+                'block_number = ? AND log_index = ?',
+                (self._registry_address, _to_key(event['args']['_cdt']),
+                 event['blockNumber'], event['logIndex']))
+        logger.info(f'registration of {_to_key(event["args"]["_cdt"])} retracted by a reorg')
+
+    def _index_events(self, events):
+        # plain INSERT OR REPLACE, no UPSERT clause, which needs SQLite 3.24
+        self._conn.executemany(
+            'INSERT OR REPLACE INTO cdt_attributes (registry, cdt, owner, checksum, '
+            'value, last_updated_by, block_number, log_index) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            [(self._registry_address,
+              _to_key(event['args']['_cdt']),
+              event['args']['_owner'].lower(),
+              bytes(event['args']['_checksum']),
+              event['args']['_value'],
+              event['args']['_lastUpdatedBy'].lower(),
+              event['blockNumber'],
+              event['logIndex']) for event in events])
+
+    def get_owner_cdts(self, owner):
+        """
+        Return the ids of the CDTs whose latest registration is by an owner.
+
+        :param owner: address, hex str
+        :return: list of bytes32 ids ordered by first registration block
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT cdt, MIN(block_number) AS first_block FROM cdt_attributes AS a '
+                'WHERE registry = ? GROUP BY cdt '
+                'HAVING (SELECT owner FROM cdt_attributes AS b '
+                'WHERE b.registry = a.registry AND b.cdt = a.cdt '
+                'ORDER BY block_number DESC, log_index DESC LIMIT 1) = ? '
+                'ORDER BY first_block',
+                (self._registry_address, owner.lower())).fetchall()
+        return [Web3.toBytes(hexstr=row[0]) for row in rows]
+
+    def get_attribute(self, cdt):
+        """
+        Return the latest registered attribute of a CDT, in the same format as
+        `CDTRegistry.get_registered_attribute`.
+
+        :param cdt: bytes32 id, bytes or hex str
+        :return: dict or None if the CDT is not in the index
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT cdt, owner, checksum, value, block_number FROM cdt_attributes '
+                'WHERE registry = ? AND cdt = ? ORDER BY block_number DESC, log_index DESC '
+                'LIMIT 1',
+                (self._registry_address, _to_key(cdt))).fetchone()
+        if not row:
+            return None
+
+        return {
+            'checksum': row[2],
+            'value': row[3],
+            'block_number': row[4],
+            'cdt_bytes': Web3.toBytes(hexstr=row[0]),
+            'owner': Web3.toChecksumAddress(row[1]),
+        }
@@ -1,6 +1,5 @@
 
 import logging
-from web3 import Web3
 
 from cdt_utils.contract_base import ContractBase
 
@@ -11,8 +10,18 @@ class TaskMarket(ContractBase):
     TASK_ADD_EVENT_NAME = 'TaskAdded'
     JOB_ADD_EVENT_NAME = 'JobAdded'
     CONTRACT_NAME = 'TaskMarket'
+    CACHED_CALLS = ('getTask', 'getJob')
 
     def add_task(self, name, desc, account):
+        return self.wait_event(self.add_task_async(name, desc, account), default=0)
+
+    def add_task_async(self, name, desc, account, timeout=20):
+        """
+        Send the `addTask` transaction without waiting for it to be mined.
+
+        :return: Future resolved with the task id read from the `TaskAdded` event of
+            the receipt, None if the transaction failed
+        """
         tx_hash = self.send_transaction(
             'addTask',
             (name, desc),
@@ -20,18 +29,18 @@ class TaskMarket(ContractBase):
                       'passphrase': account.password,
                       'account_key': account.key}
         )
-        
-        _filters = dict()
-        _filters['_owner'] = Web3.toBytes(hexstr=account.address)
-        event = self.subscribe_to_event(self.TASK_ADD_EVENT_NAME, 15, _filters, wait=True)
-    
-        task_id = 0
-        if event is not None:
-            task_id = event['args']['_taskId']
-        
-        return task_id
+        return self.track_event(tx_hash, self.TASK_ADD_EVENT_NAME, '_taskId', timeout)
 
     def add_job(self, cdt, taskid, account):
+        return self.wait_event(self.add_job_async(cdt, taskid, account), default=0)
+
+    def add_job_async(self, cdt, taskid, account, timeout=20):
+        """
+        Send the `addJob` transaction without waiting for it to be mined.
+
+        :return: Future resolved with the job id read from the `JobAdded` event of
+            the receipt, None if the transaction failed
+        """
         tx_hash = self.send_transaction(
             'addJob',
             (cdt, taskid),
@@ -39,19 +48,10 @@ class TaskMarket(ContractBase):
                       'passphrase': account.password,
                       'account_key': account.key}
         )
-
-        _filters = dict()
-        _filters['_owner'] = Web3.toBytes(hexstr=account.address)
-        event = self.subscribe_to_event(self.JOB_ADD_EVENT_NAME, 15, _filters, wait=True)
-    
-        job_id = 0
-        if event is not None:
-            job_id = event['args']['_jobId']
-        
-        return job_id
+        return self.track_event(tx_hash, self.JOB_ADD_EVENT_NAME, '_jobId', timeout)
 
     def get_task(self, taskid):
-        return self.contract_concise.getTask(taskid)
+        return self.call('getTask', taskid)
         
     def get_job(self, jobid):
-        return self.contract_concise.getJob(jobid)
\ No newline at end of file
+        return self.call('getJob', jobid)
\ No newline at end of file
@@ -26,8 +26,67 @@ class CDT:
         """
         return PREFIX + remove_0x_prefix(checksum(seed))
 
+    @staticmethod
+    def legacy_cdt(seed):
+        """Create a cdt with `legacy_checksum`, as DDOs published before were."""
+        return PREFIX + remove_0x_prefix(legacy_checksum(seed))
+
+# Canonical JSON: keys sorted at every level, no whitespace, non-ASCII kept as UTF-8,
+# floats written with repr (shortest round-trip form) and NaN/Infinity rejected.
+_CANONICAL_ENCODER = json.JSONEncoder(sort_keys=True, separators=(',', ':'),
+                                      ensure_ascii=False, allow_nan=False)
+_HASH_BUFFER_SIZE = 65536
+
+
+def _canonical_value(value):
+    if isinstance(value, dict):
+        return {str(key): _canonical_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical_value(item) for item in value]
+    if hasattr(value, 'as_dictionary'):
+        return _canonical_value(value.as_dictionary())
+    return value
+
+
+def canonical_json_chunks(seed):
+    """
+    Yield the canonical JSON serialization of `seed` in pieces.
+
+    Dict keys are converted to str, so `{0: x}` and `{'0': x}` serialize the same.
+    """
+    return _CANONICAL_ENCODER.iterencode(_canonical_value(seed))
+
+
 def checksum(seed):
-    """Calculate the hash3_256."""
+    """
+    Calculate the sha3_256 of the canonical JSON of `seed`.
+
+    The serialization is hashed as it is produced, without building the whole string.
+
+    :param seed: dict
+    :return: hex digest, str
+    """
+    digest = hashlib.sha3_256()
+    buffer = []
+    size = 0
+    for chunk in canonical_json_chunks(seed):
+        buffer.append(chunk)
+        size += len(chunk)
+        if size >= _HASH_BUFFER_SIZE:
+            digest.update(''.join(buffer).encode('utf-8'))
+            buffer = []
+            size = 0
+    digest.update(''.join(buffer).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def legacy_checksum(seed):
+    """
+    Calculate the hash3_256 the way DDOs published before the canonical checksum did.
+
+    Only the top level keys are sorted and every space is removed, string values
+    included. Kept to verify those DDOs.
+    """
     return hashlib.sha3_256(
         (json.dumps(dict(sorted(seed.items(), reverse=False))).replace(" ", "")).encode(
             'utf-8')).hexdigest()
@@ -6,12 +6,21 @@ import copy
 import json
 from eth_utils import add_0x_prefix
 
-from ddo.cdt import cdt_to_id, PREFIX
-from ddo.service import Service
+from ddo.cdt import cdt_to_id, checksum, legacy_checksum, PREFIX
+from ddo.service import Service, plain_copy
 from ddo.public_key_base import PublicKeyBase, PUBLIC_KEY_TYPE_ETHEREUM_ECDSA
 
 class DDO:
-    """DDO class to create, import, export, validate DDO objects."""
+    """
+    DDO class to create, import, export, validate DDO objects.
+
+    An imported DDO owns a copy of the dictionary it was read from (none is made for
+    `json_text`), and its services are only parsed when first used. Services and
+    their attributes are only handed out as read-only views, so the cached checksums
+    are dropped on the DDO's own changes only.
+    """
+    __slots__ = ('_cdt', '_public_keys', '_authentications', '_services', '_service_values',
+                 '_proof', '_other_values', '_checksums')
 
     def __init__(self, cdt=None, json_text=None, json_filename=None, dictionary=None):
         """Clear the DDO data values."""
@@ -19,15 +28,18 @@ class DDO:
         self._public_keys = []
         self._authentications = []
         self._services = []
+        # raw service dicts of an imported DDO, parsed on first access
+        self._service_values = None
         self._proof = None
         self._other_values = {}
+        self._checksums = None
 
         if not json_text and json_filename:
             with open(json_filename, 'r') as file_handle:
                 json_text = file_handle.read()
 
         if json_text:
-            self._read_dict(json.loads(json_text))
+            self._read_dict(json.loads(json_text), copy_values=False)
         elif dictionary:
             self._read_dict(dictionary)
 
@@ -39,11 +51,43 @@ class DDO:
     @property
     def services(self):
         """Get the list of services."""
+        if self._service_values is not None:
+            self._services = [
+                Service.from_json(json.loads(value) if isinstance(value, str) else value,
+                                  copy_values=False)
+                for value in self._service_values]
+            self._service_values = None
         return self._services[:]
 
     @property
     def child_cdts(self):
-        return self._services[0].child_cdts
+        return self.services[0].child_cdts
+
+    @property
+    def checksums(self):
+        """
+        Checksums of the services as put in the proof, dict index str -> checksum.
+
+        Computed once and cached until the DDO is changed through its methods.
+        """
+        if self._checksums is None:
+            self._checksums = {str(index): service.checksum
+                               for index, service in enumerate(self.services)}
+        return self._checksums
+
+    @property
+    def legacy_checksums(self):
+        """Checksums of DDOs published before the canonical checksum, not cached."""
+        services = self.services
+        if not services:
+            return {}
+        return {str(0): legacy_checksum(services[0].as_dictionary())}
+
+    @property
+    def code_root(self):
+        """Merkle root of the (child cdt, code hash) pairs, see `ddo.merkle`, or None."""
+        services = self.services
+        return services[0].get_attribute('code_root') if services else None
 
     @property
     def proof(self):
@@ -69,9 +113,11 @@ class DDO:
         :param values: Python dict with index, templateId, serviceAgreementContract,
         list of conditions and purchase endpoint.
         """
-        values = copy.deepcopy(values) if values else {}
-        service = Service(service_type, service_endpoint, child_cdts, values.pop('attributes', None))
-        self._services.append(service)
+        attributes = values.get('attributes') if values else None
+        service = Service(service_type, service_endpoint, plain_copy(child_cdts),
+                          plain_copy(attributes))
+        self._services = self.services + [service]
+        self._checksums = None
 
     def add_proof(self, checksums):
         """Add a proof to the DDO, based on the public_key id/index and signed with the private key
@@ -108,7 +154,7 @@ class DDO:
 
     def get_service(self, service_type=None):
         """Return a service using."""
-        for service in self._services:
+        for service in self.services:
             if service.type == service_type and service_type:
                 return service
         return None
@@ -124,11 +170,12 @@ class DDO:
         data = {
             'id': self._cdt,
         }
-        if self._services:
-            values = []
-            for service in self._services:
-                values.append(service.as_dictionary())
-            data['service'] = values
+        if self._service_values is not None:
+            # not parsed since the import, the imported dicts are still exact
+            data['service'] = [json.loads(value) if isinstance(value, str)
+                               else copy.deepcopy(value) for value in self._service_values]
+        elif self._services:
+            data['service'] = [service.as_dictionary() for service in self._services]
         if self._proof and is_proof:
             data['proof'] = self._proof
 
@@ -137,21 +184,20 @@ class DDO:
 
         return data
 
-    def _read_dict(self, dictionary):
-        """Import a JSON dict into this DDO."""
-        values = copy.deepcopy(dictionary)
+    def _read_dict(self, dictionary, copy_values=True):
+        """
+        Import a JSON dict into this DDO.
+
+        :param copy_values: False when the dict was just decoded and nobody else holds it
+        """
+        values = copy.deepcopy(dictionary) if copy_values else dict(dictionary)
         self._cdt = values.pop('id')
 
         if 'service' in values:
             self._services = []
-            for value in values.pop('service'):
-                if isinstance(value, str):
-                    value = json.loads(value)
-                else:
-                    service = Service.from_json(value)
-
-                self._services.append(service)
+            self._service_values = values.pop('service')
+            self._checksums = None
         if 'proof' in values:
             self._proof = values.pop('proof')
 
-        self._other_values = values
\ No newline at end of file
+        self._other_values = values
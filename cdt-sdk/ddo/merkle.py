@@ -0,0 +1,158 @@
+"""
+Merkle tree over the (child CDT, code hash) pairs of an algorithm DDO.
+
+The root is published in the algorithm service attributes as `code_root`; each leaf
+provider then checks the code it is asked to run with the O(log n) inclusion proof
+of its own pair instead of the full `code_proofs` of the DDO.
+"""
+
+from eth_utils import add_0x_prefix, is_hex
+from web3 import Web3
+
+from ddo.cdt import cdt_to_id_bytes
+
+# Leaves and inner nodes are hashed with different prefixes so an inner node can
+# never be passed off as a leaf.
+LEAF_PREFIX = b'\x00'
+NODE_PREFIX = b'\x01'
+
+
+def _to_bytes(value):
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value)
+    if isinstance(value, str) and value.startswith('0x') and is_hex(value):
+        return Web3.toBytes(hexstr=value)
+    return str(value).encode('utf-8')
+
+
+def code_leaf(child_cdt, code_hash):
+    """
+    Hash a (child CDT, code hash) pair into a leaf.
+
+    :param child_cdt: Asset cdt, str
+    :param code_hash: hash of the code run on the child, 0x hex str, bytes or str
+    :return: bytes
+    """
+    return Web3.sha3(LEAF_PREFIX + cdt_to_id_bytes(child_cdt) + _to_bytes(code_hash))
+
+
+def _node(left, right):
+    return Web3.sha3(NODE_PREFIX + left + right)
+
+
+def code_pairs(child_cdts, code_proofs):
+    """
+    Pair the child cdts with their code hashes in the order of the child indexes.
+
+    :param child_cdts: dict index -> cdt, as in the service `child_cdts`
+    :param code_proofs: dict index -> code hash, as in the `code_proofs` attribute
+    :return: list of (cdt, code hash)
+    """
+    code_proofs = {str(index): code_hash for index, code_hash in code_proofs.items()}
+    indexes = sorted(child_cdts, key=int)
+    return [(child_cdts[index], code_proofs[str(index)]) for index in indexes]
+
+
+class MerkleTree:
+    """
+    Binary Merkle tree; an odd node at the end of a level moves up unchanged.
+
+    Example:
+        tree = MerkleTree.build(code_pairs(child_cdts, code_proofs))
+        proof = tree.proof(tree.index(leaf_cdt))
+        MerkleTree.verify(tree.root, leaf_cdt, code_hash, proof)
+    """
+
+    def __init__(self, leaves, cdts=None):
+        """
+        :param leaves: list of leaf hashes, bytes
+        :param cdts: list of the cdts of the leaves, for `index`
+        """
+        if not leaves:
+            raise ValueError('a Merkle tree needs at least one leaf')
+        self._levels = [list(leaves)]
+        while len(self._levels[-1]) > 1:
+            level = self._levels[-1]
+            parents = [_node(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+            if len(level) % 2:
+                parents.append(level[-1])
+            self._levels.append(parents)
+        self._cdts = list(cdts) if cdts else []
+
+    @classmethod
+    def build(cls, pairs):
+        """
+        :param pairs: list of (child cdt, code hash)
+        :return: MerkleTree
+        """
+        return cls([code_leaf(cdt, code_hash) for cdt, code_hash in pairs],
+                   [cdt for cdt, _ in pairs])
+
+    @property
+    def root(self):
+        """Root hash, 0x hex str."""
+        return Web3.toHex(self._levels[-1][0])
+
+    def __len__(self):
+        return len(self._levels[0])
+
+    def index(self, cdt):
+        """Return the leaf index of a child cdt, -1 if it is not in the tree."""
+        return self._cdts.index(cdt) if cdt in self._cdts else -1
+
+    def proof(self, index):
+        """
+        Return the inclusion proof of a leaf.
+
+        :param index: int leaf index
+        :return: dict with the leaf `index`, the leaf `count` and the `siblings` hashes
+            from the bottom up, JSON serializable
+        """
+        if not 0 <= index < len(self):
+            raise IndexError(f'leaf index {index} out of range')
+
+        siblings = []
+        position = index
+        for level in self._levels[:-1]:
+            sibling = position ^ 1
+            if sibling < len(level):
+                siblings.append(Web3.toHex(level[sibling]))
+            position //= 2
+        return {'index': index, 'count': len(self), 'siblings': siblings}
+
+    @staticmethod
+    def verify(root, child_cdt, code_hash, proof):
+        """
+        Check that (child_cdt, code_hash) is a leaf of the tree with root `root`.
+
+        :param root: 0x hex str, as in `code_root`
+        :param child_cdt: Asset cdt, str
+        :param code_hash: hash of the code, 0x hex str, bytes or str
+        :param proof: dict returned by `proof`
+        :return: bool
+        """
+        try:
+            position = int(proof['index'])
+            count = int(proof['count'])
+            siblings = [Web3.toBytes(hexstr=sibling) for sibling in proof['siblings']]
+        except (KeyError, TypeError, ValueError):
+            return False
+        if not 0 <= position < count:
+            return False
+
+        node = code_leaf(child_cdt, code_hash)
+        siblings.reverse()
+        while count > 1:
+            if position % 2:
+                if not siblings:
+                    return False
+                node = _node(siblings.pop(), node)
+            elif position + 1 < count:
+                if not siblings:
+                    return False
+                node = _node(node, siblings.pop())
+            position //= 2
+            count = (count + 1) // 2
+        if siblings:
+            return False
+        return Web3.toHex(node) == add_0x_prefix(root).lower()
@@ -6,20 +6,59 @@ author: lqb
 import copy
 import json
 import logging
+from collections.abc import Mapping
+from types import MappingProxyType
+
+from ddo.cdt import checksum
 
 logger = logging.getLogger(__name__)
 
+
+def read_only(value):
+    """
+    Return a nested read-only view of a JSON value: dicts become `MappingProxyType`
+    and lists tuples, the leaves are shared.
+    """
+    if isinstance(value, Mapping):
+        return MappingProxyType({key: read_only(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(read_only(item) for item in value)
+    return value
+
+
+def plain_copy(value):
+    """Return a mutable deep copy of a JSON value, also of a `read_only` view."""
+    if isinstance(value, Mapping):
+        return {key: plain_copy(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [plain_copy(item) for item in value]
+    return copy.deepcopy(value)
+
+
 class Service:
+    """
+    DDO中的一个service
+
+    The attributes and child cdts are owned by the service and never change: the
+    accessors return read-only views built once, so the memoized checksum always
+    matches the service.
+    """
     SERVICE_ENDPOINT = 'serviceEndpoint'
     SERVICE_TYPE = 'type'
     SERVICE_CHILD_CDTS = 'child_cdts'
     SERVICE_ATTRIBUTES = 'attributes'
 
+    __slots__ = ('_service_endpoint', '_type', '_child_cdts', '_attributes', '_checksum',
+                 '_child_cdts_view', '_attributes_view')
+
     def __init__(self, service_type, service_endpoint, child_cdts, attributes):
         self._service_endpoint = service_endpoint
         self._type = service_type or ''
         self._child_cdts = child_cdts
         self._attributes = attributes or {}
+        self._checksum = None
+        self._child_cdts_view = None
+        self._attributes_view = None
 
     @property
     def type(self):
@@ -31,13 +70,34 @@ class Service:
 
     @property
     def child_cdts(self):
-        return self._child_cdts
+        """Read-only view of the child cdts, None if the service has none."""
+        if self._child_cdts_view is None and self._child_cdts is not None:
+            self._child_cdts_view = read_only(self._child_cdts)
+        return self._child_cdts_view
 
     @property
     def attributes(self):
-        return self._attributes
+        """Read-only view of the attributes, see `plain_copy` for a mutable one."""
+        if self._attributes_view is None:
+            self._attributes_view = read_only(self._values()[self.SERVICE_ATTRIBUTES])
+        return self._attributes_view
+
+    def get_attribute(self, name, default=None):
+        """Read-only view of a single attribute."""
+        return self.attributes.get(name, default)
+
+    @property
+    def checksum(self):
+        """Canonical checksum of `as_dictionary()`, computed on first use."""
+        if self._checksum is None:
+            self._checksum = checksum(self._values())
+        return self._checksum
 
     def as_dictionary(self):
+        return copy.deepcopy(self._values())
+
+    def _values(self):
+        # shares the service's own structures, not to be handed out
         attributes = {}
         for key, value in self._attributes.items():
             if isinstance(value, object) and hasattr(value, 'as_dictionary'):
@@ -58,18 +118,24 @@ class Service:
 
     @classmethod
     def _parse_json(cls, service_dict):
-        sd = copy.deepcopy(service_dict)
-        _service_endpoint = sd.pop(cls.SERVICE_ENDPOINT, None)
-        _type = sd.pop(cls.SERVICE_TYPE, None)
-        _attributes = sd.pop(cls.SERVICE_ATTRIBUTES, None)
-        _child_cdts = sd.pop(cls.SERVICE_CHILD_CDTS, None)
+        # 调用方已拷贝的字典直接引用
+        _service_endpoint = service_dict.get(cls.SERVICE_ENDPOINT)
+        _type = service_dict.get(cls.SERVICE_TYPE)
+        _attributes = service_dict.get(cls.SERVICE_ATTRIBUTES)
+        _child_cdts = service_dict.get(cls.SERVICE_CHILD_CDTS)
 
         return _type, _service_endpoint, _child_cdts, _attributes
 
     @classmethod
-    def from_json(cls, service_dict):
+    def from_json(cls, service_dict, copy_values=True):
+        """
+        :param service_dict: dict of the service
+        :param copy_values: False when the caller hands over a dict nobody else holds
+        """
+        if copy_values:
+            service_dict = copy.deepcopy(service_dict)
         _type, _service_endpoint, _child_cdts, _attributes = cls._parse_json(service_dict)
-        
+
         return cls(
             _type,
             _service_endpoint,
@@ -35,10 +35,12 @@ if __name__ == "__main__":
     artifacts_path = os.getenv('ARTIFACTS_PATH')
     cdt_registry_address = os.getenv('CDT_REGISTRY_ADDRESS')
     task_market_address = os.getenv('TASK_MARKET_ADDRESS')
+    multicall_address = os.getenv('MULTICALL_ADDRESS')
 
     Web3Provider.init_web3('http://localhost:8545')
     ContractHandler.set_artifacts_path(os.path.expanduser(artifacts_path))
-    ContractHandler.set_contract_address(cdt_registry_address, task_market_address)
+    ContractHandler.set_contract_address(cdt_registry_address, task_market_address,
+                                         multicall_address)
     keeper = Keeper.get_instance()
 
     # 通过环境变量获取三个以太坊账户, ganache-cli的第一个账户为合约部署的系统账户
@@ -109,6 +111,9 @@ if __name__ == "__main__":
     job_id_hash = add_ethereum_prefix_and_hash_msg(msg)
     signature = keeper.sign_hash(job_id_hash, account3)
 
+    # 随请求附上该数据源对应代码哈希的默克尔证明
+    code_proof = algorithm_provider.get_code_proof(dataset_ddo1.cdt, algorithm_ddo)
+
     # 数据源方接受远程访问请求，判断计算操作的有效性，验证通过后，执行本地计算
     if data_provider1.verify_remote_access(job_id, dataset_ddo1, algorithm_ddo, account3.address, signature):
-        data_provider1.start_remote_compute(dataset_ddo1, algorithm_ddo)
+        data_provider1.start_remote_compute(dataset_ddo1, algorithm_ddo, code_proof)
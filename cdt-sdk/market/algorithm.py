@@ -1,6 +1,7 @@
 
 from market.provider import Provider
 from ddo.cdt import cdt_to_id, cdt_to_id_bytes
+from ddo.merkle import MerkleTree, code_pairs
 from eth_utils import remove_0x_prefix
 
 class AlgorithmProvider(Provider):
@@ -10,9 +11,64 @@ class AlgorithmProvider(Provider):
         self.keeper = keeper
         self.ipfs_client = ipfs_client
         self.account = account
+        # 算法cdt -> (代码哈希的默克尔树, (子cdt, 代码哈希)列表)，代码哈希不随DDO发布
+        self._code_trees = {}
 
         super(AlgorithmProvider, self).__init__(keeper,ipfs_client,account)
-        
+
+    def generate_ddo(self, service_type, service_endpoint=None, child_cdts=None, values=None):
+        """
+        Generate an algorithm DDO, publishing only the `code_root` of the `code_proofs`
+        attribute and keeping the code hashes here for `get_code_proof`.
+        """
+        attributes = values.get('attributes') if values else None
+        code_proofs = attributes.get('code_proofs') if attributes else None
+        if not (child_cdts and code_proofs):
+            return super(AlgorithmProvider, self).generate_ddo(
+                service_type, service_endpoint, child_cdts, values)
+
+        pairs = code_pairs(child_cdts, code_proofs)
+        tree = MerkleTree.build(pairs)
+        attributes = {k: v for k, v in attributes.items() if k != 'code_proofs'}
+        attributes['code_root'] = tree.root
+        ddo = super(AlgorithmProvider, self).generate_ddo(
+            service_type, service_endpoint, child_cdts, dict(values, attributes=attributes))
+        self._code_trees[ddo.cdt] = (tree, pairs)
+        return ddo
+
+    def get_code_proof(self, leaf_cdt, algorithm_ddo, code_proofs=None):
+        """
+        Return the Merkle proof of the code hash run on `leaf_cdt`, sent with the remote
+        access request so the leaf provider only needs the published `code_root`.
+
+        :param leaf_cdt: Asset cdt, str
+        :param algorithm_ddo: DDO with a `code_root`
+        :param code_proofs: dict child index -> code hash, required unless the DDO was
+            generated by this provider
+        :return: dict with `leaf_cdt`, `code_hash` and `proof`, None if `leaf_cdt` is
+            not a child of the algorithm
+        """
+        entry = self._code_trees.get(algorithm_ddo.cdt)
+        if entry is None:
+            if code_proofs is None:
+                raise ValueError(f'no code proofs kept for {algorithm_ddo.cdt}')
+            pairs = code_pairs(algorithm_ddo.child_cdts, code_proofs)
+            tree = MerkleTree.build(pairs)
+            if tree.root != algorithm_ddo.code_root:
+                raise ValueError(f'code proofs do not match the code root of '
+                                 f'{algorithm_ddo.cdt}')
+            entry = self._code_trees[algorithm_ddo.cdt] = (tree, pairs)
+
+        tree, pairs = entry
+        index = tree.index(leaf_cdt)
+        if index < 0:
+            return None
+        return {
+            'leaf_cdt': leaf_cdt,
+            'code_hash': pairs[index][1],
+            'proof': tree.proof(index)
+        }
+
     def fetch_code(self, leaf_ddo, algorithm_ddo):
         # get remote operation codes
         return
@@ -0,0 +1,116 @@
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class CDTGraph:
+    """
+    可组合CDT的解析结果
+
+    Directed graph of a composite CDT and the CDTs it references through the
+    `child_cdts` of its DDO, built by `Provider.resolve_graph`. A CDT shared by several
+    parents is a single node. Edges closing a cycle are kept in `cycles` and left out of
+    the parent/child lookups, so walking `children` always terminates.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        # cdt -> DDO, None when the cdt could not be resolved; in breadth-first order
+        self._ddos = OrderedDict()
+        self._depths = dict()
+        self._children = dict()
+        self._parents = dict()
+        # (parent cdt, child cdt) edges leading back to an ancestor
+        self.cycles = []
+        # cdt -> exception raised while resolving it
+        self.errors = dict()
+        # cdts whose children were not followed because of `max_depth`
+        self.truncated = set()
+
+    def __len__(self):
+        return len(self._ddos)
+
+    def __contains__(self, cdt):
+        return cdt in self._ddos
+
+    def __iter__(self):
+        """Iterate over the cdts breadth-first from the root."""
+        return iter(self._ddos)
+
+    @property
+    def is_acyclic(self):
+        return not self.cycles
+
+    def get_ddo(self, cdt):
+        """Return the DDO of a cdt of the graph, None if it was not resolved."""
+        return self._ddos.get(cdt)
+
+    def depth(self, cdt):
+        """Return the length of the shortest path from the root to `cdt`, int."""
+        return self._depths[cdt]
+
+    def children(self, cdt):
+        """Return the child cdts of `cdt` in the order of its `child_cdts`, tuple."""
+        return tuple(self._children.get(cdt, ()))
+
+    def parents(self, cdt):
+        """Return the cdts having `cdt` as a child, tuple."""
+        return tuple(self._parents.get(cdt, ()))
+
+    def leaves(self):
+        """Return the resolved cdts without children, list."""
+        return [cdt for cdt, ddo in self._ddos.items()
+                if ddo is not None and not self._children.get(cdt)
+                and cdt not in self.truncated]
+
+    def levels(self):
+        """Return the cdts grouped by depth, list of lists."""
+        levels = []
+        for cdt, depth in self._depths.items():
+            while len(levels) <= depth:
+                levels.append([])
+            levels[depth].append(cdt)
+        return levels
+
+    def missing(self):
+        """Return the cdts that are referenced but could not be resolved, list."""
+        return [cdt for cdt, ddo in self._ddos.items() if ddo is None]
+
+    def add_node(self, cdt, depth):
+        self._ddos[cdt] = None
+        self._depths[cdt] = depth
+
+    def set_ddo(self, cdt, ddo):
+        self._ddos[cdt] = ddo
+
+    def add_edge(self, parent, child):
+        self._children.setdefault(parent, []).append(child)
+        self._parents.setdefault(child, []).append(parent)
+
+    def remove_cycles(self):
+        """Move the edges that close a cycle from the lookups to `cycles`."""
+        # Iterative depth-first search, an edge to a node still on the stack is a
+        # back edge.
+        on_stack = set()
+        done = set()
+        for start in self._ddos:
+            if start in done:
+                continue
+            stack = [(start, iter(list(self._children.get(start, ()))))]
+            on_stack.add(start)
+            while stack:
+                cdt, children = stack[-1]
+                child = next(children, None)
+                if child is None:
+                    stack.pop()
+                    on_stack.discard(cdt)
+                    done.add(cdt)
+                elif child in on_stack:
+                    logger.warning(f'cdt {cdt} references its ancestor {child}')
+                    self.cycles.append((cdt, child))
+                    self._children[cdt].remove(child)
+                    self._parents[child].remove(cdt)
+                elif child not in done:
+                    on_stack.add(child)
+                    stack.append((child, iter(list(self._children.get(child, ())))))
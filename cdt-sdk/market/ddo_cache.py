@@ -0,0 +1,204 @@
+import copy
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from web3 import Web3
+
+from ddo.cdt import cdt_to_id_bytes
+from ddo.ddo import DDO
+
+logger = logging.getLogger(__name__)
+
+
+class _LRU:
+    """Thread safe size bounded mapping, least recently used entries go first."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._entries.get(key, default)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            return self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class DDOCache:
+    """
+    DDO解析缓存
+
+    Resolves CDTs to DDOs without going to the node or IPFS for the popular ones.
+
+    - IPFS content is immutable, so the DDO JSON is kept by IPFS hash in a memory LRU
+      and, with `cache_dir`, in one file per hash on disk. Those entries never expire.
+    - Parsed DDOs are kept by IPFS hash in a second LRU and shared between callers.
+      Each one owns a copy of its JSON and only hands out copies of its services, so
+      callers cannot change the cached JSON through it; they must not call its `add_*`
+      methods.
+    - The CDT -> (IPFS path, block) mapping read from the registry is only cached
+      while the `CDTAttributeRegistered` events are watched, and every new event
+      replaces the mapping of its CDT.
+
+    Example:
+        cache = DDOCache(ipfs_client, keeper.cdt_registry, '~/.cdt/ddo')
+        provider.attach_ddo_cache(cache)
+    """
+    EVENT_NAME = 'CDTAttributeRegistered'
+    MAX_DOCUMENTS = 4096
+    MAX_DDOS = 1024
+    MAX_LOCATIONS = 65536
+
+    def __init__(self, ipfs_client, cdt_registry, cache_dir=None, max_documents=None,
+                 max_ddos=None, watch=True):
+        """
+        :param ipfs_client: IPFSProvider
+        :param cdt_registry: CDTRegistry the CDTs are resolved with
+        :param cache_dir: str directory of the on-disk store, None keeps it in memory only
+        :param max_documents: int number of DDO JSON documents kept in memory
+        :param max_ddos: int number of parsed DDOs kept in memory
+        :param watch: bool, False does not watch the registry events and disables the
+            CDT mapping cache
+        """
+        self.ipfs_client = ipfs_client
+        self._documents = _LRU(max_documents or self.MAX_DOCUMENTS)
+        self._ddos = _LRU(max_ddos or self.MAX_DDOS)
+        self._locations = _LRU(self.MAX_LOCATIONS)
+        self._locations_lock = threading.Lock()
+        self._cache_dir = None
+        if cache_dir:
+            self._cache_dir = os.path.expanduser(os.path.expandvars(cache_dir))
+            os.makedirs(self._cache_dir, exist_ok=True)
+
+        self.cdt_registry = cdt_registry
+        self._subscription = None
+        if watch:
+            self._subscription = cdt_registry.watch_event(self.EVENT_NAME, self._on_registered)
+
+    def resolve(self, cdt):
+        """
+        Return the DDO registered for a CDT.
+
+        :param cdt: Asset cdt, str
+        :return: DDO or None if the CDT is not registered
+        """
+        cdt_bytes = cdt_to_id_bytes(cdt)
+        cdt_id = Web3.toHex(cdt_bytes)
+        location = self._locations.get(cdt_id)
+        if location is None:
+            data = self.cdt_registry.get_registered_attribute(cdt_bytes)
+            if not (data and data.get('value')):
+                return None
+            location = (data['value'], data['block_number'])
+            if self._subscription is not None:
+                self._set_location(cdt_id, location)
+
+        return self.get_ddo(location[0])
+
+    def get_ddo(self, ipfs_path):
+        """Return the parsed DDO stored at an IPFS path."""
+        ddo = self._ddos.get(ipfs_path)
+        if ddo is None:
+            # the DDO copies the document
+            ddo = DDO(dictionary=self._get_document(ipfs_path))
+            self._ddos.put(ipfs_path, ddo)
+        return ddo
+
+    def get_json(self, ipfs_path):
+        """Return a copy of the DDO JSON stored at an IPFS path, dict."""
+        return copy.deepcopy(self._get_document(ipfs_path))
+
+    def _get_document(self, ipfs_path):
+        # the cached document itself, not to be handed out
+        document = self._documents.get(ipfs_path)
+        if document is not None:
+            return document
+
+        document = self._read_file(ipfs_path)
+        if document is None:
+            document = self.ipfs_client.get(ipfs_path)
+            self._write_file(ipfs_path, document)
+        self._documents.put(ipfs_path, document)
+        return document
+
+    def put(self, ipfs_path, ddo):
+        """
+        Cache a DDO under the IPFS path it was published to, e.g. after `publish_ddo`.
+        """
+        document = ddo.as_dictionary()
+        self._documents.put(ipfs_path, document)
+        self._write_file(ipfs_path, document)
+
+    def invalidate(self, cdt):
+        """Forget the IPFS path of a CDT, the content stays cached."""
+        self._locations.pop(Web3.toHex(cdt_to_id_bytes(cdt)))
+
+    def close(self):
+        if self._subscription is not None:
+            self._subscription.cancel()
+            self._subscription = None
+        self._locations.clear()
+
+    def _set_location(self, cdt_id, location):
+        with self._locations_lock:
+            current = self._locations.get(cdt_id)
+            if current is None or location[1] >= current[1]:
+                self._locations.put(cdt_id, location)
+
+    def _on_registered(self, event):
+        args = event['args']
+        cdt_id = Web3.toHex(args['_cdt'])
+        logger.debug(f'ddo cache: cdt {cdt_id} registered at {args["_value"]}')
+        self._set_location(cdt_id, (args['_value'], args['_blockNumberUpdated']))
+
+    def _path(self, ipfs_path):
+        # IPFS hashes are base58 or base32, keep only safe characters anyway
+        name = ''.join(c for c in ipfs_path if c.isalnum())
+        return os.path.join(self._cache_dir, f'{name}.json')
+
+    def _read_file(self, ipfs_path):
+        if not self._cache_dir:
+            return None
+        try:
+            with open(self._path(ipfs_path), 'r') as file_handle:
+                return json.load(file_handle)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f'ddo cache: could not read {ipfs_path}: {e}')
+            return None
+
+    def _write_file(self, ipfs_path, document):
+        if not self._cache_dir:
+            return
+        path = self._path(ipfs_path)
+        temp_path = f'{path}.{threading.get_ident()}.tmp'
+        try:
+            with open(temp_path, 'w') as file_handle:
+                json.dump(document, file_handle)
+            os.replace(temp_path, path)
+        except (OSError, TypeError) as e:
+            logger.warning(f'ddo cache: could not write {ipfs_path}: {e}')
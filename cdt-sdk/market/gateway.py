@@ -0,0 +1,341 @@
+import itertools
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cdt_utils.exceptions import OceanDIDNotFound
+from market.ddo_cache import DDOCache
+from market.session import SessionManager
+from market.verification import Verdict
+
+logger = logging.getLogger(__name__)
+
+
+class GatewayMetrics:
+    """Counters and latency percentiles of an `AccessGateway`."""
+    LATENCY_SAMPLES = 1024
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = OrderedDict((name, 0) for name in (
+            'requests', 'accepted', 'denied', 'rejected', 'errors',
+            'computations_started', 'computations_succeeded', 'computations_failed'))
+        self._latencies = deque(maxlen=self.LATENCY_SAMPLES)
+        self._stage_times = dict()
+        self._denied_stages = dict()
+        self._started = time.time()
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self._counters[name] += value
+
+    def observe(self, latency, verdict=None):
+        """Record the latency of a verified request and the stage timings of its verdict."""
+        with self._lock:
+            self._latencies.append(latency)
+            if verdict is None:
+                return
+            for stage, duration in verdict.timings.items():
+                total, count = self._stage_times.get(stage, (0.0, 0))
+                self._stage_times[stage] = (total + duration, count + 1)
+            if not verdict:
+                self._denied_stages[verdict.stage] = self._denied_stages.get(verdict.stage, 0) + 1
+
+    def snapshot(self, **extra):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            data = dict(self._counters)
+            data['uptime'] = time.time() - self._started
+            data['latency_ms'] = {
+                name: latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000
+                for name, q in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99))
+            } if latencies else {}
+            data['stage_avg_ms'] = {stage: total / count * 1000
+                                    for stage, (total, count) in self._stage_times.items()}
+            data['denied_stages'] = dict(self._denied_stages)
+        data.update(extra)
+        return data
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    # set on the subclass made by AccessGateway
+    gateway = None
+
+    def do_POST(self):
+        if self.path.rstrip('/') != '/access':
+            return self._reply(404, {'error': 'not found'})
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            request = json.loads(self.rfile.read(length).decode('utf-8'))
+        except (ValueError, UnicodeDecodeError) as e:
+            return self._reply(400, {'error': f'invalid json: {e}'})
+        status, body = self.gateway.handle_access(request)
+        headers = {'Retry-After': str(self.gateway.RETRY_AFTER)} if status == 503 else None
+        self._reply(status, body, headers)
+
+    def do_GET(self):
+        path = self.path.rstrip('/')
+        if path == '/metrics':
+            return self._reply(200, self.gateway.metrics_snapshot())
+        if path == '/health':
+            return self._reply(200, {'status': 'ok'})
+        if path.startswith('/access/'):
+            status = self.gateway.get_status(path[len('/access/'):])
+            if status is None:
+                return self._reply(404, {'error': 'unknown request'})
+            return self._reply(200, status)
+        self._reply(404, {'error': 'not found'})
+
+    def _reply(self, status, body, headers=None):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logger.debug(f'{self.address_string()} {format % args}')
+
+
+class AccessGateway:
+    """
+    远程访问网关
+
+    Long running HTTP service through which algorithm providers ask a data or compute
+    provider to run their algorithm on one of its resources.
+
+    - `POST /access` with the JSON fields `job_id`, `leaf_cdt`, `algorithm_cdt`,
+      `consumer_address`, `signature` and optionally `code_proof`. The request is
+      verified with `Provider.check_remote_access`; an allowed job is queued for
+      `start_remote_compute` and answered with 202 and a request id, a denied one with
+      403 and the failed stage. An allowed answer carries a `session_token`; sent back
+      with the following requests of the job, it replaces the verification by a local
+      check until it expires or is revoked, see `SessionManager`. An expired or revoked
+      token without a `signature` is answered with 401, a malformed `job_id` with 400
+      and an unregistered cdt with 404. A verification taking more
+      than `VERIFY_TIMEOUT` seconds is answered with 504. When `max_pending` requests
+      are already being verified or computed the answer is 503 with `Retry-After`.
+    - `GET /access/<request id>` returns the state of a request.
+    - `GET /metrics` returns the counters, the verification latency percentiles and
+      the average time of each verification stage.
+
+    Verifications run on a pool of `workers` threads and computations on a pool of
+    `compute_workers` threads; all of them share the provider's DDO cache, call cache
+    and node connection.
+
+    Example:
+        gateway = AccessGateway(data_provider, port=8030)
+        gateway.serve_forever()
+    """
+    DEFAULT_PORT = 8030
+    WORKERS = 8
+    COMPUTE_WORKERS = 2
+    MAX_PENDING = 64
+    VERIFY_TIMEOUT = 30
+    RETRY_AFTER = 1
+    MAX_STATUSES = 4096
+    REQUIRED_FIELDS = ('job_id', 'leaf_cdt', 'algorithm_cdt', 'consumer_address', 'signature')
+
+    def __init__(self, provider, host='127.0.0.1', port=None, workers=None,
+                 compute_workers=None, max_pending=None):
+        """
+        :param provider: DataProvider or ComputaProvider owning the leaf resources
+        :param host: str interface to listen on
+        :param port: int, 0 picks a free port
+        :param workers: int number of concurrent verifications
+        :param compute_workers: int number of concurrent computations
+        :param max_pending: int number of requests verified or computed at once
+            before new ones are rejected
+        """
+        self.provider = provider
+        if provider.ddo_cache is None:
+            provider.attach_ddo_cache(DDOCache(provider.ipfs_client, provider.keeper.cdt_registry))
+        if provider.session_manager is None:
+            provider.attach_session_manager(SessionManager(provider.keeper).watch())
+        self.metrics = GatewayMetrics()
+        self._verify_executor = ThreadPoolExecutor(max_workers=workers or self.WORKERS,
+                                                   thread_name_prefix='gateway-verify')
+        self._compute_executor = ThreadPoolExecutor(
+            max_workers=compute_workers or self.COMPUTE_WORKERS,
+            thread_name_prefix='gateway-compute')
+        self._max_pending = max_pending or self.MAX_PENDING
+        self._slots = threading.BoundedSemaphore(self._max_pending)
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._statuses = OrderedDict()
+        self._statuses_lock = threading.Lock()
+
+        handler = type('RequestHandler', (_RequestHandler,), {'gateway': self})
+        self._server = ThreadingHTTPServer(
+            (host, self.DEFAULT_PORT if port is None else port), handler)
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def address(self):
+        """(host, port) the gateway listens on."""
+        return self._server.server_address
+
+    def start(self):
+        """Serve from a background thread."""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True,
+                                        name='access-gateway')
+        self._thread.start()
+
+    def serve_forever(self):
+        logger.info(f'access gateway listening on {self.address[0]}:{self.address[1]}')
+        self._server.serve_forever()
+
+    def shutdown(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._verify_executor.shutdown(wait=False)
+        self._compute_executor.shutdown(wait=True)
+
+    def handle_access(self, request):
+        """
+        Verify an access request and queue its computation.
+
+        :param request: dict with the fields of `POST /access`
+        :return: tuple (http status, response dict)
+        """
+        self.metrics.increment('requests')
+        required = self.REQUIRED_FIELDS if not request.get('session_token') else \
+            tuple(name for name in self.REQUIRED_FIELDS if name != 'signature')
+        missing = [name for name in required if request.get(name) in (None, '')]
+        if missing:
+            self.metrics.increment('errors')
+            return 400, {'error': f'missing fields: {", ".join(missing)}'}
+        # job_id为非负整数，也接受十进制字符串
+        job_id = request['job_id']
+        if isinstance(job_id, str) and job_id.isdigit():
+            job_id = int(job_id)
+        if isinstance(job_id, bool) or not isinstance(job_id, int) or job_id < 0:
+            self.metrics.increment('errors')
+            return 400, {'error': f'invalid job_id: {request["job_id"]!r}'}
+        request = dict(request, job_id=job_id)
+
+        # 背压：处理中的请求已满时直接拒绝
+        if not self._slots.acquire(blocking=False):
+            self.metrics.increment('rejected')
+            return 503, {'error': 'too many pending requests'}
+        with self._pending_lock:
+            self._pending += 1
+
+        request_id = str(next(self._ids))
+        start = time.perf_counter()
+        future = self._verify_executor.submit(self._verify, request)
+        try:
+            verdict, leaf_ddo, algorithm_ddo, token = future.result(self.VERIFY_TIMEOUT)
+        except TimeoutError:
+            # 验证线程仍在运行，结束时才释放名额
+            future.add_done_callback(lambda _: self._release())
+            return self._fail(request_id, 504, 'verification timed out')
+        except OceanDIDNotFound as e:
+            self._release()
+            return self._fail(request_id, 404, str(e))
+        except Exception as e:
+            self._release()
+            return self._fail(request_id, 500, str(e))
+        self.metrics.observe(time.perf_counter() - start, verdict)
+
+        body = {'request_id': request_id, 'timings': dict(verdict.timings)}
+        if not verdict:
+            self._release()
+            self.metrics.increment('denied')
+            body.update(status='denied', stage=verdict.stage, reason=verdict.reason)
+            self._set_status(request_id, body)
+            return 401 if verdict.stage == 'session' else 403, body
+
+        self.metrics.increment('accepted')
+        body.update(status='accepted')
+        self._set_status(request_id, dict(body, status='queued'))
+        if token:
+            body['session_token'] = token
+        self._compute_executor.submit(self._compute, request_id, leaf_ddo, algorithm_ddo,
+                                      request.get('code_proof'))
+        return 202, body
+
+    def _fail(self, request_id, status, error):
+        self.metrics.increment('errors')
+        logger.warning(f'access request {request_id} failed: {error}')
+        body = {'request_id': request_id, 'status': 'failed', 'error': error}
+        self._set_status(request_id, body)
+        return status, body
+
+    def get_status(self, request_id):
+        with self._statuses_lock:
+            status = self._statuses.get(request_id)
+        return dict(status) if status else None
+
+    def metrics_snapshot(self):
+        with self._pending_lock:
+            pending = self._pending
+        return self.metrics.snapshot(pending=pending, max_pending=self._max_pending)
+
+    def _verify(self, request):
+        leaf_ddo = self.provider.resolve_ddo(request['leaf_cdt'])
+        algorithm_ddo = self.provider.resolve_ddo(request['algorithm_cdt'])
+        for name, ddo in (('leaf_cdt', leaf_ddo), ('algorithm_cdt', algorithm_ddo)):
+            if ddo is None:
+                raise OceanDIDNotFound(f'{name} {request[name]} is not registered')
+
+        # 有效的会话令牌只需本地校验
+        token = request.get('session_token')
+        if token:
+            start = time.perf_counter()
+            claims = self.provider.check_session(token, request['job_id'], leaf_ddo.cdt,
+                                                 request['consumer_address'], algorithm_ddo.cdt)
+            timings = {'session': time.perf_counter() - start}
+            if claims:
+                return Verdict(True, timings=timings), leaf_ddo, algorithm_ddo, token
+            # 令牌失效且没有签名时无法重新验证
+            if not request.get('signature'):
+                return Verdict(False, 'session', 'session token expired, revoked or invalid',
+                               timings), leaf_ddo, algorithm_ddo, None
+
+        verdict, token = self.provider.open_session(
+            request['job_id'], leaf_ddo, algorithm_ddo, request['consumer_address'],
+            request.get('signature'))
+        return verdict, leaf_ddo, algorithm_ddo, token
+
+    def _compute(self, request_id, leaf_ddo, algorithm_ddo, code_proof):
+        self.metrics.increment('computations_started')
+        self._update_status(request_id, status='running')
+        try:
+            if self.provider.start_remote_compute(leaf_ddo, algorithm_ddo, code_proof):
+                self.metrics.increment('computations_succeeded')
+                self._update_status(request_id, status='done')
+            else:
+                self.metrics.increment('computations_failed')
+                self._update_status(request_id, status='failed', reason='code proof rejected')
+        except Exception as e:
+            logger.error(f'computation of request {request_id} failed: {e}', exc_info=True)
+            self.metrics.increment('computations_failed')
+            self._update_status(request_id, status='failed', reason=str(e))
+        finally:
+            self._release()
+
+    def _release(self):
+        with self._pending_lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def _set_status(self, request_id, status):
+        with self._statuses_lock:
+            self._statuses[request_id] = status
+            while len(self._statuses) > self.MAX_STATUSES:
+                self._statuses.popitem(last=False)
+
+    def _update_status(self, request_id, **values):
+        with self._statuses_lock:
+            if request_id in self._statuses:
+                self._statuses[request_id].update(values)
@@ -1,28 +1,80 @@
 
-from ddo.cdt import CDT, cdt_to_id, checksum, cdt_to_id_bytes
+import logging
+import multiprocessing
+import os
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from ddo.cdt import CDT, cdt_to_id, cdt_to_id_bytes
 from ddo.ddo import DDO
 from ddo.service import Service
+from ddo.merkle import MerkleTree
 from ddo.public_key_base import PUBLIC_KEY_TYPE_RSA
+from market.cdt_graph import CDTGraph
+from market.verification import AccessVerifier, check_ddo_checksum, recover_signer
 from cdt_utils.utils import add_ethereum_prefix_and_hash_msg
+from cdt_utils.web3_provider import Web3Provider
 
 from eth_utils import add_0x_prefix
 from web3 import Web3
 
+logger = logging.getLogger(__name__)
+
+# publish_ddos的单项结果
+PublishResult = namedtuple('PublishResult', ('ddo', 'ipfs_path', 'tx_hash', 'success', 'error'))
+# verify_ddos的单项结果，`reason`说明验证失败的原因
+DDOVerdict = namedtuple('DDOVerdict', ('cdt', 'valid', 'reason', 'signer', 'owner'))
+
+
+def _verify_ddo_offline(ddo_dict):
+    """
+    Check the checksum and recover the signer of a DDO, run in the verify_ddos pool.
+
+    :param ddo_dict: DDO as_dictionary()
+    :return: tuple (failure reason or None, signer address or None)
+    """
+    try:
+        ddo = DDO(dictionary=ddo_dict)
+        if not ddo.proof or not ddo.services:
+            return 'missing proof or service', None
+        if not check_ddo_checksum(ddo):
+            return 'checksum mismatch', None
+        signer = recover_signer(f'{cdt_to_id_bytes(ddo.cdt)}', ddo.proof['signatureValue'])
+        return None, signer
+    except Exception as e:
+        return f'invalid ddo: {e}', None
+
+
 class Provider(object):
+    ddo_cache = None
+    session_manager = None
+
     def __init__(self, keeper, ipfs_client, account):
         self.keeper = keeper
         self.ipfs_client = ipfs_client
         self.account = account
+
+    def attach_ddo_cache(self, ddo_cache):
+        """
+        Resolve and cache DDOs through a `DDOCache`.
+
+        :param ddo_cache: DDOCache, None detaches the current cache
+        """
+        self.ddo_cache = ddo_cache
     
+    def attach_session_manager(self, session_manager):
+        """
+        Issue access session tokens with a `SessionManager`, see `open_session`.
+
+        :param session_manager: SessionManager, None detaches the current one
+        """
+        self.session_manager = session_manager
+
     def generate_ddo(self, service_type, service_endpoint=None, child_cdts=None, values=None):
         ddo = DDO()
         ddo.add_service(service_type, service_endpoint, child_cdts, values)
-        
-        service_dict=ddo.services[0].as_dictionary()
-        checksums = dict()
-        checksums[str(0)] = checksum(service_dict)
-        
-        ddo.add_proof(checksums)
+        ddo.add_proof(ddo.checksums)
         cdt = ddo.assign_cdt(CDT.cdt(ddo.proof['checksum']))
 
         msg = f'{cdt_to_id_bytes(cdt)}'
@@ -35,6 +87,8 @@ class Provider(object):
 
     def publish_ddo(self, ddo):
         ipfs_path = self.ipfs_client.add(ddo.as_dictionary())
+        if self.ddo_cache:
+            self.ddo_cache.put(ipfs_path, ddo)
 
         _id = cdt_to_id(ddo.cdt)
         # 还需调整链上的checksum        
@@ -47,7 +101,77 @@ class Provider(object):
         
         return
 
+    def publish_ddos(self, ddos, max_workers=8, timeout=120):
+        """
+        批量发布DDO
+
+        Staged version of `publish_ddo`: the IPFS uploads run concurrently, then all
+        `registerAttribute` transactions are sent back-to-back with consecutive nonces
+        and their receipts are collected together. A failure only affects its own item.
+
+        :param ddos: iterable of DDO
+        :param max_workers: int number of concurrent IPFS uploads
+        :param timeout: float seconds to wait for the registrations to be mined
+        :return: list of PublishResult in the order of `ddos`
+        """
+        ddos = list(ddos)
+        results = [PublishResult(ddo, None, None, False, None) for ddo in ddos]
+
+        # 1. 并发上传ipfs
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            uploads = [executor.submit(self.ipfs_client.add, ddo.as_dictionary())
+                       for ddo in ddos]
+        for i, upload in enumerate(uploads):
+            if upload.exception() is not None:
+                results[i] = results[i]._replace(error=upload.exception())
+            else:
+                results[i] = results[i]._replace(ipfs_path=upload.result())
+                if self.ddo_cache:
+                    self.ddo_cache.put(upload.result(), ddos[i])
+
+        # 2. 连续发送链上注册交易，不等待确认
+        # 还需调整链上的checksum
+        checksum_test = Web3.sha3(text='checksum')
+        registry = self.keeper.cdt_registry
+        for i, result in enumerate(results):
+            if result.error is not None:
+                continue
+            try:
+                tx_hash = registry.register_attribute(
+                    cdt_to_id(result.ddo.cdt), checksum_test, result.ipfs_path, self.account)
+                results[i] = result._replace(tx_hash=tx_hash)
+            except Exception as e:
+                logger.warning(f'registering {result.ddo.cdt} failed: {e}')
+                results[i] = result._replace(error=e)
+
+        # 3. 统一收集交易回执
+        tracker = Web3Provider.get_receipt_tracker()
+        receipts = {i: tracker.track(result.tx_hash, timeout)
+                    for i, result in enumerate(results) if result.tx_hash is not None}
+        wait(receipts.values(), timeout=timeout)
+        for i, future in receipts.items():
+            result = results[i]
+            if not future.done() or future.exception() is not None:
+                error = future.exception() if future.done() else TimeoutError(
+                    f'registration of {result.ddo.cdt} was not mined in time')
+                results[i] = result._replace(error=error)
+                continue
+
+            receipt = future.result()
+            Web3Provider.observe_block(receipt.blockNumber)
+            event = registry.get_registered_event(receipt)
+            if event and event.args['_owner'].lower() == self.account.address.lower():
+                results[i] = result._replace(success=True)
+            else:
+                results[i] = result._replace(
+                    error=ValueError(f'registration of {result.ddo.cdt} failed on-chain'))
+
+        return results
+
     def resolve_ddo(self, cdt):
+        if self.ddo_cache:
+            return self.ddo_cache.resolve(cdt)
+
         cdt_bytes = cdt_to_id_bytes(cdt)
         data = self.keeper.cdt_registry.get_registered_attribute(cdt_bytes)
         if not (data and data.get('value')):
@@ -55,14 +179,57 @@ class Provider(object):
         ddo_url = data['value']
         ddo_json = self.ipfs_client.get(ddo_url)
         ddo = DDO()
-        ddo._read_dict(ddo_json)
+        ddo._read_dict(ddo_json, copy_values=False)
         return ddo
+
+    def resolve_graph(self, cdt, max_depth=None, max_workers=8):
+        """
+        Resolve a composite cdt and, recursively, the cdts in the `child_cdts` of the
+        DDOs breadth-first. The cdts of one level are resolved concurrently, so the
+        number of sequential round trips is the depth of the graph.
+
+        :param cdt: Asset cdt, str
+        :param max_depth: int depth whose children are no longer followed, None follows
+            the whole graph
+        :param max_workers: int number of concurrent resolutions
+        :return: CDTGraph
+        """
+        graph = CDTGraph(cdt)
+        graph.add_node(cdt, 0)
+        level = [cdt]
+        depth = 0
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while level:
+                futures = [executor.submit(self.resolve_ddo, item) for item in level]
+                next_level = []
+                for item, future in zip(level, futures):
+                    if future.exception() is not None:
+                        logger.warning(f'resolving {item} failed: {future.exception()}')
+                        graph.errors[item] = future.exception()
+                        continue
+                    ddo = future.result()
+                    graph.set_ddo(item, ddo)
+                    child_cdts = ddo.child_cdts if ddo is not None and ddo.services else None
+                    if not child_cdts:
+                        continue
+                    if max_depth is not None and depth >= max_depth:
+                        graph.truncated.add(item)
+                        continue
+
+                    # 同一子CDT只解析一次
+                    for child in OrderedDict.fromkeys(child_cdts.values()):
+                        graph.add_edge(item, child)
+                        if child not in graph:
+                            graph.add_node(child, depth + 1)
+                            next_level.append(child)
+                level = next_level
+                depth += 1
+
+        graph.remove_cycles()
+        return graph
     
     def verify_ddo(self, ddo, owner_address):
-        service_dict=ddo.services[0].as_dictionary()
-        checksums = dict()
-        checksums[str(0)] = checksum(service_dict)
-        if (checksums != ddo.proof['checksum']) and (CDT.cdt(checksums) != ddo.cdt):
+        if not check_ddo_checksum(ddo):
             return False
             
         original_msg = f'{cdt_to_id_bytes(ddo.cdt)}'            
@@ -75,6 +242,97 @@ class Provider(object):
 
         return True
     
+    def verify_ddos(self, ddos, owner_addresses=None, processes=None):
+        """
+        Verify many DDOs at once, see `verify_ddo`.
+
+        The checksums and signature recoveries are CPU bound and run in a pool of
+        processes while the on-chain owners of all the cdts are read in one multicall.
+
+        :param ddos: iterable of DDO
+        :param owner_addresses: list of expected owners in the order of `ddos`, None
+            only requires the signer to be the on-chain owner
+        :param processes: int number of worker processes, defaults to the CPU count;
+            1 verifies in the calling process
+        :return: list of DDOVerdict in the order of `ddos`
+        """
+        ddos = list(ddos)
+        if not ddos:
+            return []
+        ddo_dicts = [ddo.as_dictionary() for ddo in ddos]
+        cdt_ids = [cdt_to_id(ddo.cdt) for ddo in ddos]
+        processes = processes or os.cpu_count() or 1
+
+        # 1. 进程池中并行校验checksum和恢复签名者，同时一次性读取链上拥有者
+        if processes == 1 or len(ddos) == 1:
+            owners = self.keeper.cdt_registry.get_cdt_owners(cdt_ids)
+            checks = [_verify_ddo_offline(ddo_dict) for ddo_dict in ddo_dicts]
+        else:
+            # spawn: fork would copy the locks held by the node and event threads
+            with ProcessPoolExecutor(max_workers=processes,
+                                     mp_context=multiprocessing.get_context('spawn')) as executor:
+                offline = executor.map(_verify_ddo_offline, ddo_dicts,
+                                       chunksize=max(1, len(ddos) // (processes * 4)))
+                owners = self.keeper.cdt_registry.get_cdt_owners(cdt_ids)
+                checks = list(offline)
+
+        # 2. 汇总结果
+        verdicts = []
+        for i, (ddo, (reason, signer), owner) in enumerate(zip(ddos, checks, owners)):
+            expected = owner_addresses[i] if owner_addresses else owner
+            if reason is None:
+                if owner is None:
+                    reason = 'owner call failed'
+                elif int(owner, 16) == 0:
+                    reason = 'not registered'
+                elif signer.lower() != expected.lower():
+                    reason = 'signature mismatch'
+                elif owner.lower() != expected.lower():
+                    reason = 'owner mismatch'
+            verdicts.append(DDOVerdict(ddo.cdt, reason is None, reason, signer, owner))
+        return verdicts
+
+    def verify_remote_access(self, job_id, leaf_ddo, algorithm_ddo, consumer_address, signature):
+        return bool(self.check_remote_access(job_id, leaf_ddo, algorithm_ddo, consumer_address,
+                                             signature))
+
+    def check_remote_access(self, job_id, leaf_ddo, algorithm_ddo, consumer_address, signature):
+        """
+        Verify a remote access request to `leaf_ddo`, see `AccessVerifier.verify`.
+
+        :return: Verdict with the failed stage and the time spent in each stage
+        """
+        return AccessVerifier(self).verify(job_id, leaf_ddo, algorithm_ddo, consumer_address,
+                                           signature)
+
+    def open_session(self, job_id, leaf_ddo, algorithm_ddo, consumer_address, signature):
+        """
+        Fully verify a remote access request and, if allowed, issue a session token that
+        lets the following requests of the job skip the verification, see
+        `check_session`.
+
+        :return: tuple (Verdict, token str or None)
+        """
+        # 令牌的签发时间取验证开始前，验证期间的撤销事件同样使其失效
+        issued_at = time.time()
+        verdict = self.check_remote_access(job_id, leaf_ddo, algorithm_ddo, consumer_address,
+                                           signature)
+        if not verdict or self.session_manager is None:
+            return verdict, None
+        return verdict, self.session_manager.issue(job_id, leaf_ddo.cdt, algorithm_ddo.cdt,
+                                                   consumer_address, issued_at)
+
+    def check_session(self, token, job_id, leaf_cdt, consumer_address, algorithm_cdt=None):
+        """
+        Check a session token issued by `open_session`, without any network call.
+
+        :return: dict token payload, None if the token is not valid for this request
+        """
+        if self.session_manager is None or not token:
+            return None
+        return self.session_manager.verify(token, job_id, leaf_cdt, consumer_address,
+                                           algorithm_cdt)
+
     def verify_signature(self, signer_address, signature, original_msg):
         address = self.keeper.personal_ec_recover(original_msg, signature)
         if address.lower() == signer_address.lower():
@@ -82,6 +340,63 @@ class Provider(object):
         else:
             return False
     
+    def verify_code_proof(self, leaf_cdt, algorithm_ddo, code_proof):
+        """
+        Check the code hash an algorithm runs on `leaf_cdt` against the `code_root` of
+        its DDO, see `AlgorithmProvider.get_code_proof`.
+
+        :param leaf_cdt: Asset cdt, str
+        :param algorithm_ddo: DDO
+        :param code_proof: dict with the `code_hash` and its Merkle `proof`
+        :return: the verified code hash, or None
+        """
+        root = algorithm_ddo.code_root
+        if not root or not code_proof or code_proof.get('leaf_cdt', leaf_cdt) != leaf_cdt:
+            return None
+        code_hash = code_proof.get('code_hash')
+        if not MerkleTree.verify(root, leaf_cdt, code_hash, code_proof.get('proof') or {}):
+            return None
+        return code_hash
+
+    def start_remote_compute(self, leaf_ddo, algorithm_ddo, code_proof=None):
+        # 从算法提供方处获取跟leaf_ddo.cdt相关的代码
+        service_endpoint = algorithm_ddo.services[0].service_endpoint
+        # code = ...
+
+        # 验证代码哈希是否匹配，有默克尔证明时只需验证自己的代码哈希
+        if code_proof is not None:
+            codeproof = self.verify_code_proof(leaf_ddo.cdt, algorithm_ddo, code_proof)
+            if codeproof is None:
+                return False
+        else:
+            # 只发布了code_root的算法必须附带默克尔证明
+            code_proofs = algorithm_ddo.services[0].get_attribute('code_proofs')
+            if algorithm_ddo.code_root or not code_proofs:
+                return False
+            index = self.get_leaf_index(leaf_ddo.cdt, algorithm_ddo)
+            codeproof = code_proofs[index]
+
+        # 开始执行实际计算
+        # if hash(code) == codeproof:
+        # ... e.g., federated learning
+
+        print('successful')
+        return True
+
+    def grant_permissions(self, cdts, consumer_cdt):
+        """
+        Grant many of this provider's cdts to one consumer cdt in a single transaction.
+
+        :param cdts: list of Asset cdts owned by the provider account
+        :param consumer_cdt: Asset cdt of the grantee, e.g. an algorithm
+        :return: dict cdt -> bool, False for the cdts the account does not own, None
+            if the transaction was not mined in time
+        """
+        cdts = list(cdts)
+        results = self.keeper.cdt_registry.grant_permissions(
+            [cdt_to_id(cdt) for cdt in cdts], cdt_to_id(consumer_cdt), self.account)
+        return dict(zip(cdts, results)) if results is not None else None
+
     def get_leaf_index(self, leaf_cdt, algorithm_ddo):
         index = -1
         for ix, cdt in algorithm_ddo.child_cdts.items():
@@ -89,3 +404,15 @@ class Provider(object):
                 index = ix
         return index
 
+    def get_child_permissions(self, algorithm_ddo):
+        """
+        Check in a single request whether the algorithm cdt was granted each of its
+        child cdts.
+
+        :param algorithm_ddo: DDO of the algorithm
+        :return: dict child cdt -> bool
+        """
+        child_cdts = list(algorithm_ddo.child_cdts.values())
+        permissions = self.keeper.cdt_registry.get_permissions(
+            [cdt_to_id(cdt) for cdt in child_cdts], cdt_to_id(algorithm_ddo.cdt))
+        return {cdt: bool(permission) for cdt, permission in zip(child_cdts, permissions)}
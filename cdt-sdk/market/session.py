@@ -0,0 +1,174 @@
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from web3 import Web3
+
+from ddo.cdt import cdt_to_id_bytes
+
+logger = logging.getLogger(__name__)
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def _cdt_key(cdt):
+    # cdt str, bytes32 id or hex id -> lowercase 0x hex id
+    if isinstance(cdt, str) and cdt.startswith('cdt:'):
+        cdt = cdt_to_id_bytes(cdt)
+    return Web3.toHex(cdt) if isinstance(cdt, bytes) else cdt.lower()
+
+
+class SessionManager:
+    """
+    远程访问会话
+
+    Issues short lived access tokens after a full `AccessVerifier` verification, so the
+    following requests of the same job only need a local HMAC check.
+
+    A token is `<payload>.<signature>`, both base64url: the payload binds the job id,
+    the leaf cdt, the algorithm cdt and the consumer address and carries its issue and
+    expiry times, the signature is an HMAC-SHA256 of it with the provider's secret.
+
+    Tokens are revoked when the on-chain state they were issued on changes: once
+    `watch` is called, a `CDTAttributeRegistered` or `CDTPermissionGranted` event
+    naming the leaf or algorithm cdt invalidates every token issued for them before the
+    event was seen. Adding a job changes nothing a token was issued on, a job is only
+    revoked by `revoke_job`.
+
+    Example:
+        sessions = SessionManager(keeper).watch()
+        provider.attach_session_manager(sessions)
+    """
+    DEFAULT_TTL = 600
+    # event name -> (contract attribute of the keeper, event args naming revoked keys)
+    REVOKING_EVENTS = {
+        'CDTAttributeRegistered': ('cdt_registry', ('_cdt',)),
+        'CDTPermissionGranted': ('cdt_registry', ('_cdt', '_grantee')),
+    }
+
+    def __init__(self, keeper=None, secret=None, ttl=None):
+        """
+        :param keeper: Keeper whose contract events revoke the tokens, see `watch`
+        :param secret: bytes HMAC key, a random one makes the tokens valid for this
+            process only
+        :param ttl: float seconds a token stays valid
+        """
+        self.keeper = keeper
+        self._secret = secret if secret else os.urandom(32)
+        self.ttl = ttl if ttl else self.DEFAULT_TTL
+        # ('cdt', id) or ('job', id) -> time of the last revocation
+        self._revoked = dict()
+        self._lock = threading.Lock()
+        self._subscriptions = []
+
+    def issue(self, job_id, leaf_cdt, algorithm_cdt, consumer_address, issued_at=None):
+        """
+        Return a token for an access that was just fully verified.
+
+        :param job_id: int
+        :param leaf_cdt: Asset cdt, str
+        :param algorithm_cdt: Asset cdt, str
+        :param consumer_address: address, hex str
+        :param issued_at: float time the verification started, so a revocation seen
+            while it ran also revokes the token, defaults to now
+        :return: str
+        """
+        if issued_at is None:
+            issued_at = time.time()
+        payload = json.dumps({
+            'sid': uuid.uuid4().hex,
+            'job': int(job_id),
+            'leaf': _cdt_key(leaf_cdt),
+            'alg': _cdt_key(algorithm_cdt),
+            'sub': consumer_address.lower(),
+            'iat': issued_at,
+            'exp': issued_at + self.ttl,
+        }, separators=(',', ':'), sort_keys=True).encode('utf-8')
+        return f'{_b64encode(payload)}.{_b64encode(self._sign(payload))}'
+
+    def verify(self, token, job_id, leaf_cdt, consumer_address, algorithm_cdt=None):
+        """
+        Check a token locally.
+
+        :param token: str returned by `issue`
+        :param job_id: int job of the request
+        :param leaf_cdt: Asset cdt of the request, str
+        :param consumer_address: address sending the request, hex str
+        :param algorithm_cdt: Asset cdt of the request, str, None does not check it
+        :return: dict payload of the token, None if it is invalid, expired, revoked or
+            bound to another job, leaf, consumer or algorithm
+        """
+        try:
+            encoded_payload, encoded_signature = token.split('.')
+            payload = _b64decode(encoded_payload)
+            if not hmac.compare_digest(self._sign(payload), _b64decode(encoded_signature)):
+                return None
+            claims = json.loads(payload.decode('utf-8'))
+        except (AttributeError, ValueError, TypeError):
+            return None
+
+        if claims['exp'] < time.time():
+            return None
+        if claims['job'] != int(job_id) or claims['leaf'] != _cdt_key(leaf_cdt) or \
+                claims['sub'] != consumer_address.lower():
+            return None
+        if algorithm_cdt is not None and claims['alg'] != _cdt_key(algorithm_cdt):
+            return None
+        with self._lock:
+            for key in (('cdt', claims['leaf']), ('cdt', claims['alg']), ('job', claims['job'])):
+                if self._revoked.get(key, 0) >= claims['iat']:
+                    return None
+        return claims
+
+    def revoke_cdt(self, cdt):
+        """Invalidate the tokens issued so far for a leaf or algorithm cdt."""
+        self._revoke(('cdt', _cdt_key(cdt)))
+
+    def revoke_job(self, job_id):
+        """Invalidate the tokens issued so far for a job."""
+        self._revoke(('job', int(job_id)))
+
+    def watch(self):
+        """
+        Revoke tokens on the contract events of `REVOKING_EVENTS`.
+
+        :return: self
+        """
+        for event_name, (contract_name, arg_names) in self.REVOKING_EVENTS.items():
+            contract = getattr(self.keeper, contract_name)
+            self._subscriptions.append(
+                contract.watch_event(event_name, self._on_event, args=[arg_names]))
+        return self
+
+    def close(self):
+        for subscription in self._subscriptions:
+            subscription.cancel()
+        self._subscriptions = []
+
+    def _sign(self, payload):
+        return hmac.new(self._secret, payload, hashlib.sha256).digest()
+
+    def _revoke(self, key):
+        now = time.time()
+        with self._lock:
+            self._revoked[key] = now
+            # revocations older than the ttl no longer match any valid token
+            if len(self._revoked) > 1024:
+                self._revoked = {k: t for k, t in self._revoked.items() if t > now - self.ttl}
+
+    def _on_event(self, event, arg_names):
+        for name in arg_names:
+            self.revoke_cdt(event['args'][name])
+        logger.debug(f'sessions revoked by {event["event"]}')
@@ -0,0 +1,183 @@
+"""
+远程访问验证
+
+Checks shared by the providers before they run an algorithm on their resources.
+"""
+
+import logging
+import time
+from collections import OrderedDict
+
+from eth_utils import big_endian_to_int
+from web3 import Web3
+
+from ddo.cdt import CDT, cdt_to_id, cdt_to_id_bytes
+from cdt_utils.contract_base import ContractBase
+from cdt_utils.utils import add_ethereum_prefix_and_hash_msg, split_signature
+from cdt_utils.web3.signature import SignatureFix
+
+logger = logging.getLogger(__name__)
+
+
+def check_ddo_checksum(ddo):
+    """Return True if the proof checksums of a DDO match its services and its cdt."""
+    checksums = ddo.checksums
+    if (checksums != ddo.proof['checksum']) and (CDT.cdt(checksums) != ddo.cdt):
+        # DDO发布于规范化checksum之前
+        checksums = ddo.legacy_checksums
+        if (checksums != ddo.proof['checksum']) and (CDT.legacy_cdt(checksums) != ddo.cdt):
+            return False
+    return True
+
+
+def recover_signer(original_msg, signature):
+    """
+    Return the address that signed `original_msg` with the ethereum message prefix.
+
+    Same recovery as `Keeper.personal_ec_recover`, without a web3 connection so it also
+    runs in worker processes.
+    """
+    v, r, s = split_signature(Web3, Web3.toBytes(hexstr=signature))
+    signature_object = SignatureFix(vrs=(v, big_endian_to_int(r), big_endian_to_int(s)))
+    public_key = signature_object.recover_public_key_from_msg_hash(
+        add_ethereum_prefix_and_hash_msg(original_msg))
+    return public_key.to_checksum_address()
+
+
+class Verdict:
+    """
+    Result of `AccessVerifier.verify`, true when the access is allowed.
+
+    `stage` is the name of the failed check and `reason` explains it, both None when
+    the access is allowed. `timings` maps each stage run to its duration in seconds.
+    """
+
+    def __init__(self, allowed, stage=None, reason=None, timings=None):
+        self.allowed = allowed
+        self.stage = stage
+        self.reason = reason
+        self.timings = timings if timings is not None else OrderedDict()
+
+    def __bool__(self):
+        return self.allowed
+
+    def __repr__(self):
+        if self.allowed:
+            return f'Verdict(allowed, {self.total_time * 1000:.1f}ms)'
+        return f'Verdict(denied at {self.stage}: {self.reason})'
+
+    @property
+    def total_time(self):
+        return sum(self.timings.values())
+
+
+class AccessVerifier:
+    """
+    远程访问请求的验证流程
+
+    Decides whether the algorithm of a job may run on a leaf resource. The local checks
+    run first, from the cheapest to the most expensive, and the first failure ends the
+    verification; the on-chain state (cdt owner, job, permission) is then read with a
+    single multicall.
+
+    Example:
+        verdict = AccessVerifier(data_provider).verify(job_id, leaf_ddo, algorithm_ddo,
+                                                        consumer_address, signature)
+        if not verdict:
+            logger.info(f'access denied: {verdict}')
+    """
+
+    def __init__(self, provider):
+        """
+        :param provider: Provider of the leaf resource
+        """
+        self.provider = provider
+
+    def verify(self, job_id, leaf_ddo, algorithm_ddo, consumer_address, signature):
+        """
+        Verify a remote access request.
+
+        :param job_id: int job of the task market the access is for
+        :param leaf_ddo: DDO of the resource accessed
+        :param algorithm_ddo: DDO of the algorithm
+        :param consumer_address: address of the algorithm owner sending the request
+        :param signature: signature of f'{consumer_address}{job_id}' by the consumer
+        :return: Verdict
+        """
+        timings = OrderedDict()
+        consumer = consumer_address.lower()
+
+        local_stages = (
+            # 判断该cdt是算法cdt
+            ('service_type', 'not an algorithm',
+             lambda: bool(algorithm_ddo.services) and
+             algorithm_ddo.services[0].type == 'algorithm'),
+            # 判断该算法cdt使用到了leaf_cdt资源
+            ('leaf_membership', 'leaf is not a child of the algorithm',
+             lambda: self.provider.get_leaf_index(leaf_ddo.cdt, algorithm_ddo) != -1),
+            # 判断算法ddo的checksum与cdt
+            ('checksum', 'checksum mismatch',
+             lambda: check_ddo_checksum(algorithm_ddo)),
+            # 判断算法ddo由请求方签名
+            ('ddo_signature', 'ddo not signed by the consumer',
+             lambda: recover_signer(f'{cdt_to_id_bytes(algorithm_ddo.cdt)}',
+                                    algorithm_ddo.proof['signatureValue']).lower() == consumer),
+            # 判断请求签名的有效性
+            ('request_signature', 'request not signed by the consumer',
+             lambda: recover_signer(f'{consumer_address}{job_id}', signature).lower() == consumer),
+        )
+        for stage, reason, check in local_stages:
+            verdict = self._run_stage(stage, reason, check, timings)
+            if verdict is not None:
+                return verdict
+
+        # 一次性读取链上状态：拥有者、任务存证、授权
+        algorithm_id = cdt_to_id(algorithm_ddo.cdt)
+        leaf_id = cdt_to_id(leaf_ddo.cdt)
+        registry = self.provider.keeper.cdt_registry
+        # 本地授权图能回答时无需再上链读取授权
+        permission_index = registry.permission_index
+        indexed = permission_index.lookup(leaf_id, algorithm_id) if permission_index else None
+        calls = [(registry, 'getCDTOwner', (algorithm_id,)),
+                 (self.provider.keeper.task_market, 'getJob', (job_id,))]
+        if indexed is None:
+            calls.append((registry, 'getPermission', (leaf_id, algorithm_id)))
+        start = time.perf_counter()
+        try:
+            results = ContractBase.multicall(calls)
+            owner, job = results[:2]
+            permission = results[2] if indexed is None else indexed
+        except Exception as e:
+            timings['on_chain_reads'] = time.perf_counter() - start
+            return Verdict(False, 'on_chain_reads', f'on-chain reads failed: {e}', timings)
+        timings['on_chain_reads'] = time.perf_counter() - start
+
+        on_chain_stages = (
+            ('owner', 'consumer does not own the algorithm cdt',
+             lambda: owner is not None and owner.lower() == consumer),
+            # 判断该远程计算已在链上存证
+            ('job', 'job is not for this algorithm',
+             lambda: job is not None and job[0] == cdt_to_id_bytes(algorithm_ddo.cdt)),
+            # 判断该算法cdt是否具有操作leaf_cdt资源的权限
+            ('permission', 'algorithm has no permission on the leaf',
+             lambda: bool(permission)),
+        )
+        for stage, reason, check in on_chain_stages:
+            verdict = self._run_stage(stage, reason, check, timings)
+            if verdict is not None:
+                return verdict
+        return Verdict(True, timings=timings)
+
+    @staticmethod
+    def _run_stage(stage, reason, check, timings):
+        start = time.perf_counter()
+        try:
+            passed = check()
+        except Exception as e:
+            passed = False
+            reason = f'{reason}: {e}'
+        timings[stage] = time.perf_counter() - start
+        if passed:
+            return None
+        logger.debug(f'remote access denied at {stage}: {reason}')
+        return Verdict(False, stage, reason, timings)
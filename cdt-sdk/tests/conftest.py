@@ -0,0 +1,19 @@
+import json
+import os
+
+import pytest
+from web3 import Web3
+
+BUILD_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'cdt-contracts', 'build',
+                         'contracts')
+
+
+def load_abi(contract_name):
+    with open(os.path.join(BUILD_DIR, f'{contract_name}.json')) as f:
+        return json.load(f)['abi']
+
+
+@pytest.fixture
+def registry_contract():
+    """CDTRegistry web3 contract, only used to encode and decode, never connected."""
+    return Web3().eth.contract(address='0x' + '12' * 20, abi=load_abi('CDTRegistry'))
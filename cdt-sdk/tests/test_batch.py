@@ -0,0 +1,83 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from cdt_utils.web3.http_provider import CustomHTTPProvider
+
+
+class FakeNodeProvider(CustomHTTPProvider):
+    """Answers every request with its method name, one POST per `make_batch_request`."""
+
+    def __init__(self, batch_window=None):
+        super().__init__('http://localhost:8545', batch_window=batch_window)
+        self.posts = []
+        self.in_flight = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def make_batch_request(self, requests):
+        self.posts.append([method for method, _ in requests])
+        self.in_flight.set()
+        self.release.wait(5)
+        return [{'jsonrpc': '2.0', 'id': i, 'result': method}
+                for i, (method, _) in enumerate(requests)]
+
+
+def test_requests_in_a_batch_block_join_the_queued_ones():
+    provider = FakeNodeProvider()
+    with provider.batch() as batch:
+        block = batch.add('eth_blockNumber')
+        response = provider.make_request('eth_call', [{}, 'latest'])
+        assert response['result'] == 'eth_call'
+        assert block.result() == 'eth_blockNumber'
+        gas = batch.add('eth_gasPrice')
+    assert gas.result() == 'eth_gasPrice'
+    assert provider.posts == [['eth_blockNumber', 'eth_call'], ['eth_gasPrice']]
+
+
+def test_batch_block_only_routes_its_own_thread():
+    provider = FakeNodeProvider(batch_window=0.01)
+    with provider.batch() as batch:
+        batch.add('eth_blockNumber')
+        with ThreadPoolExecutor(1) as executor:
+            executor.submit(provider.make_request, 'eth_chainId', []).result(5)
+    assert provider.posts == [['eth_chainId'], ['eth_blockNumber']]
+    assert provider.activate_batch(None) is None
+
+
+def test_lone_request_does_not_wait_for_the_window():
+    provider = FakeNodeProvider(batch_window=10)
+    start = time.perf_counter()
+    assert provider.make_request('eth_blockNumber', [])['result'] == 'eth_blockNumber'
+    assert time.perf_counter() - start < 1
+    assert provider.posts == [['eth_blockNumber']]
+
+
+def test_requests_issued_while_one_is_in_flight_are_coalesced():
+    provider = FakeNodeProvider(batch_window=0.01)
+    provider.release.clear()
+    with ThreadPoolExecutor(4) as executor:
+        first = executor.submit(provider.make_request, 'eth_blockNumber', [])
+        assert provider.in_flight.wait(5)
+        others = [executor.submit(provider.make_request, method, [])
+                  for method in ('eth_chainId', 'eth_gasPrice', 'net_version')]
+        while len(provider._pending) < 3:
+            time.sleep(0.001)
+        provider.release.set()
+        assert first.result(5)['result'] == 'eth_blockNumber'
+        assert [other.result(5)['result'] for other in others] == \
+            ['eth_chainId', 'eth_gasPrice', 'net_version']
+
+    assert provider.posts[0] == ['eth_blockNumber']
+    assert sorted(provider.posts[1]) == ['eth_chainId', 'eth_gasPrice', 'net_version']
+
+
+@pytest.mark.parametrize('batch_window', [None, 0.01])
+def test_failed_batch_fails_the_request(batch_window):
+    provider = FakeNodeProvider(batch_window)
+    provider.make_batch_request = lambda requests: [None] * len(requests)
+    with pytest.raises(ValueError):
+        with provider.batch():
+            provider.make_request('eth_blockNumber', [])
@@ -0,0 +1,108 @@
+from types import SimpleNamespace
+
+import pytest
+
+from cdt_utils.call_cache import CallCache
+from cdt_utils.contract_base import ContractBase
+from cdt_utils.web3_provider import Web3Provider
+
+
+def test_lru_eviction_and_counters():
+    cache = CallCache(max_size=2)
+    cache.observe_block(1)
+    for name in ('a', 'b', 'c'):
+        cache.put(('C', name, ()), name, 1)
+    assert cache.get(('C', 'a', ())) is CallCache.MISSING
+    assert cache.get(('C', 'c', ())) == 'c'
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions']) == (1, 1, 1)
+
+
+def test_new_block_drops_entries_and_stale_puts():
+    cache = CallCache()
+    cache.observe_block(5)
+    cache.put(('C', 'f', (1,)), 'x', 5)
+    cache.observe_block(6)
+    assert cache.get(('C', 'f', (1,))) is CallCache.MISSING
+    # read at block 5, stored after block 6 was seen
+    cache.put(('C', 'f', (1,)), 'x', 5)
+    assert cache.get(('C', 'f', (1,))) is CallCache.MISSING
+
+
+def test_invalidate_single_call():
+    cache = CallCache()
+    cache.observe_block(1)
+    cache.put(('C', 'f', (1,)), 'x', 1)
+    cache.put(('C', 'f', (2,)), 'y', 1)
+    cache.invalidate('C', 'f', (1,))
+    assert cache.get(('C', 'f', (1,))) is CallCache.MISSING
+    assert cache.get(('C', 'f', (2,))) == 'y'
+
+
+
+class FakeRegistry(ContractBase):
+    CACHED_CALLS = ('getCDTOwner',)
+    CACHE_INVALIDATING_EVENTS = {
+        'CDTAttributeRegistered': (('getCDTOwner', ('_cdt',)),),
+    }
+
+    def __init__(self):
+        self.name = 'FakeRegistry'
+        self.calls = []
+        self.contract = SimpleNamespace(address='0x' + '56' * 20)
+        self.contract_concise = SimpleNamespace(getCDTOwner=self._get_cdt_owner)
+
+    def _get_cdt_owner(self, *args):
+        self.calls.append((args, self.state.block))
+        return 'owner-of-%s' % args[0]
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    state = SimpleNamespace(block=10, fresh_reads=0, callbacks=[])
+
+    def get_block_number(max_age=None):
+        if max_age == 0:
+            state.fresh_reads += 1
+        return state.block
+
+    def watch_event(self, event_name, callback, *args, **kwargs):
+        state.callbacks.append((event_name, callback))
+        return SimpleNamespace(cancel=lambda: None)
+
+    monkeypatch.setattr(Web3Provider, 'get_block_number', staticmethod(get_block_number))
+    monkeypatch.setattr(Web3Provider, 'observe_block', staticmethod(lambda block: None))
+    monkeypatch.setattr(ContractBase, 'watch_event', watch_event)
+    monkeypatch.setattr(ContractBase, 'call_cache', CallCache())
+    monkeypatch.setattr(ContractBase, '_invalidation_watches', dict())
+    registry = FakeRegistry()
+    registry.state = state
+    return registry
+
+
+def test_miss_is_a_single_call_cached_for_the_observed_block(registry):
+    assert registry.call('getCDTOwner', b'\x01') == "owner-of-b'\\x01'"
+    assert registry.calls == [((b'\x01',), 10)]
+    assert registry.state.fresh_reads == 0
+    assert registry.call_cache.stats()['block_number'] == 10
+    registry.call('getCDTOwner', '0x01')
+    assert len(registry.calls) == 1
+
+    registry.state.block = 11
+    registry.call('getCDTOwner', b'\x01')
+    assert registry.calls[-1] == ((b'\x01',), 11)
+
+
+def test_events_invalidate_cached_calls(registry):
+    registry.call('getCDTOwner', b'\x01')
+    registry.call('getCDTOwner', b'\x02')
+    assert [name for name, _ in registry.state.callbacks] == ['CDTAttributeRegistered']
+
+    _, callback = registry.state.callbacks[0]
+    callback({'event': 'CDTAttributeRegistered', 'blockNumber': 10,
+              'args': {'_cdt': b'\x01'}})
+    registry.call('getCDTOwner', b'\x01')
+    registry.call('getCDTOwner', b'\x02')
+    assert [args for args, _ in registry.calls] == [(b'\x01',), (b'\x02',), (b'\x01',)]
+    # subscribed once per contract
+    assert len(registry.state.callbacks) == 1
@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+
+from market.provider import Provider
+
+
+def graph_provider(children, failing=()):
+    """Provider resolving each cdt to a DDO with the given `child_cdts`."""
+    def resolve_ddo(cdt):
+        if cdt in failing:
+            raise IOError(f'ipfs unavailable for {cdt}')
+        if cdt not in children:
+            return None
+        child_cdts = {str(i): child for i, child in enumerate(children[cdt])}
+        return SimpleNamespace(cdt=cdt, services=[child_cdts], child_cdts=child_cdts)
+
+    provider = Provider(None, None, None)
+    provider.resolve_ddo = resolve_ddo
+    return provider
+
+
+def test_shared_children_are_single_nodes():
+    provider = graph_provider({'A': ['B', 'C'], 'B': ['D'], 'C': ['D', 'D'], 'D': []})
+    graph = provider.resolve_graph('A')
+    assert list(graph) == ['A', 'B', 'C', 'D']
+    assert graph.levels() == [['A'], ['B', 'C'], ['D']]
+    assert graph.parents('D') == ('B', 'C')
+    assert graph.leaves() == ['D']
+    assert graph.is_acyclic
+
+
+def test_cycles_are_cut_and_walks_terminate():
+    provider = graph_provider({'A': ['B'], 'B': ['C'], 'C': ['A', 'D'], 'D': ['D']})
+    graph = provider.resolve_graph('A')
+    assert sorted(graph.cycles) == [('C', 'A'), ('D', 'D')]
+    assert not graph.is_acyclic
+    assert graph.children('C') == ('D',)
+    assert graph.parents('A') == ()
+    assert graph.depth('D') == 3
+
+    seen, stack = [], ['A']
+    while stack:
+        cdt = stack.pop()
+        seen.append(cdt)
+        stack.extend(graph.children(cdt))
+    assert seen == ['A', 'B', 'C', 'D']
+
+
+def test_missing_failed_and_truncated_cdts():
+    provider = graph_provider({'A': ['B', 'C', 'E'], 'B': ['F'], 'E': []}, failing=('C',))
+    graph = provider.resolve_graph('A')
+    assert graph.missing() == ['C', 'F']
+    assert list(graph.errors) == ['C']
+    assert graph.leaves() == ['E']
+
+    graph = provider.resolve_graph('A', max_depth=1)
+    assert graph.truncated == {'B'}
+    assert 'F' not in graph
+    assert graph.leaves() == ['E']
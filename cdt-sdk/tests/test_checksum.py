@@ -0,0 +1,97 @@
+import pytest
+
+from ddo.cdt import CDT, checksum, legacy_checksum
+from ddo.ddo import DDO
+from market.verification import check_ddo_checksum
+
+
+def make_ddo(attributes=None):
+    ddo = DDO()
+    ddo.add_service('dataset', 'http://localhost:8030', {'0': 'cdt:op:' + '11' * 32},
+                    {'attributes': attributes or {'name': 'credit data', 'rows': 1000}})
+    ddo.add_proof(ddo.checksums)
+    ddo.assign_cdt(CDT.cdt(ddo.proof['checksum']))
+    return ddo
+
+
+def test_checksum_is_independent_of_key_order():
+    first = {'b': {'y': 1, 'x': [1, {'q': 2, 'p': 3}]}, 'a': 'v'}
+    second = {'a': 'v', 'b': {'x': [1, {'p': 3, 'q': 2}], 'y': 1}}
+    assert checksum(first) == checksum(second)
+
+
+def test_checksum_keeps_spaces_in_values():
+    assert checksum({'name': 'a b'}) != checksum({'name': 'ab'})
+    # the legacy algorithm could not tell them apart
+    assert legacy_checksum({'name': 'a b'}) == legacy_checksum({'name': 'ab'})
+
+
+def test_checksum_normalizes_int_keys():
+    assert checksum({0: 'x'}) == checksum({'0': 'x'})
+
+
+def test_checksum_streams_large_values():
+    seed = {str(index): 'code-hash-%d' % index for index in range(20000)}
+    assert checksum(seed) == checksum(dict(reversed(list(seed.items()))))
+
+
+def test_service_checksum_matches_its_dictionary():
+    ddo = make_ddo()
+    service = ddo.services[0]
+    assert service.checksum == checksum(service.as_dictionary())
+
+
+def test_returned_attributes_are_read_only():
+    ddo = make_ddo({'name': 'credit data', 'columns': ['age', 'income']})
+    before = ddo.checksums
+    service = ddo.services[0]
+    with pytest.raises(TypeError):
+        service.attributes['name'] = 'tampered'
+    with pytest.raises(TypeError):
+        service.child_cdts['1'] = 'cdt:op:' + '22' * 32
+    with pytest.raises(AttributeError):
+        service.get_attribute('columns').append('tampered')
+    assert service.attributes is service.attributes
+    assert service.attributes['name'] == 'credit data'
+    assert ddo.checksums == before
+    assert checksum(ddo.services[0].as_dictionary()) == before['0']
+    assert check_ddo_checksum(ddo)
+
+
+def test_read_only_views_can_be_added_again():
+    ddo = make_ddo({'name': 'credit data', 'columns': ['age', 'income']})
+    service = ddo.services[0]
+    copied = DDO()
+    copied.add_service(service.type, service.service_endpoint, service.child_cdts,
+                       {'attributes': service.attributes})
+    assert copied.services[0].checksum == service.checksum
+
+
+def test_changing_added_values_does_not_change_the_ddo():
+    attributes = {'name': 'credit data'}
+    ddo = make_ddo(attributes)
+    attributes['name'] = 'tampered'
+    assert ddo.services[0].attributes['name'] == 'credit data'
+    assert check_ddo_checksum(ddo)
+
+
+def test_add_service_invalidates_checksums():
+    ddo = make_ddo()
+    before = ddo.checksums
+    ddo.add_service('computation', 'http://localhost:8031', None, {'attributes': {}})
+    assert set(ddo.checksums) == {'0', '1'}
+    assert ddo.checksums['0'] == before['0']
+
+
+def test_tampered_service_is_detected():
+    values = make_ddo().as_dictionary()
+    values['service'][0]['attributes']['name'] = 'tampered'
+    assert not check_ddo_checksum(DDO(dictionary=values))
+
+
+def test_legacy_ddo_still_verifies():
+    ddo = DDO()
+    ddo.add_service('dataset', 'http://localhost:8030', None, {'attributes': {'name': 'x'}})
+    ddo.add_proof(ddo.legacy_checksums)
+    ddo.assign_cdt(CDT.legacy_cdt(ddo.proof['checksum']))
+    assert check_ddo_checksum(ddo)
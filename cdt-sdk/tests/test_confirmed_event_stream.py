@@ -0,0 +1,94 @@
+from types import SimpleNamespace
+
+import pytest
+from eth_utils import event_abi_to_log_topic
+from hexbytes import HexBytes
+from web3 import Web3
+
+from cdt_utils.confirmed_event_stream import ConfirmedEventStream
+from cdt_utils.web3_provider import Web3Provider
+
+OWNER = '0x' + '34' * 20
+GRANTEE = b'\xaa' * 32
+
+
+class FakeChain:
+    """Blocks `1..head` of a fork, each with the `CDTPermissionGranted` logs given."""
+
+    def __init__(self, event_abi, address):
+        self.topic = HexBytes(event_abi_to_log_topic(event_abi))
+        self.address = address
+        self.blocks = dict()
+        self.logs = dict()
+        self.head = 0
+
+    def mine(self, fork, number, cdts=()):
+        parent = self.blocks[number - 1]['hash'] if number > 1 else HexBytes(b'\x00' * 32)
+        block_hash = HexBytes(Web3.sha3(text=f'{fork}{number}'))
+        self.blocks[number] = {'number': number, 'hash': block_hash, 'parentHash': parent}
+        self.logs[number] = [{
+            'address': self.address, 'blockNumber': number, 'blockHash': block_hash,
+            'transactionHash': HexBytes(Web3.sha3(text=f'{fork}{number}{i}')),
+            'transactionIndex': i, 'logIndex': i, 'data': '0x',
+            'topics': [self.topic, HexBytes(cdt), HexBytes(b'\x00' * 12 + HexBytes(OWNER)),
+                       HexBytes(GRANTEE)],
+        } for i, cdt in enumerate(cdts)]
+        self.head = number
+
+    def getBlock(self, number):
+        return self.blocks.get(number) if number <= self.head else None
+
+    def getLogs(self, params):
+        return [log for number in range(params['fromBlock'], params['toBlock'] + 1)
+                for log in self.logs.get(number, [])]
+
+
+@pytest.fixture
+def chain(registry_contract, monkeypatch):
+    event = registry_contract.events.CDTPermissionGranted
+    chain = FakeChain(event._get_event_abi(), registry_contract.address)
+    web3 = SimpleNamespace(eth=chain, providers=[])
+    monkeypatch.setattr(Web3Provider, 'get_web3', staticmethod(lambda: web3))
+    monkeypatch.setattr(Web3Provider, 'get_block_number',
+                        staticmethod(lambda max_age=None: chain.head))
+    chain.stream = ConfirmedEventStream(event, confirmations=2, from_block=1, history_size=16)
+    return chain
+
+
+def cdts_of(items):
+    return [(item.retracted, item.event['args']['_cdt']) for item in items]
+
+
+def test_events_are_emitted_once_confirmed(chain):
+    chain.mine('a', 1)
+    chain.mine('a', 2, [b'\x01' * 32])
+    assert chain.stream.poll() == []
+    chain.mine('a', 3)
+    assert cdts_of(chain.stream.poll()) == [(False, b'\x01' * 32)]
+    assert chain.stream.confirmed_block == 2
+    chain.mine('a', 4)
+    assert chain.stream.poll() == []
+
+
+def test_reorg_retracts_confirmed_events_and_emits_the_new_fork(chain):
+    for number in range(1, 6):
+        chain.mine('a', number, [bytes([number]) * 32] if number == 3 else ())
+    assert cdts_of(chain.stream.poll()) == [(False, b'\x03' * 32)]
+
+    # blocks 3-6 replaced, the grant moves to block 4
+    for number in range(3, 7):
+        chain.mine('b', number, [b'\x04' * 32] if number == 4 else ())
+    assert cdts_of(chain.stream.poll()) == [(True, b'\x03' * 32), (False, b'\x04' * 32)]
+    assert chain.stream.last_block == 6
+
+
+def test_reorg_of_unconfirmed_blocks_drops_their_events(chain):
+    chain.mine('a', 1)
+    chain.mine('a', 2)
+    chain.mine('a', 3, [b'\x03' * 32])
+    assert chain.stream.poll() == []
+
+    chain.mine('b', 3)
+    chain.mine('b', 4)
+    chain.mine('b', 5)
+    assert chain.stream.poll() == []
@@ -0,0 +1,68 @@
+import json
+
+from ddo.ddo import DDO
+from ddo.service import Service
+
+CDT_ID = 'cdt:op:' + 'ab' * 32
+
+
+def ddo_dict():
+    return {
+        'id': CDT_ID,
+        'service': [{'type': 'algorithm', 'serviceEndpoint': 'http://localhost:8030',
+                     'child_cdts': {'0': 'cdt:op:' + '11' * 32},
+                     'attributes': {'name': 'model', 'params': {'rounds': 3}}}],
+        'proof': {'signatureValue': '0x00', 'checksum': {'0': '00'}},
+        'created': '2020-01-01T00:00:00Z',
+    }
+
+
+def test_services_is_a_list():
+    ddo = DDO(dictionary=ddo_dict())
+    services = ddo.services
+    assert isinstance(services, list)
+    services.append(Service('dataset', None, None, {}))
+    assert len(ddo.services) == 1
+
+
+def test_services_are_parsed_lazily():
+    ddo = DDO(dictionary=ddo_dict())
+    assert ddo._service_values is not None
+    assert ddo.services[0].type == 'algorithm'
+    assert ddo._service_values is None
+
+
+def test_ddo_does_not_alias_the_input_dict():
+    values = ddo_dict()
+    ddo = DDO(dictionary=values)
+    values['service'][0]['attributes']['params']['rounds'] = 100
+    assert ddo.services[0].attributes['params']['rounds'] == 3
+
+
+def test_as_dictionary_is_a_copy():
+    ddo = DDO(dictionary=ddo_dict())
+    exported = ddo.as_dictionary()
+    exported['service'][0]['attributes']['name'] = 'changed'
+    assert ddo.as_dictionary()['service'][0]['attributes']['name'] == 'model'
+
+
+def test_as_dictionary_decodes_json_services():
+    values = ddo_dict()
+    values['service'] = [json.dumps(values['service'][0])]
+    exported = DDO(dictionary=values).as_dictionary()
+    assert exported['service'][0]['attributes']['name'] == 'model'
+
+
+def test_round_trip():
+    values = ddo_dict()
+    assert DDO(json_text=json.dumps(values)).as_dictionary() == values
+    parsed = DDO(dictionary=values)
+    parsed.services
+    assert parsed.as_dictionary() == values
+
+
+def test_service_from_json_copies():
+    values = ddo_dict()['service'][0]
+    service = Service.from_json(values)
+    values['attributes']['name'] = 'changed'
+    assert service.attributes['name'] == 'model'
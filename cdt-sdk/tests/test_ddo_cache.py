@@ -0,0 +1,85 @@
+from types import SimpleNamespace
+
+import pytest
+
+from market.ddo_cache import DDOCache
+
+CDT = 'cdt:op:' + 'ab' * 32
+IPFS_PATH = 'QmTestDocument'
+
+
+def document():
+    return {'id': CDT,
+            'service': [{'type': 'dataset', 'serviceEndpoint': None, 'child_cdts': None,
+                         'attributes': {'name': 'credit data'}}]}
+
+
+class FakeIPFS:
+    def __init__(self):
+        self.gets = 0
+
+    def get(self, ipfs_path):
+        self.gets += 1
+        return document()
+
+
+class FakeRegistry:
+    def __init__(self):
+        self.lookups = 0
+        self.callbacks = []
+
+    def get_registered_attribute(self, cdt_bytes):
+        self.lookups += 1
+        return {'value': IPFS_PATH, 'block_number': 7}
+
+    def watch_event(self, event_name, callback):
+        self.callbacks.append(callback)
+        return SimpleNamespace(cancel=lambda: None)
+
+
+def test_resolve_hits_memory_after_first_lookup():
+    ipfs, registry = FakeIPFS(), FakeRegistry()
+    cache = DDOCache(ipfs, registry)
+    first = cache.resolve(CDT)
+    assert cache.resolve(CDT) is first
+    assert (ipfs.gets, registry.lookups) == (1, 1)
+
+
+def test_without_watch_the_mapping_is_read_each_time():
+    ipfs, registry = FakeIPFS(), FakeRegistry()
+    cache = DDOCache(ipfs, registry, watch=False)
+    cache.resolve(CDT)
+    cache.resolve(CDT)
+    assert registry.callbacks == []
+    assert (ipfs.gets, registry.lookups) == (1, 2)
+
+
+def test_registered_event_replaces_the_mapping():
+    ipfs, registry = FakeIPFS(), FakeRegistry()
+    cache = DDOCache(ipfs, registry)
+    cache.resolve(CDT)
+    registry.callbacks[0]({'args': {'_cdt': bytes.fromhex('ab' * 32),
+                                    '_value': 'QmNewDocument', '_blockNumberUpdated': 9}})
+    cache.resolve(CDT)
+    assert ipfs.gets == 2
+    assert registry.lookups == 1
+
+
+def test_cached_json_cannot_be_changed_by_callers():
+    ipfs = FakeIPFS()
+    cache = DDOCache(ipfs, FakeRegistry())
+    cache.get_json(IPFS_PATH)['service'][0]['attributes']['name'] = 'tampered'
+    ddo = cache.get_ddo(IPFS_PATH)
+    with pytest.raises(TypeError):
+        ddo.services[0].attributes['name'] = 'tampered'
+    assert cache.get_json(IPFS_PATH)['service'][0]['attributes']['name'] == 'credit data'
+    assert ddo.services[0].attributes['name'] == 'credit data'
+
+
+def test_disk_store(tmp_path):
+    cache = DDOCache(FakeIPFS(), FakeRegistry(), cache_dir=str(tmp_path))
+    cache.get_json(IPFS_PATH)
+    ipfs = FakeIPFS()
+    reopened = DDOCache(ipfs, FakeRegistry(), cache_dir=str(tmp_path))
+    assert reopened.get_json(IPFS_PATH) == document()
+    assert ipfs.gets == 0
@@ -0,0 +1,39 @@
+from types import SimpleNamespace
+
+import pytest
+
+from cdt_utils.contract_handler import ContractHandler
+from cdt_utils.event_listener import EventListener
+from cdt_utils.web3_provider import Web3Provider
+
+
+class FakeDispatcher:
+    def __init__(self):
+        self.timeouts = []
+
+    def subscribe(self, event, timeout=None, **kwargs):
+        self.timeouts.append(timeout)
+
+
+@pytest.fixture
+def dispatcher(monkeypatch):
+    dispatcher = FakeDispatcher()
+    monkeypatch.setattr(ContractHandler, 'get', staticmethod(
+        lambda name: SimpleNamespace(events=SimpleNamespace(JobAdded=object()))))
+    monkeypatch.setattr(Web3Provider, 'get_event_dispatcher', staticmethod(lambda: dispatcher))
+    return dispatcher
+
+
+@pytest.mark.parametrize('timeout', [0, 0.0])
+def test_zero_timeout_never_expires(dispatcher, timeout):
+    EventListener('TaskMarket', 'JobAdded').subscribe(print, timeout=timeout, start_time=1.0)
+    assert dispatcher.timeouts == [None]
+
+
+def test_timeout_counts_from_start_time(dispatcher, monkeypatch):
+    monkeypatch.setattr('cdt_utils.event_listener.time.time', lambda: 1010.0)
+    listener = EventListener('TaskMarket', 'JobAdded')
+    listener.subscribe(print)
+    listener.subscribe(print, timeout=30, start_time=1000.0)
+    listener.subscribe(print, timeout=5, start_time=1000.0)
+    assert dispatcher.timeouts == [600, 20.0, 0]
@@ -0,0 +1,106 @@
+from types import SimpleNamespace
+
+import pytest
+
+from cdt_utils.gas_oracle import GasOracle
+from cdt_utils.web3_provider import Web3Provider
+
+
+class FakeFunction:
+    address = '0x' + 'aa' * 20
+
+    def __init__(self, fn_name, gas=50000, reverts=False):
+        self.fn_name = fn_name
+        self.gas = gas
+        self.reverts = reverts
+        self.estimates = 0
+        self.calls = 0
+
+    def estimateGas(self, transaction=None):
+        self.estimates += 1
+        if self.reverts:
+            raise ValueError('VM Exception while processing transaction: revert')
+        return self.gas
+
+    def call(self, transaction=None):
+        self.calls += 1
+        if self.reverts:
+            raise ValueError('VM Exception while processing transaction: revert')
+
+
+class FakeEth:
+    def __init__(self):
+        self.reads = 0
+
+    @property
+    def gasPrice(self):
+        self.reads += 1
+        return 10 ** 9 + self.reads
+
+
+@pytest.fixture(autouse=True)
+def clear_estimates(monkeypatch):
+    monkeypatch.setattr(GasOracle, '_estimates', dict())
+    monkeypatch.setattr(GasOracle, '_gas_price', None)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = SimpleNamespace(time=1000.0)
+    monkeypatch.setattr('cdt_utils.gas_oracle.time.time', lambda: now.time)
+    monkeypatch.setattr(Web3Provider, 'get_block_number',
+                        staticmethod(lambda max_age=None: pytest.fail('block number polled')))
+    return now
+
+
+def test_gas_price_is_cached_for_max_age(clock, monkeypatch):
+    monkeypatch.setattr(Web3Provider, '_subscription_client', None)
+    web3 = SimpleNamespace(eth=FakeEth())
+    assert GasOracle.get_gas_price(web3) == GasOracle.get_gas_price(web3)
+    clock.time += GasOracle.GAS_PRICE_MAX_AGE
+    GasOracle.get_gas_price(web3)
+    assert web3.eth.reads == 2
+
+
+def test_gas_price_follows_the_pushed_head(clock, monkeypatch):
+    client = SimpleNamespace(head_block=10)
+    monkeypatch.setattr(Web3Provider, '_subscription_client', client)
+    web3 = SimpleNamespace(eth=FakeEth())
+    GasOracle.get_gas_price(web3)
+    clock.time += GasOracle.GAS_PRICE_MAX_AGE * 2
+    GasOracle.get_gas_price(web3)
+    assert web3.eth.reads == 1
+    client.head_block = 11
+    GasOracle.get_gas_price(web3)
+    assert web3.eth.reads == 2
+
+
+def test_fixed_cost_estimate_is_cached_with_margin():
+    fn = FakeFunction('grantPermission')
+    assert GasOracle.estimate_gas(fn, {}) == 60000
+    assert GasOracle.estimate_gas(fn, {}) == 60000
+    assert fn.estimates == 1
+    assert fn.calls == 1
+
+
+def test_cached_estimate_still_rejects_reverting_call():
+    fn = FakeFunction('grantPermission')
+    GasOracle.estimate_gas(fn, {})
+    fn.reverts = True
+    with pytest.raises(ValueError):
+        GasOracle.estimate_gas(fn, {})
+
+
+def test_variable_cost_functions_are_not_cached():
+    fn = FakeFunction('addAuthority')
+    GasOracle.estimate_gas(fn, {})
+    GasOracle.estimate_gas(fn, {})
+    assert fn.estimates == 2
+
+
+def test_invalidate_estimate():
+    fn = FakeFunction('addJob')
+    GasOracle.estimate_gas(fn, {})
+    GasOracle.invalidate_estimate(fn)
+    GasOracle.estimate_gas(fn, {})
+    assert fn.estimates == 2
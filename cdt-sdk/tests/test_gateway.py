@@ -0,0 +1,140 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from market.gateway import AccessGateway
+from market.session import SessionManager
+from market.verification import Verdict
+
+LEAF = 'cdt:op:' + '11' * 32
+ALGORITHM = 'cdt:op:' + 'aa' * 32
+CONSUMER = '0x' + '34' * 20
+
+
+class FakeProvider:
+    ddo_cache = object()
+
+    def __init__(self):
+        self.session_manager = SessionManager()
+        self.registered = {LEAF, ALGORITHM}
+        self.verifying = threading.Event()
+        self.verify_blocked = None
+        self.computed = threading.Event()
+
+    def resolve_ddo(self, cdt):
+        return SimpleNamespace(cdt=cdt) if cdt in self.registered else None
+
+    def check_session(self, token, job_id, leaf_cdt, consumer_address, algorithm_cdt=None):
+        return self.session_manager.verify(token, job_id, leaf_cdt, consumer_address,
+                                           algorithm_cdt)
+
+    def open_session(self, job_id, leaf_ddo, algorithm_ddo, consumer_address, signature):
+        self.verifying.set()
+        if self.verify_blocked is not None:
+            self.verify_blocked.wait(5)
+        if signature is None:
+            raise TypeError('signature is None')
+        if signature != 'good':
+            return Verdict(False, 'signature', 'bad signature'), None
+        return Verdict(True), self.session_manager.issue(job_id, leaf_ddo.cdt,
+                                                         algorithm_ddo.cdt, consumer_address)
+
+    def start_remote_compute(self, leaf_ddo, algorithm_ddo, code_proof):
+        self.computed.set()
+        return True
+
+
+def access_request(**values):
+    return dict({'job_id': 1, 'leaf_cdt': LEAF, 'algorithm_cdt': ALGORITHM,
+                 'consumer_address': CONSUMER, 'signature': 'good'}, **values)
+
+
+def wait_idle(gateway, timeout=5):
+    deadline = time.time() + timeout
+    while gateway.metrics_snapshot()['pending'] and time.time() < deadline:
+        time.sleep(0.01)
+    return gateway.metrics_snapshot()['pending'] == 0
+
+
+@pytest.fixture
+def gateway():
+    gateway = AccessGateway(FakeProvider(), port=0, max_pending=1)
+    gateway.start()
+    yield gateway
+    gateway.shutdown()
+
+
+def test_accepted_request_returns_a_session_token(gateway):
+    status, body = gateway.handle_access(access_request())
+    assert status == 202
+    assert gateway.provider.computed.wait(5) and wait_idle(gateway)
+
+    request = access_request(session_token=body['session_token'])
+    del request['signature']
+    status, body = gateway.handle_access(request)
+    assert status == 202
+    assert list(body['timings']) == ['session']
+
+
+def test_denied_request(gateway):
+    status, body = gateway.handle_access(access_request(signature='bad'))
+    assert status == 403
+    assert body['stage'] == 'signature'
+    assert gateway.get_status(body['request_id'])['status'] == 'denied'
+
+
+@pytest.mark.parametrize('job_id', ['abc', '-1', -1, 1.5, True, None, [1]])
+def test_malformed_job_id_is_a_bad_request(gateway, job_id):
+    status, body = gateway.handle_access(access_request(job_id=job_id))
+    assert status == 400
+    assert not gateway.provider.verifying.is_set()
+
+
+def test_decimal_job_id(gateway):
+    assert gateway.handle_access(access_request(job_id='1'))[0] == 202
+    assert gateway.provider.computed.wait(5) and wait_idle(gateway)
+
+
+def test_unregistered_cdt_is_not_found(gateway):
+    gateway.provider.registered.discard(ALGORITHM)
+    status, body = gateway.handle_access(access_request())
+    assert status == 404
+    assert ALGORITHM in body['error']
+    assert gateway.get_status(body['request_id'])['status'] == 'failed'
+    assert wait_idle(gateway)
+
+
+def test_revoked_session_token_without_signature_is_unauthorized(gateway):
+    token = gateway.provider.session_manager.issue(1, LEAF, ALGORITHM, CONSUMER)
+    gateway.provider.session_manager.revoke_job(1)
+    request = access_request(session_token=token)
+    del request['signature']
+
+    status, body = gateway.handle_access(request)
+    assert status == 401
+    assert body['stage'] == 'session'
+    assert not gateway.provider.verifying.is_set()
+
+
+def test_revoked_session_token_with_signature_is_verified_again(gateway):
+    token = gateway.provider.session_manager.issue(1, LEAF, ALGORITHM, CONSUMER)
+    gateway.provider.session_manager.revoke_job(1)
+    status, body = gateway.handle_access(access_request(session_token=token))
+    assert status == 202
+    assert body['session_token'] != token
+
+
+def test_verification_timeout_keeps_the_slot_until_the_worker_ends(gateway, monkeypatch):
+    monkeypatch.setattr(AccessGateway, 'VERIFY_TIMEOUT', 0.05)
+    gateway.provider.verify_blocked = threading.Event()
+
+    status, body = gateway.handle_access(access_request())
+    assert status == 504
+    assert gateway.get_status(body['request_id'])['status'] == 'failed'
+    # the verification is still running and holds the only slot
+    assert gateway.handle_access(access_request())[0] == 503
+
+    gateway.provider.verify_blocked.set()
+    assert wait_idle(gateway)
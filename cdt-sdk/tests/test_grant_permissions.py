@@ -0,0 +1,40 @@
+from types import SimpleNamespace
+
+import pytest
+
+from contracts.cdtregistry import CDTRegistry
+
+CDTS = [b'\x01' * 32, b'\x02' * 32, b'\x03' * 32]
+GRANTEE = b'\xaa' * 32
+ACCOUNT = SimpleNamespace(address='0x' + '34' * 20, password=None, key=None)
+
+
+@pytest.fixture
+def registry(registry_contract, monkeypatch):
+    handler = SimpleNamespace(get_concise_contract=lambda name: None,
+                              get=lambda name: registry_contract,
+                              get_contract_version=lambda name: None)
+    registry = CDTRegistry('CDTRegistry', {'ContractHandler': handler})
+    registry.receipt = None
+    registry.events_granted = []
+    monkeypatch.setattr(registry, 'send_transaction', lambda *args, **kwargs: b'\x99' * 32)
+    monkeypatch.setattr(registry, 'get_tx_receipt', lambda tx_hash, timeout: registry.receipt)
+    monkeypatch.setattr(registry, 'get_receipt_events',
+                        lambda receipt, event_name: registry.events_granted)
+    monkeypatch.setattr(registry, 'invalidate_from_event', lambda event: None)
+    return registry
+
+
+def test_results_follow_the_receipt_events(registry):
+    registry.receipt = SimpleNamespace(status=1)
+    registry.events_granted = [{'args': {'_cdt': cdt}} for cdt in (CDTS[2], CDTS[0])]
+    assert registry.grant_permissions(CDTS, GRANTEE, ACCOUNT) == [True, False, True]
+
+
+def test_reverted_transaction_grants_nothing(registry):
+    registry.receipt = SimpleNamespace(status=0)
+    assert registry.grant_permissions(CDTS, GRANTEE, ACCOUNT) == [False, False, False]
+
+
+def test_unmined_transaction_is_unknown(registry):
+    assert registry.grant_permissions(CDTS, GRANTEE, ACCOUNT, timeout=0) is None
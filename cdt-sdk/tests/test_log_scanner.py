@@ -0,0 +1,64 @@
+from types import SimpleNamespace
+
+import pytest
+
+from cdt_utils.log_scanner import LogScanner, is_range_error
+
+
+class FakeEth:
+    """One log per block, ranges longer than `max_range` blocks are refused."""
+
+    def __init__(self, max_range, error=None):
+        self.max_range = max_range
+        self.error = error
+        self.requests = []
+
+    def getLogs(self, params):
+        start, end = params['fromBlock'], params['toBlock']
+        self.requests.append((start, end))
+        if self.error is not None:
+            raise self.error
+        if end - start + 1 > self.max_range:
+            raise ValueError({'code': -32005, 'message': 'query returned more than 10000 results'})
+        return [{'blockNumber': number} for number in range(start, end + 1)]
+
+
+def scanner(eth, chunk_size=200):
+    return LogScanner(web3=SimpleNamespace(eth=eth), chunk_size=chunk_size, max_workers=3)
+
+
+def test_refused_chunks_are_split_and_cover_the_range():
+    eth = FakeEth(max_range=50)
+    log_scanner = scanner(eth)
+    chunks = list(log_scanner.scan_chunks({'address': '0x' + '12' * 20}, 0, 999))
+
+    assert chunks[0][0] == 0 and chunks[-1][1] == 999
+    for (_, end, _), (start, _, _) in zip(chunks, chunks[1:]):
+        assert start == end + 1
+    blocks = [log['blockNumber'] for _, _, logs in chunks for log in logs]
+    assert blocks == list(range(1000))
+    assert all(end - start + 1 <= 50 for start, end, _ in chunks)
+
+
+def test_sparse_chunks_grow_the_chunk_size():
+    log_scanner = scanner(FakeEth(max_range=10 ** 6), chunk_size=100)
+    list(log_scanner.scan_chunks({}, 0, 99))
+    assert log_scanner.chunk_size == 200
+
+
+def test_other_errors_are_raised():
+    with pytest.raises(ValueError):
+        list(scanner(FakeEth(10, error=ValueError('invalid params'))).scan_chunks({}, 0, 99))
+
+
+def test_single_block_that_is_refused_is_raised():
+    eth = FakeEth(max_range=0)
+    with pytest.raises(ValueError):
+        list(scanner(eth, chunk_size=4).scan_chunks({}, 0, 3))
+    assert (0, 0) in eth.requests
+
+
+def test_range_errors():
+    assert is_range_error(ValueError('Log response size exceeded'))
+    assert is_range_error(TimeoutError())
+    assert not is_range_error(ValueError('execution reverted'))
@@ -0,0 +1,101 @@
+from types import SimpleNamespace
+
+import pytest
+
+from ddo.merkle import MerkleTree, code_pairs
+from market.algorithm import AlgorithmProvider
+
+
+def child_cdts(n):
+    return {str(i): 'cdt:op:' + f'{i + 1:02x}' * 32 for i in range(n)}
+
+
+def code_proofs(n):
+    return {i: f'hash{i}' for i in range(n)}
+
+
+class FakeKeeper:
+    def sign_hash(self, msg_hash, account):
+        return '0x00'
+
+
+def algorithm_provider():
+    account = SimpleNamespace(address='0x' + '34' * 20)
+    return AlgorithmProvider(FakeKeeper(), None, account)
+
+
+@pytest.mark.parametrize('n', range(1, 10))
+def test_every_leaf_verifies(n):
+    pairs = code_pairs(child_cdts(n), code_proofs(n))
+    tree = MerkleTree.build(pairs)
+    assert len(tree) == n
+    for index, (cdt, code_hash) in enumerate(pairs):
+        assert tree.index(cdt) == index
+        assert MerkleTree.verify(tree.root, cdt, code_hash, tree.proof(index))
+
+
+def test_tampered_proof_is_rejected():
+    pairs = code_pairs(child_cdts(5), code_proofs(5))
+    tree = MerkleTree.build(pairs)
+    cdt, code_hash = pairs[2]
+    proof = tree.proof(2)
+
+    assert not MerkleTree.verify(tree.root, cdt, 'other', proof)
+    assert not MerkleTree.verify(tree.root, pairs[3][0], code_hash, proof)
+    assert not MerkleTree.verify(tree.root, cdt, code_hash, dict(proof, index=3))
+    assert not MerkleTree.verify(tree.root, cdt, code_hash,
+                                 dict(proof, siblings=proof['siblings'][:-1]))
+    assert not MerkleTree.verify(tree.root, cdt, code_hash, {})
+
+
+def test_inner_node_is_not_a_leaf():
+    tree = MerkleTree.build(code_pairs(child_cdts(4), code_proofs(4)))
+    assert tree.root != MerkleTree.build(code_pairs(child_cdts(2), code_proofs(2))).root
+
+
+def test_code_pairs_follow_numeric_child_order():
+    cdts = child_cdts(12)
+    pairs = code_pairs(cdts, code_proofs(12))
+    assert [cdt for cdt, _ in pairs] == [cdts[str(i)] for i in range(12)]
+    assert pairs[10][1] == 'hash10'
+
+
+def test_published_ddo_keeps_only_the_code_root():
+    provider = algorithm_provider()
+    values = {'attributes': {'name': 'algorithm', 'code_proofs': code_proofs(3)}}
+    ddo = provider.generate_ddo('algorithm', 'ip:port', child_cdts(3), values)
+
+    attributes = ddo.as_dictionary()['service'][0]['attributes']
+    assert 'code_proofs' not in attributes
+    assert attributes['code_root'] == ddo.code_root
+    assert 'code_proofs' in values['attributes']
+
+    cdt = child_cdts(3)['1']
+    code_proof = provider.get_code_proof(cdt, ddo)
+    assert code_proof['code_hash'] == 'hash1'
+    assert provider.verify_code_proof(cdt, ddo, code_proof) == 'hash1'
+    assert provider.get_code_proof('cdt:op:' + 'ff' * 32, ddo) is None
+
+
+@pytest.mark.parametrize('children', [None, {}])
+def test_code_proofs_are_kept_without_children(children):
+    provider = algorithm_provider()
+    ddo = provider.generate_ddo('algorithm', 'ip:port', children,
+                                {'attributes': {'code_proofs': code_proofs(3)}})
+    attributes = ddo.as_dictionary()['service'][0]['attributes']
+    assert attributes['code_proofs'] == code_proofs(3)
+    assert ddo.code_root is None
+    assert ddo.cdt not in provider._code_trees
+
+
+def test_code_proof_needs_the_code_hashes():
+    ddo = algorithm_provider().generate_ddo(
+        'algorithm', 'ip:port', child_cdts(3),
+        {'attributes': {'code_proofs': code_proofs(3)}})
+    provider = algorithm_provider()
+    with pytest.raises(ValueError):
+        provider.get_code_proof(child_cdts(3)['0'], ddo)
+    with pytest.raises(ValueError):
+        provider.get_code_proof(child_cdts(3)['0'], ddo, {0: 'x', 1: 'y', 2: 'z'})
+    assert provider.get_code_proof(child_cdts(3)['0'], ddo, code_proofs(3))['code_hash'] == \
+        'hash0'
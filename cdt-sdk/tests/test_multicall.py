@@ -0,0 +1,121 @@
+from types import SimpleNamespace
+
+import pytest
+from eth_abi import decode_abi, encode_abi
+from hexbytes import HexBytes
+from web3 import Web3
+
+from cdt_utils.contract_base import ContractBase
+from cdt_utils.contract_handler import ContractHandler
+from cdt_utils.web3_provider import Web3Provider
+from contracts.multicall import Multicall
+
+MULTICALL_ADDRESS = '0x' + 'cc' * 20
+
+
+def owner_of(i):
+    return Web3.toChecksumAddress('0x' + f'{i % 256:02x}' * 20)
+
+
+class FakeMulticallNode:
+    """Runs `aggregate` eth_calls: `getCDTOwner(cdt)` returns `owner_of(cdt[0])`."""
+
+    def __init__(self, block_numbers=(50,)):
+        self.block_numbers = list(block_numbers)
+        self.chunks = []
+        self.reverted = set()
+        self.garbled = set()
+
+    def call(self, transaction, block_identifier):
+        assert transaction['to'] == Web3.toChecksumAddress(MULTICALL_ADDRESS)
+        data = HexBytes(transaction['data'])
+        assert data[:4] == Web3.sha3(text=Multicall.AGGREGATE_SIGNATURE)[:4]
+        targets, call_data = decode_abi(['address[]', 'bytes[]'], data[4:])
+        self.chunks.append(len(targets))
+
+        success, outputs = [], []
+        for payload in call_data:
+            cdt = payload[4:36]
+            success.append(cdt[0] not in self.reverted)
+            outputs.append(b'' if cdt[0] in self.garbled else
+                           encode_abi(['address'], [owner_of(cdt[0])]))
+        block_number = self.block_numbers[(len(self.chunks) - 1) % len(self.block_numbers)]
+        return encode_abi(Multicall.AGGREGATE_OUTPUT_TYPES, [block_number, success, outputs])
+
+
+def cdt(i):
+    return bytes([i % 256]) * 32
+
+
+@pytest.fixture
+def node(monkeypatch):
+    node = FakeMulticallNode()
+    monkeypatch.setattr(Web3Provider, 'get_web3',
+                        staticmethod(lambda: SimpleNamespace(eth=node, providers=[])))
+    return node
+
+
+def test_aggregate_splits_into_chunks_of_max_calls(registry_contract, node):
+    node.block_numbers = [52, 50, 51]
+    functions = [registry_contract.functions.getCDTOwner(cdt(i)) for i in range(450)]
+    block_number, results = Multicall(MULTICALL_ADDRESS).aggregate(functions)
+    assert node.chunks == [200, 200, 50]
+    # the oldest block read is the one all results are at least as fresh as
+    assert block_number == 50
+    assert results == [owner_of(i) for i in range(450)]
+
+
+def test_aggregate_decodes_results_with_none_for_failures(registry_contract, node):
+    node.reverted.add(1)
+    node.garbled.add(2)
+    functions = [registry_contract.functions.getCDTOwner(cdt(i)) for i in range(4)]
+    block_number, results = Multicall(MULTICALL_ADDRESS).aggregate(functions, 7)
+    assert block_number == 50
+    assert results == [owner_of(0), None, None, owner_of(3)]
+    assert node.chunks == [4]
+
+
+class FakeFunction:
+    def __init__(self, fn_name, args, answers):
+        self.fn_name = fn_name
+        self.args = args
+        self.answers = answers
+
+    def call(self, block_identifier='latest'):
+        self.answers.calls.append((self.fn_name, self.args, block_identifier))
+        if self.fn_name == 'fails':
+            raise ValueError('execution reverted')
+        return (self.fn_name,) + self.args
+
+
+class FakeFunctions:
+    def __init__(self, answers):
+        self.answers = answers
+
+    def __getattr__(self, fn_name):
+        return lambda *args: FakeFunction(fn_name, args, self.answers)
+
+
+def test_without_multicall_the_calls_are_sent_one_by_one(monkeypatch):
+    answers = SimpleNamespace(calls=[])
+    monkeypatch.setattr(ContractHandler, 'get_multicall', staticmethod(lambda: None))
+    monkeypatch.setattr(Web3Provider, 'get_web3',
+                        staticmethod(lambda: SimpleNamespace(providers=[object()])))
+    contract = SimpleNamespace(contract=SimpleNamespace(functions=FakeFunctions(answers)))
+
+    results = ContractBase.multicall([(contract, 'getCDTOwner', (1,)),
+                                      (contract, 'fails', ()),
+                                      (contract, 'getPermission', (1, 2))], 9)
+    assert results == [('getCDTOwner', 1), None, ('getPermission', 1, 2)]
+    assert answers.calls == [('getCDTOwner', (1,), 9), ('fails', (), 9),
+                             ('getPermission', (1, 2), 9)]
+
+
+def test_deployed_multicall_is_used(registry_contract, node, monkeypatch):
+    monkeypatch.setattr(ContractHandler, 'get_multicall',
+                        staticmethod(lambda: Multicall(MULTICALL_ADDRESS)))
+    contract = SimpleNamespace(contract=registry_contract)
+    results = ContractBase.multicall([(contract, 'getCDTOwner', (cdt(i),)) for i in range(3)],
+                                     9)
+    assert results == [owner_of(i) for i in range(3)]
+    assert node.chunks == [3]
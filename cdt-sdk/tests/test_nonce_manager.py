@@ -0,0 +1,202 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+from web3 import Web3
+
+from cdt_utils.gas_oracle import GasOracle
+from cdt_utils.nonce_manager import NonceManager, is_known_tx_error, is_nonce_error
+from cdt_utils.wallet import Wallet
+
+ADDRESS = '0x' + '11' * 20
+# lowercase, not a valid checksum address
+SENDER = '0x' + 'ab' * 20
+
+
+class FakeEth:
+    def __init__(self, pending=0, mined=None):
+        self.pending = pending
+        self.mined = pending if mined is None else mined
+        self.sent = []
+        self.errors = []
+
+    def getTransactionCount(self, address, block_identifier):
+        return self.pending if block_identifier == 'pending' else self.mined
+
+    def sendRawTransaction(self, raw_tx):
+        if self.errors:
+            raise ValueError({'message': self.errors.pop(0)})
+        self.sent.append(raw_tx)
+        return b'hash-%d' % len(self.sent)
+
+
+class FakeWeb3:
+    def __init__(self, **kwargs):
+        self.eth = FakeEth(**kwargs)
+
+
+def test_reserve_is_consecutive_under_threads():
+    manager = NonceManager()
+    web3 = FakeWeb3(pending=7)
+    nonces = []
+    lock = threading.Lock()
+
+    def worker():
+        for _ in range(50):
+            nonce = manager.reserve(web3, ADDRESS)
+            with lock:
+                nonces.append(nonce)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(nonces) == list(range(7, 7 + 400))
+
+
+def test_released_nonce_is_reused_first():
+    manager = NonceManager()
+    web3 = FakeWeb3(pending=0)
+    first, second = manager.reserve(web3, ADDRESS), manager.reserve(web3, ADDRESS)
+    manager.release(ADDRESS, first)
+    assert manager.get_gaps(ADDRESS) == [first]
+    assert manager.reserve(web3, ADDRESS) == first
+    assert manager.reserve(web3, ADDRESS) == second + 1
+
+
+def test_resync_does_not_hand_out_outstanding_nonces():
+    manager = NonceManager()
+    web3 = FakeWeb3(pending=0)
+    held = [manager.reserve(web3, ADDRESS) for _ in range(3)]
+    # the node has seen none of them yet, they are held by other senders
+    manager.resync(web3, ADDRESS)
+    assert manager.reserve(web3, ADDRESS) not in held
+
+
+def test_resync_moves_forward_and_fills_dropped_nonce():
+    manager = NonceManager()
+    web3 = FakeWeb3(pending=0)
+    for _ in range(3):
+        manager.mark_sent(ADDRESS, manager.reserve(web3, ADDRESS))
+    # nonce 1 was dropped by the node, 2 waits behind it
+    web3.eth.pending = 1
+    assert manager.resync(web3, ADDRESS) == 1
+    assert manager.reserve(web3, ADDRESS) == 1
+    assert manager.reserve(web3, ADDRESS) == 3
+
+    web3.eth.pending = 10
+    manager.resync(web3, ADDRESS)
+    assert manager.reserve(web3, ADDRESS) == 10
+
+
+@pytest.mark.parametrize('message, nonce, known', [
+    ('nonce too low', True, False),
+    ('known transaction: 0xabc', False, True),
+    ('already known', False, True),
+    ('replacement transaction underpriced', True, False),
+])
+def test_error_classification(message, nonce, known):
+    assert is_nonce_error(ValueError(message)) == nonce
+    assert is_known_tx_error(ValueError(message)) == known
+
+
+class _SignedWallet(Wallet):
+    """Wallet signing to a deterministic payload instead of a real signature."""
+
+    def sign_tx(self, tx):
+        if tx.get('nonce') is None:
+            tx['nonce'] = Wallet._get_nonce(self._web3, self._address)
+        return b'raw-%d' % tx['nonce']
+
+
+@pytest.fixture
+def nonce_manager(monkeypatch):
+    manager = NonceManager()
+    monkeypatch.setattr(Wallet, 'nonce_manager', manager)
+    return manager
+
+
+def test_known_transaction_is_not_sent_twice(nonce_manager):
+    web3 = FakeWeb3(pending=4)
+    web3.eth.errors = ['already known']
+    wallet = _SignedWallet(web3, address=ADDRESS)
+    tx_hash = wallet.send_tx({'from': ADDRESS})
+    assert web3.eth.sent == []
+    assert len(tx_hash) == 32
+    # the nonce of the known transaction is not handed out again
+    assert nonce_manager.reserve(web3, ADDRESS) == 5
+
+
+def test_nonce_error_resends_with_fresh_nonce(nonce_manager):
+    web3 = FakeWeb3(pending=4)
+    web3.eth.errors = ['nonce too low']
+    wallet = _SignedWallet(web3, address=ADDRESS)
+    web3.eth.pending = 6
+    wallet.send_tx({'from': ADDRESS})
+    assert web3.eth.sent == [b'raw-6']
+
+
+class FakeAccounts:
+    """`web3.eth.account` checking the `to` address the way eth_account does."""
+
+    def privateKeyToAccount(self, key):
+        return SimpleNamespace(address=Web3.toChecksumAddress(SENDER), privateKey=key)
+
+    def signTransaction(self, tx, private_key):
+        if 'from' in tx or not Web3.isChecksumAddress(tx['to']):
+            raise TypeError(f'invalid transaction {tx}')
+        return SimpleNamespace(rawTransaction=b'raw-%d' % tx['nonce'])
+
+
+@pytest.fixture
+def signing_wallet(nonce_manager, monkeypatch):
+    monkeypatch.setattr(GasOracle, 'get_gas_price', staticmethod(lambda web3: 10 ** 11))
+    web3 = FakeWeb3(pending=0)
+    web3.eth.account = FakeAccounts()
+    return Wallet(web3, key='0x' + '01' * 32, address=SENDER)
+
+
+def test_gas_price_error_reserves_no_nonce(signing_wallet, nonce_manager, monkeypatch):
+    def fail(web3):
+        raise ConnectionError('gas price unavailable')
+
+    monkeypatch.setattr(GasOracle, 'get_gas_price', staticmethod(fail))
+    with pytest.raises(ConnectionError):
+        signing_wallet.send_tx({'to': Web3.toChecksumAddress(SENDER), 'gas': 21000})
+    assert nonce_manager.reserve(signing_wallet._web3, SENDER) == 0
+
+
+def test_signing_error_releases_the_nonce(signing_wallet, nonce_manager):
+    with pytest.raises(TypeError):
+        signing_wallet.send_tx({'to': SENDER, 'gas': 21000})
+    assert nonce_manager.reserve(signing_wallet._web3, SENDER) == 0
+
+
+def test_transport_error_resyncs_with_the_node(signing_wallet, nonce_manager):
+    eth = signing_wallet._web3.eth
+    to = Web3.toChecksumAddress(SENDER)
+    signing_wallet.send_tx({'to': to, 'gas': 21000})
+    eth.pending = 1
+
+    def drop(raw_tx):
+        raise ConnectionError('connection reset')
+
+    eth.sendRawTransaction, send = drop, eth.sendRawTransaction
+    with pytest.raises(ConnectionError):
+        signing_wallet.send_tx({'to': to, 'gas': 21000})
+    eth.sendRawTransaction = send
+
+    # nonce 1 never reached the node, it is sent again
+    signing_wallet.send_tx({'to': to, 'gas': 21000})
+    assert eth.sent == [b'raw-0', b'raw-1']
+
+
+def test_fill_nonce_gaps_and_cancel_sign_valid_transactions(signing_wallet, nonce_manager):
+    eth = signing_wallet._web3.eth
+    for _ in range(3):
+        nonce_manager.reserve(signing_wallet._web3, SENDER)
+    nonce_manager.release(SENDER, 1)
+    assert len(signing_wallet.fill_nonce_gaps()) == 1
+    signing_wallet.cancel_tx(2)
+    assert eth.sent == [b'raw-1', b'raw-2']
@@ -0,0 +1,90 @@
+from types import SimpleNamespace
+
+import pytest
+from web3 import Web3
+
+from cdt_utils.confirmed_event_stream import StreamEvent
+from cdt_utils.web3_provider import Web3Provider
+from contracts.permission_index import PermissionIndex
+
+LEAF = b'\x01' * 32
+OTHER_LEAF = b'\x02' * 32
+ALGORITHM = b'\xaa' * 32
+OWNER = '0x' + '34' * 20
+
+
+def grant(cdt, grantee, block_number):
+    return {'event': 'CDTPermissionGranted', 'blockNumber': block_number,
+            'args': {'_cdt': cdt, '_grantee': grantee, '_owner': OWNER}}
+
+
+@pytest.fixture
+def head(monkeypatch):
+    state = SimpleNamespace(block=100)
+    monkeypatch.setattr(Web3Provider, 'get_block_number',
+                        staticmethod(lambda max_age=None: state.block))
+    return state
+
+
+@pytest.fixture
+def registry(registry_contract):
+    return SimpleNamespace(address=registry_contract.address,
+                           events=registry_contract.events)
+
+
+def test_lookups(registry):
+    index = PermissionIndex(registry)
+    index.add_event(grant(LEAF, ALGORITHM, 10))
+    index.add_event(grant(OTHER_LEAF, ALGORITHM, 12))
+    assert index.has_permission(LEAF, ALGORITHM)
+    assert index.has_permission(Web3.toHex(LEAF).upper().replace('0X', ''), ALGORITHM)
+    assert not index.has_permission(ALGORITHM, LEAF)
+    assert index.get_grantees(LEAF) == [ALGORITHM]
+    assert index.get_granted(ALGORITHM) == [LEAF, OTHER_LEAF]
+    assert index.get_missing_permissions(ALGORITHM, [LEAF, b'\x03' * 32]) == [b'\x03' * 32]
+    assert len(index) == 2
+
+
+def test_lookup_needs_the_node_unless_current(registry, head):
+    index = PermissionIndex(registry, confirmations=6)
+    index.add_event(grant(LEAF, ALGORITHM, 10))
+    assert index.lookup(LEAF, ALGORITHM) is True
+    # not watching, a missing permission may be in a block not indexed yet
+    assert index.lookup(OTHER_LEAF, ALGORITHM) is None
+
+    index._stream = object()
+    index._apply([], 95)
+    assert index.lookup(OTHER_LEAF, ALGORITHM) is False
+    head.block = 101
+    assert index.lookup(OTHER_LEAF, ALGORITHM) is None
+
+
+def test_retraction_removes_orphaned_grant(registry):
+    index = PermissionIndex(registry)
+    index._apply([StreamEvent(False, grant(LEAF, ALGORITHM, 20))], 20)
+    assert index.has_permission(LEAF, ALGORITHM)
+    index._apply([StreamEvent(True, grant(LEAF, ALGORITHM, 20))], 20)
+    assert not index.has_permission(LEAF, ALGORITHM)
+    assert index.get_granted(ALGORITHM) == []
+
+
+def test_retraction_keeps_grant_from_another_block(registry):
+    index = PermissionIndex(registry)
+    index.add_event(grant(LEAF, ALGORITHM, 18))
+    index.remove_event(grant(LEAF, ALGORITHM, 20))
+    assert index.has_permission(LEAF, ALGORITHM)
+
+
+def test_sqlite_reload_reads_the_reorg_window_again(registry, tmp_path, monkeypatch):
+    monkeypatch.setattr(PermissionIndex, 'REORG_WINDOW', 10)
+    db_path = str(tmp_path / 'permissions.db')
+    index = PermissionIndex(registry, db_path)
+    index._apply([StreamEvent(False, grant(LEAF, ALGORITHM, 50)),
+                  StreamEvent(False, grant(OTHER_LEAF, ALGORITHM, 95))], 100)
+    index.close()
+
+    reloaded = PermissionIndex(registry, db_path)
+    assert reloaded.last_block == 90
+    assert reloaded.has_permission(LEAF, ALGORITHM)
+    assert not reloaded.has_permission(OTHER_LEAF, ALGORITHM)
+    reloaded.close()
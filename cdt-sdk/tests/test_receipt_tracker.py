@@ -0,0 +1,92 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from types import SimpleNamespace
+
+import pytest
+
+from cdt_utils.receipt_tracker import ReceiptTracker
+from cdt_utils.web3_provider import Web3Provider
+
+TX_HASH = b'\x99' * 32
+TX_KEY = '0x' + '99' * 32
+
+
+class FakeEth:
+    """Answers `getTransactionReceipt` from the receipts of the mined transactions."""
+
+    def __init__(self):
+        self.receipts = dict()
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def getTransactionReceipt(self, key):
+        with self.lock:
+            self.requests.append(key)
+            return self.receipts.get(key)
+
+
+@pytest.fixture
+def chain(monkeypatch):
+    state = SimpleNamespace(block=100)
+    monkeypatch.setattr(Web3Provider, 'get_block_number',
+                        staticmethod(lambda max_age=None: state.block))
+    monkeypatch.setattr(Web3Provider, 'wait_for_block',
+                        staticmethod(lambda after_block, timeout: time.sleep(0.005)))
+    return state
+
+
+@pytest.fixture
+def eth():
+    return FakeEth()
+
+
+@pytest.fixture
+def tracker(eth):
+    return ReceiptTracker(SimpleNamespace(providers=[], eth=eth), poll_interval=0.005)
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+def test_receipt_is_fetched_on_a_new_block(tracker, eth, chain):
+    future = tracker.track(TX_HASH)
+    # checked once when tracked, then only on new blocks
+    assert wait_until(lambda: len(eth.requests) == 1)
+    time.sleep(0.05)
+    assert eth.requests == [TX_KEY] and not future.done()
+
+    eth.receipts[TX_KEY] = SimpleNamespace(status=1, blockNumber=101)
+    chain.block = 101
+    assert future.result(5).blockNumber == 101
+    assert tracker.pending_count == 0
+    assert wait_until(lambda: tracker._thread is None)
+
+
+def test_missing_receipt_times_out(tracker, chain):
+    start = time.time()
+    with pytest.raises(TimeoutError):
+        tracker.track(TX_HASH, timeout=0.05).result(5)
+    assert time.time() - start < 1
+    assert tracker.pending_count == 0
+
+
+def test_waiters_of_one_transaction_share_the_requests(tracker, eth, chain):
+    futures = [tracker.track(TX_KEY.upper().replace('0X', '0x')) for _ in range(3)]
+    futures.append(tracker.track(TX_HASH))
+    assert all(future is futures[0] for future in futures)
+    assert tracker.pending_count == 1
+
+    with ThreadPoolExecutor(4) as executor:
+        waits = [executor.submit(tracker.wait, TX_HASH, 5) for _ in range(4)]
+        assert wait_until(lambda: eth.requests)
+        eth.receipts[TX_KEY] = SimpleNamespace(status=1, blockNumber=101)
+        chain.block = 101
+        receipts = [wait.result(5) for wait in waits]
+
+    assert all(receipt is receipts[0] for receipt in receipts)
+    assert eth.requests == [TX_KEY, TX_KEY]
@@ -0,0 +1,102 @@
+from types import SimpleNamespace
+
+import pytest
+from web3 import Web3
+
+from cdt_utils.confirmed_event_stream import StreamEvent
+from contracts.cdtregistry import CDTRegistry
+from contracts.registry_index import RegistryIndex
+
+CDT = b'\x01' * 32
+OTHER_CDT = b'\x02' * 32
+OWNER = '0x' + '34' * 20
+OTHER_OWNER = '0x' + '56' * 20
+
+
+def registered(cdt, owner, value, block_number, log_index=0):
+    return {'event': 'CDTAttributeRegistered', 'blockNumber': block_number,
+            'logIndex': log_index,
+            'args': {'_cdt': cdt, '_owner': owner, '_checksum': b'\x00' * 32,
+                     '_value': value, '_lastUpdatedBy': owner,
+                     '_blockNumberUpdated': block_number}}
+
+
+@pytest.fixture
+def registry(registry_contract):
+    return SimpleNamespace(address=registry_contract.address,
+                           events=registry_contract.events)
+
+
+@pytest.fixture
+def cdt_registry(registry_contract, monkeypatch):
+    handler = SimpleNamespace(get_concise_contract=lambda name: None,
+                              get=lambda name: registry_contract,
+                              get_contract_version=lambda name: None)
+    cdt_registry = CDTRegistry('CDTRegistry', {'ContractHandler': handler})
+    # the node knows a registration the lagging index has not seen yet
+    node_event = registered(CDT, OTHER_OWNER, 'QmNode', 95)
+    monkeypatch.setattr(cdt_registry, 'get_block_number_updated', lambda cdt: 95)
+    monkeypatch.setattr(cdt_registry, '_scan_events',
+                        lambda **kwargs: [SimpleNamespace(args=node_event['args'])])
+    return cdt_registry
+
+
+def test_lookups(registry):
+    index = RegistryIndex(registry)
+    index.add_event(registered(CDT, OWNER, 'QmA', 10))
+    index.add_event(registered(OTHER_CDT, OWNER, 'QmB', 8))
+    index.add_event(registered(CDT, OWNER, 'QmC', 12))
+
+    assert index.get_owner_cdts(OWNER.upper().replace('0X', '0x')) == [OTHER_CDT, CDT]
+    assert index.get_owner_cdts(OTHER_OWNER) == []
+    attribute = index.get_attribute(Web3.toHex(CDT))
+    assert attribute['value'] == 'QmC'
+    assert attribute['block_number'] == 12
+    assert attribute['owner'] == Web3.toChecksumAddress(OWNER)
+    assert index.get_attribute(b'\x03' * 32) is None
+
+
+def test_retraction_restores_the_earlier_registration(registry):
+    index = RegistryIndex(registry)
+    index._apply([StreamEvent(False, registered(CDT, OWNER, 'QmA', 10)),
+                  StreamEvent(False, registered(CDT, OTHER_OWNER, 'QmB', 20))], 20)
+    assert index.get_owner_cdts(OWNER) == []
+    assert index.get_owner_cdts(OTHER_OWNER) == [CDT]
+
+    index._apply([StreamEvent(True, registered(CDT, OTHER_OWNER, 'QmB', 20))], 21)
+    assert index.get_attribute(CDT)['value'] == 'QmA'
+    assert index.get_owner_cdts(OWNER) == [CDT]
+    assert index.get_owner_cdts(OTHER_OWNER) == []
+    assert index.last_block == 21
+
+
+def test_sqlite_reload_reads_the_reorg_window_again(registry, tmp_path, monkeypatch):
+    monkeypatch.setattr(RegistryIndex, 'REORG_WINDOW', 10)
+    db_path = str(tmp_path / 'registry.db')
+    index = RegistryIndex(registry, db_path)
+    index._apply([StreamEvent(False, registered(CDT, OWNER, 'QmA', 50)),
+                  StreamEvent(False, registered(CDT, OWNER, 'QmB', 95))], 100)
+    index.close()
+
+    reloaded = RegistryIndex(registry, db_path)
+    assert reloaded.last_block == 90
+    assert reloaded.get_attribute(CDT)['value'] == 'QmA'
+    reloaded.close()
+
+
+def test_lagging_index_falls_back_to_the_node(registry, cdt_registry, monkeypatch):
+    monkeypatch.setattr('cdt_utils.web3_provider.Web3Provider.get_block_number',
+                        lambda max_age=None: 100)
+    index = RegistryIndex(registry, confirmations=1)
+    index._stream = object()
+    index._apply([StreamEvent(False, registered(CDT, OWNER, 'QmA', 10))], 50)
+    cdt_registry.attach_index(index)
+
+    assert not index.is_current()
+    assert cdt_registry.get_registered_attribute(CDT)['value'] == 'QmNode'
+    assert cdt_registry.get_owner_asset_ids(OTHER_OWNER) == [CDT]
+
+    index._apply([StreamEvent(False, registered(CDT, OTHER_OWNER, 'QmIndexed', 95))], 100)
+    assert index.is_current()
+    assert cdt_registry.get_registered_attribute(CDT)['value'] == 'QmIndexed'
+    assert cdt_registry.get_owner_asset_ids(OWNER) == []
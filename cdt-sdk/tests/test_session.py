@@ -0,0 +1,78 @@
+from types import SimpleNamespace
+
+import pytest
+
+from market.provider import Provider
+from market.session import SessionManager
+from market.verification import Verdict
+
+LEAF = 'cdt:op:' + '11' * 32
+ALGORITHM = 'cdt:op:' + 'aa' * 32
+CONSUMER = '0x' + '34' * 20
+
+
+@pytest.fixture
+def sessions():
+    return SessionManager(secret=b'secret', ttl=60)
+
+
+def test_token_is_bound_to_the_request(sessions):
+    token = sessions.issue(7, LEAF, ALGORITHM, CONSUMER)
+    assert sessions.verify(token, 7, LEAF, CONSUMER.upper().replace('0X', '0x'), ALGORITHM)
+    assert sessions.verify(token, 7, LEAF, CONSUMER)['job'] == 7
+    assert sessions.verify(token, 8, LEAF, CONSUMER) is None
+    assert sessions.verify(token, 7, ALGORITHM, CONSUMER) is None
+    assert sessions.verify(token, 7, LEAF, '0x' + '56' * 20) is None
+    assert sessions.verify(token, 7, LEAF, CONSUMER, LEAF) is None
+
+
+def test_forged_or_malformed_token_is_rejected(sessions):
+    token = sessions.issue(7, LEAF, ALGORITHM, CONSUMER)
+    other = SessionManager(secret=b'other').issue(7, LEAF, ALGORITHM, CONSUMER)
+    assert sessions.verify(other, 7, LEAF, CONSUMER) is None
+    assert sessions.verify(token.split('.')[0] + '.' + other.split('.')[1], 7, LEAF,
+                           CONSUMER) is None
+    for bad in ('', 'abc', 'a.b.c', None):
+        assert sessions.verify(bad, 7, LEAF, CONSUMER) is None
+
+
+def test_expired_token(sessions, monkeypatch):
+    token = sessions.issue(7, LEAF, ALGORITHM, CONSUMER, issued_at=1000.0)
+    monkeypatch.setattr('market.session.time.time', lambda: 1061.0)
+    assert sessions.verify(token, 7, LEAF, CONSUMER) is None
+
+
+def test_revocation_only_affects_earlier_tokens(sessions, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('market.session.time.time', lambda: now[0])
+    token = sessions.issue(7, LEAF, ALGORITHM, CONSUMER)
+    now[0] = 1001.0
+    sessions.revoke_cdt(ALGORITHM)
+    assert sessions.verify(token, 7, LEAF, CONSUMER) is None
+
+    now[0] = 1002.0
+    assert sessions.verify(sessions.issue(7, LEAF, ALGORITHM, CONSUMER), 7, LEAF, CONSUMER)
+    sessions.revoke_job(7)
+    assert sessions.verify(sessions.issue(7, LEAF, ALGORITHM, CONSUMER, issued_at=1001.5),
+                           7, LEAF, CONSUMER) is None
+
+
+def test_revocation_during_verification_revokes_the_new_token(sessions, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('market.session.time.time', lambda: now[0])
+    monkeypatch.setattr('market.provider.time.time', lambda: now[0])
+
+    def check_remote_access(*args):
+        # a permission event arrives while the chain is being read
+        now[0] = 1001.0
+        sessions.revoke_cdt(LEAF)
+        now[0] = 1002.0
+        return Verdict(True)
+
+    provider = Provider(None, None, None)
+    provider.attach_session_manager(sessions)
+    provider.check_remote_access = check_remote_access
+    verdict, token = provider.open_session(7, SimpleNamespace(cdt=LEAF),
+                                           SimpleNamespace(cdt=ALGORITHM), CONSUMER, '0x00')
+    assert verdict and token
+    assert sessions.verify(token, 7, LEAF, CONSUMER) is None
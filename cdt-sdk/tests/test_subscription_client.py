@@ -0,0 +1,137 @@
+import json
+import queue
+import threading
+import time
+
+import pytest
+
+from cdt_utils.web3 import subscription_client
+from cdt_utils.web3.subscription_client import SubscriptionClient, is_ipc_path, \
+    is_websocket_uri
+
+ADDRESS = '0x' + 'cd' * 20
+
+
+class FakeNode:
+    def __init__(self, head=5):
+        self.head = head
+        self.logs = []
+        self.transport = None
+        self.subscriptions = 0
+
+    def emit(self, block_number, log_index=0):
+        log = {'address': ADDRESS, 'blockNumber': hex(block_number),
+               'logIndex': hex(log_index), 'data': '0x'}
+        self.logs.append(log)
+        transport = self.transport
+        if transport is not None and transport.connected:
+            transport.push({'jsonrpc': '2.0', 'method': 'eth_subscription',
+                            'params': {'subscription': f'0x{self.subscriptions}',
+                                       'result': log}})
+
+    def answer(self, request):
+        method, params = request['method'], request['params']
+        if method == 'eth_subscribe':
+            self.subscriptions += 1
+            return f'0x{self.subscriptions}'
+        if method == 'eth_blockNumber':
+            return hex(self.head)
+        if method == 'eth_getLogs':
+            from_block = int(params[0]['fromBlock'], 16)
+            return [log for log in self.logs if int(log['blockNumber'], 16) >= from_block]
+        return True
+
+
+class FakeTransport:
+    node = None
+
+    def __init__(self, endpoint_uri):
+        self.connected = False
+        self._messages = queue.Queue()
+        FakeTransport.node.transport = self
+
+    def connect(self):
+        self.connected = True
+
+    def send(self, message):
+        if not self.connected:
+            raise ConnectionError('not connected')
+        request = json.loads(message)
+        self.push({'jsonrpc': '2.0', 'id': request['id'],
+                   'result': FakeTransport.node.answer(request)})
+
+    def push(self, message):
+        self._messages.put(message)
+
+    def recv(self):
+        message = self._messages.get()
+        if message is None:
+            raise ConnectionError('dropped')
+        return message
+
+    def drop(self):
+        self.connected = False
+        self._messages.put(None)
+
+    def close(self):
+        self.connected = False
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def node(monkeypatch):
+    node = FakeNode()
+    FakeTransport.node = node
+    monkeypatch.setattr(subscription_client, '_IPCTransport', FakeTransport)
+    monkeypatch.setattr(SubscriptionClient, 'RECONNECT_DELAY', 0.01)
+    return node
+
+
+def test_endpoint_kinds():
+    assert is_ipc_path('/tmp/geth.ipc')
+    assert is_ipc_path('geth.ipc')
+    assert is_ipc_path('~/.ethereum/geth.ipc')
+    assert not is_ipc_path('localhost:8545')
+    assert not is_ipc_path('http://localhost:8545')
+    assert is_websocket_uri('ws://localhost:8546')
+
+
+def test_backfill_before_first_log(node):
+    received = []
+    client = SubscriptionClient('/tmp/node.ipc')
+    try:
+        subscription = client.subscribe('logs', {'address': ADDRESS}, received.append)
+        assert wait_until(lambda: subscription.resume_block == 5)
+
+        # no log was delivered yet when the connection drops
+        node.transport.drop()
+        node.emit(7)
+        assert wait_until(lambda: len(received) == 1)
+        assert received[0]['blockNumber'] == hex(7)
+
+        node.emit(8)
+        assert wait_until(lambda: len(received) == 2)
+    finally:
+        client.close()
+
+
+def test_callback_may_send_requests(node):
+    results = []
+    client = SubscriptionClient('/tmp/node.ipc')
+    try:
+        subscription = client.subscribe(
+            'logs', {'address': ADDRESS},
+            lambda log: results.append(client.request('eth_blockNumber', timeout=2)))
+        assert wait_until(lambda: subscription.server_id is not None)
+        node.emit(6)
+        assert wait_until(lambda: results == [hex(5)])
+    finally:
+        client.close()
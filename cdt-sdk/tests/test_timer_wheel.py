@@ -0,0 +1,49 @@
+import pytest
+
+from cdt_utils.timer_wheel import TimerWheel
+
+
+@pytest.fixture
+def wheel(monkeypatch):
+    monkeypatch.setattr('cdt_utils.timer_wheel.time.time', lambda: 100.0)
+    return TimerWheel(tick=1, size=8)
+
+
+def test_key_expires_once_its_tick_is_reached(wheel):
+    wheel.schedule('a', 105.2)
+    assert wheel.advance(105.9) == []
+    assert wheel.advance(106.0) == ['a']
+    assert len(wheel) == 0
+    assert wheel.advance(120.0) == []
+
+
+def test_past_deadline_expires_on_the_next_tick(wheel):
+    wheel.schedule('a', 50.0)
+    assert wheel.advance(100.5) == []
+    assert wheel.advance(101.0) == ['a']
+
+
+def test_reschedule_and_cancel(wheel):
+    wheel.schedule('a', 102.0)
+    wheel.schedule('b', 102.0)
+    wheel.schedule('a', 104.0)
+    wheel.cancel('b')
+    wheel.cancel('missing')
+    assert wheel.advance(103.0) == []
+    assert wheel.advance(104.0) == ['a']
+
+
+def test_deadline_beyond_one_revolution_waits_for_its_tick(wheel):
+    # tick 110 shares the slot of tick 102
+    wheel.schedule('far', 110.0)
+    wheel.schedule('near', 102.0)
+    assert wheel.advance(102.0) == ['near']
+    assert wheel.advance(109.0) == []
+    assert wheel.advance(110.0) == ['far']
+
+
+def test_long_pause_expires_everything_due(wheel):
+    for i in range(20):
+        wheel.schedule(i, 101.0 + i)
+    assert sorted(wheel.advance(1000.0)) == list(range(20))
+    assert len(wheel) == 0
@@ -0,0 +1,162 @@
+from types import SimpleNamespace
+
+import pytest
+from eth_account import Account
+
+from cdt_utils.contract_base import ContractBase
+from cdt_utils.utils import add_ethereum_prefix_and_hash_msg
+from ddo.cdt import cdt_to_id, cdt_to_id_bytes
+from ddo.ddo import DDO
+from market.provider import Provider, _verify_ddo_offline
+
+KEY = b'\x01' * 32
+OTHER_KEY = b'\x02' * 32
+CONSUMER = Account.privateKeyToAccount(KEY).address
+OTHER = Account.privateKeyToAccount(OTHER_KEY).address
+LEAF = 'cdt:op:' + '11' * 32
+JOB_ID = 7
+
+
+class SigningKeeper:
+    def __init__(self):
+        self.cdt_registry = SimpleNamespace(permission_index=None)
+        self.task_market = SimpleNamespace()
+
+    @staticmethod
+    def sign_hash(msg_hash, account):
+        return Account.signHash(msg_hash, account.key).signature.hex()
+
+
+def sign(msg, key=KEY):
+    return SigningKeeper.sign_hash(add_ethereum_prefix_and_hash_msg(msg),
+                                   SimpleNamespace(key=key))
+
+
+@pytest.fixture
+def chain(monkeypatch):
+    """On-chain state answered by `ContractBase.multicall`, with the calls made."""
+    state = SimpleNamespace(owner=CONSUMER, job=None, permission=True, error=None,
+                            calls=[])
+
+    def multicall(calls, block_identifier='latest'):
+        state.calls.append([fn_name for _, fn_name, _ in calls])
+        if state.error is not None:
+            raise state.error
+        return [state.owner, state.job, state.permission][:len(calls)]
+
+    monkeypatch.setattr(ContractBase, 'multicall', staticmethod(multicall))
+    return state
+
+
+def make_provider(key=KEY):
+    account = SimpleNamespace(address=Account.privateKeyToAccount(key).address, key=key)
+    return Provider(SigningKeeper(), None, account)
+
+
+@pytest.fixture
+def provider(chain):
+    return make_provider()
+
+
+@pytest.fixture
+def algorithm_ddo(chain):
+    ddo = make_provider().generate_ddo('algorithm', 'ip:port', {'0': LEAF},
+                                       {'attributes': {'name': 'model'}})
+    chain.job = (cdt_to_id_bytes(ddo.cdt), CONSUMER)
+    return ddo
+
+
+def verify(provider, algorithm_ddo, signature=None, consumer=CONSUMER):
+    signature = signature or sign(f'{consumer}{JOB_ID}')
+    return provider.check_remote_access(JOB_ID, SimpleNamespace(cdt=LEAF), algorithm_ddo,
+                                        consumer, signature)
+
+
+def test_allowed(provider, algorithm_ddo, chain):
+    verdict = verify(provider, algorithm_ddo)
+    assert verdict
+    assert list(verdict.timings) == ['service_type', 'leaf_membership', 'checksum',
+                                     'ddo_signature', 'request_signature',
+                                     'on_chain_reads', 'owner', 'job', 'permission']
+    assert chain.calls == [['getCDTOwner', 'getJob', 'getPermission']]
+
+
+def test_bad_request_signature(provider, algorithm_ddo, chain):
+    verdict = verify(provider, algorithm_ddo, sign(f'{CONSUMER}{JOB_ID}', OTHER_KEY))
+    assert (verdict.allowed, verdict.stage) == (False, 'request_signature')
+    assert chain.calls == []
+
+
+def test_ddo_signed_by_another_account(provider, chain):
+    algorithm_ddo = make_provider(OTHER_KEY).generate_ddo('algorithm', 'ip:port', {'0': LEAF})
+    assert verify(provider, algorithm_ddo).stage == 'ddo_signature'
+
+
+def test_checksum_mismatch(provider, algorithm_ddo):
+    # the published json was changed after signing
+    values = algorithm_ddo.as_dictionary()
+    values['service'][0]['attributes']['name'] = 'tampered'
+    assert verify(provider, DDO(dictionary=values)).stage == 'checksum'
+
+
+def test_wrong_owner(provider, algorithm_ddo, chain):
+    chain.owner = OTHER
+    verdict = verify(provider, algorithm_ddo)
+    assert (verdict.allowed, verdict.stage) == (False, 'owner')
+    assert verdict.reason == 'consumer does not own the algorithm cdt'
+
+
+def test_missing_permission(provider, algorithm_ddo, chain):
+    chain.permission = False
+    assert verify(provider, algorithm_ddo).stage == 'permission'
+
+
+@pytest.mark.parametrize('indexed', [True, False])
+def test_permission_index_skips_the_permission_call(provider, algorithm_ddo, chain, indexed):
+    lookups = []
+
+    def lookup(cdt, grantee):
+        lookups.append((cdt, grantee))
+        return indexed
+
+    provider.keeper.cdt_registry.permission_index = SimpleNamespace(lookup=lookup)
+    chain.permission = not indexed
+    verdict = verify(provider, algorithm_ddo)
+    assert verdict.allowed is indexed
+    assert verdict.stage == (None if indexed else 'permission')
+    assert lookups == [(cdt_to_id(LEAF), cdt_to_id(algorithm_ddo.cdt))]
+    assert chain.calls == [['getCDTOwner', 'getJob']]
+
+
+def test_permission_index_behind_asks_the_node(provider, algorithm_ddo, chain):
+    provider.keeper.cdt_registry.permission_index = SimpleNamespace(lookup=lambda *args: None)
+    assert verify(provider, algorithm_ddo)
+    assert chain.calls == [['getCDTOwner', 'getJob', 'getPermission']]
+
+
+def test_failed_multicall_denies_access(provider, algorithm_ddo, chain):
+    chain.error = ValueError('node unavailable')
+    verdict = verify(provider, algorithm_ddo)
+    assert (verdict.allowed, verdict.stage) == (False, 'on_chain_reads')
+    assert 'node unavailable' in verdict.reason
+    assert 'owner' not in verdict.timings
+
+
+def test_verify_ddos_matches_the_offline_check():
+    provider = make_provider()
+    ddos = [provider.generate_ddo('dataset', 'ip:port', None, {'attributes': {'rows': i}})
+            for i in range(4)]
+    ddos.append(make_provider(OTHER_KEY).generate_ddo('dataset', 'ip:port'))
+    values = ddos[0].as_dictionary()
+    values['service'][0]['attributes']['rows'] = 100
+    ddos.append(DDO(dictionary=values))
+    owners = {cdt_to_id(ddo.cdt): CONSUMER for ddo in ddos}
+    owners[cdt_to_id(ddos[3].cdt)] = '0x' + '00' * 20
+    provider.keeper.cdt_registry.get_cdt_owners = lambda ids: [owners[i] for i in ids]
+
+    expected = [_verify_ddo_offline(ddo.as_dictionary()) for ddo in ddos]
+    for processes in (1, 2):
+        verdicts = provider.verify_ddos(ddos, processes=processes)
+        assert [verdict.signer for verdict in verdicts] == [signer for _, signer in expected]
+        assert [verdict.reason for verdict in verdicts] == \
+            [None, None, None, 'not registered', 'signature mismatch', 'checksum mismatch']